@@ -0,0 +1,180 @@
+"""
+Offline benchmark of the migration pipeline.
+
+Drives main() or batch_process_alarms against two SQLite-backed fake
+servers with injected per-round-trip latency and reports alarms/sec,
+round trips per alarm and peak memory. Run from the repository root:
+
+    python -m benchmarks.bench_migration --alarms 500 --latency-ms 1
+    python -m benchmarks.bench_migration --mode batch --workers 4 --write-mode per-alarm --group-commit 20
+    python -m benchmarks.bench_migration --mode select --alarms 5000 --chunk-size 200
+    python -m benchmarks.bench_migration --mode batch --same-server --latency-ms 1
+    python -m benchmarks.bench_migration --mode batch --workers 16 --latency-ms 2 --contention 0.5 --latency-ceiling-ms 8
+"""
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import os
+import resource
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fake_db import FakeCluster, install_fake_config, seed
+
+install_fake_config()
+
+from src.main import main, batch_process_alarms, DEFAULT_CHUNK_SIZE  # noqa: E402
+from src.models.context import MigrationContext  # noqa: E402
+from src.models.selection import AlarmSelection  # noqa: E402
+from src.database.bulk import DEFAULT_INSERT_CHUNK_SIZE  # noqa: E402
+from src.database.config import source, destination  # noqa: E402
+from src.utils.logger import get_logger  # noqa: E402
+
+
+def _quiet_console():
+    """Keeps the per-alarm console lines out of the benchmark output; log files are still written"""
+    get_logger("alarm_migration")
+    for logger in logging.Logger.manager.loggerDict.values():
+        for handler in getattr(logger, 'handlers', []):
+            if type(handler) is logging.StreamHandler:
+                handler.setLevel(logging.WARNING)
+
+
+def run_single(cluster, alarm_ids, parallel_reads=False, copy_all_media=False):
+    """
+    Migrates the alarms one at a time through main(), sharing one context
+    the way migrate_single_alarm would for a single id.
+    """
+    context = MigrationContext.from_configs(
+        source, destination, connect=cluster.connect, parallel_reads=parallel_reads, copy_all_media=copy_all_media
+    )
+    try:
+        return [main(alarm_id, context) for alarm_id in alarm_ids]
+    finally:
+        context.close()
+
+
+def run_batch(cluster, alarm_ids, **options):
+    if options.get('selection'):
+        batch_process_alarms('results.csv', connect=cluster.connect, **options)
+        with open('results.csv', newline='') as csvfile:
+            return [row['logs'] for row in csv.DictReader(csvfile)]
+    with open('alarms.csv', 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(['raw_alarm_id'])
+        writer.writerows([alarm_id] for alarm_id in alarm_ids)
+    batch_process_alarms('alarms.csv', connect=cluster.connect, **options)
+    with open('alarms.csv', newline='') as csvfile:
+        return [row['logs'] for row in csv.DictReader(csvfile)]
+
+
+def run_benchmark(args):
+    workdir = tempfile.mkdtemp(prefix='alarm-bench-')
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        cluster = FakeCluster(workdir, latency=args.latency_ms / 1000, same_server=args.same_server,
+                              contention=args.contention)
+        alarm_ids = seed(
+            cluster, args.alarms,
+            media_per_alarm=args.media_per_alarm,
+            updates_per_alarm=args.updates_per_alarm,
+            video_tags_per_alarm=args.video_tags_per_alarm,
+            duplicate_every=args.duplicate_every,
+        )
+        _quiet_console()
+        if args.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            if args.mode == 'single':
+                results = run_single(cluster, alarm_ids, parallel_reads=args.parallel_reads, copy_all_media=args.all_media)
+            else:
+                results = run_batch(
+                    cluster, alarm_ids,
+                    chunk_size=args.chunk_size,
+                    insert_chunk_size=args.insert_chunk_size,
+                    write_mode=args.write_mode,
+                    group_commit=args.group_commit,
+                    workers=args.workers,
+                    parallel_reads=args.parallel_reads,
+                    selection=AlarmSelection(source_entity_type='CAMERA') if args.mode == 'select' else None,
+                    bulk_media=args.bulk_media,
+                    copy_all_media=args.all_media,
+                    server_copy=not args.no_server_copy,
+                    latency_ceiling_ms=args.latency_ceiling_ms,
+                    latency_target_ms=args.latency_target_ms,
+                )
+        elapsed = time.perf_counter() - started
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.trace_memory else None
+        if args.trace_memory:
+            tracemalloc.stop()
+        outcomes = {}
+        for result in results:
+            key = result if result in ("Success", "Duplicate alarm detected, skipped.") else "Error"
+            outcomes[key] = outcomes.get(key, 0) + 1
+        report = {
+            'mode': args.mode,
+            'alarms': args.alarms,
+            'latency_ms': args.latency_ms,
+            'seconds': round(elapsed, 3),
+            'alarms_per_sec': round(args.alarms / elapsed, 2),
+            'round_trips': cluster.round_trips,
+            'queries_per_alarm': round(cluster.round_trips / args.alarms, 2),
+            'source_round_trips': cluster.source.round_trips,
+            'destination_round_trips': cluster.destination.round_trips,
+            'destination_commits': cluster.destination.commits,
+            'statements_prepared': cluster.source.prepares + cluster.destination.prepares,
+            'connections': cluster.source.connections + cluster.destination.connections,
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'outcomes': outcomes,
+        }
+        if traced_peak is not None:
+            report['peak_traced_mb'] = round(traced_peak / (1024 * 1024), 2)
+        return report
+    finally:
+        os.chdir(previous_dir)
+        if args.keep:
+            print(f"Kept benchmark files in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the alarm migration against local fake databases')
+    parser.add_argument('--mode', choices=['single', 'batch', 'select'], default='single',
+                        help='Drive main() per alarm, batch_process_alarms on a CSV, or on a streamed selection')
+    parser.add_argument('--alarms', type=int, default=200, help='Alarms seeded and migrated')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latency injected into every round trip')
+    parser.add_argument('--contention', type=float, default=0.0,
+                        help='Extra destination latency per concurrent round trip, as a fraction of --latency-ms')
+    parser.add_argument('--media-per-alarm', type=int, default=1)
+    parser.add_argument('--updates-per-alarm', type=int, default=4)
+    parser.add_argument('--video-tags-per-alarm', type=int, default=3)
+    parser.add_argument('--duplicate-every', type=int, default=0, help='Every Nth alarm already exists in the destination')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--insert-chunk-size', type=int, default=DEFAULT_INSERT_CHUNK_SIZE)
+    parser.add_argument('--write-mode', choices=['per-table', 'per-alarm', 'bulk-load'], default='per-table')
+    parser.add_argument('--group-commit', type=int, default=1)
+    parser.add_argument('--latency-ceiling-ms', type=float)
+    parser.add_argument('--latency-target-ms', type=float)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--parallel-reads', action='store_true')
+    parser.add_argument('--bulk-media', action='store_true')
+    parser.add_argument('--all-media', action='store_true')
+    parser.add_argument('--same-server', action='store_true', help='Put both schemas on one fake server')
+    parser.add_argument('--no-server-copy', action='store_true')
+    parser.add_argument('--trace-memory', action='store_true', help='Also report the tracemalloc peak (slows the run)')
+    parser.add_argument('--keep', action='store_true', help='Keep the fake databases and logs for inspection')
+    parser.add_argument('--json', action='store_true', help='Print the report as one JSON line')
+    args = parser.parse_args()
+    report = run_benchmark(args)
+    if args.json:
+        print(json.dumps(report))
+    else:
+        for key, value in report.items():
+            print(f"{key:<24} {value}")
@@ -0,0 +1,382 @@
+"""
+SQLite-backed stand-in for the mysql-connector connections the migration
+uses, with a configurable latency injected into every round trip.
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import types
+import uuid
+from datetime import datetime, timedelta
+
+from mysql.connector import errors
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS raw_alarms_v2 (
+    id TEXT PRIMARY KEY, source_id TEXT, tenant_id TEXT, partition_key INTEGER, alarm_type_id TEXT,
+    source_entity_id TEXT, source_entity_type TEXT, door_id TEXT, employee_id TEXT, user_id TEXT,
+    latest_alarm_media_id INTEGER, ml_output_id TEXT, alarm_update_id TEXT, true_alarm_probability REAL,
+    alarm_timestamp_utc TEXT, created_at_utc TEXT, updated_at_utc TEXT, alarm_state TEXT, current_status TEXT,
+    alarm_details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_raw_alarms_duplicate ON raw_alarms_v2 (source_id, tenant_id, partition_key);
+CREATE TABLE IF NOT EXISTS alarm_types (id TEXT PRIMARY KEY, alarm_type TEXT);
+CREATE TABLE IF NOT EXISTS alarm_media (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, alarm_id TEXT, media_type TEXT, media_url TEXT,
+    created_at_utc TEXT, updated_at_utc TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alarm_media_alarm ON alarm_media (alarm_id);
+CREATE TABLE IF NOT EXISTS ml_outputs (
+    id TEXT PRIMARY KEY, alarm_id TEXT, true_alarm_probability REAL, haie_ml_version TEXT, tenant_id TEXT,
+    created_at_utc TEXT, updated_at_utc TEXT, ml_output_timestamp_utc TEXT, processed_frames TEXT,
+    deadzone_detections TEXT
+);
+CREATE TABLE IF NOT EXISTS video_tags (
+    id TEXT PRIMARY KEY, video_tag TEXT, ml_output_id TEXT, tenant_id TEXT, created_at_utc TEXT, updated_at_utc TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_video_tags_ml_output ON video_tags (ml_output_id);
+CREATE TABLE IF NOT EXISTS alarm_updates (
+    id TEXT PRIMARY KEY, alarm_id TEXT, update_timestamp_utc TEXT, event TEXT, user_id TEXT,
+    plain_text_comment TEXT, current_status TEXT, tenant_id TEXT, update_details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alarm_updates_alarm ON alarm_updates (alarm_id);
+CREATE TABLE IF NOT EXISTS users (
+    id TEXT PRIMARY KEY, name TEXT, email TEXT, is_enabled INTEGER, password TEXT, tenant_id TEXT,
+    created_at_utc TEXT, updated_at_utc TEXT, refresh_token TEXT, refresh_token_expires TEXT, role_id TEXT,
+    msp_tenants TEXT, msp_locations TEXT, vision_tenants TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_users_email ON users (email);
+CREATE TABLE IF NOT EXISTS doors (id TEXT PRIMARY KEY, tenant_id TEXT, location_id TEXT, door_name TEXT);
+CREATE TABLE IF NOT EXISTS employees (
+    id TEXT PRIMARY KEY, tenant_id TEXT, first_name TEXT, last_name TEXT, phone_number TEXT
+);
+"""
+
+# Server variables the migration reads
+SERVER_VARIABLES = {'@@max_allowed_packet': 64 * 1024 * 1024, '@@local_infile': 1, '@@session.net_write_timeout': 60}
+SCHEMA_COLLATION = 'utf8mb4_0900_ai_ci'
+# Statements that only change transaction or session state the fake does not keep
+TRANSACTION_KEYWORDS = {'SAVEPOINT', 'RELEASE', 'ROLLBACK', 'START', 'BEGIN', 'COMMIT', 'SET'}
+READ_KEYWORDS = {'SELECT', 'EXPLAIN', 'SHOW'}
+DESTINATION_ALARM_TYPES = [
+    ('acf15f45-1c8f-426a-8b78-5dbbfef95c36', 'Motion Detected'),
+    ('bench-person', 'Person Detected'),
+    ('bench-tailgate', 'Tailgating'),
+]
+SOURCE_ALARM_TYPES = [('src-person', 'Person Detected'), ('src-tailgate', 'Tailgating')]
+LOAD_DATA = re.compile(
+    r"LOAD DATA LOCAL INFILE %s INTO TABLE (?P<table>\w+) .*?\((?P<columns>[^)]*)\)(?: SET (?P<set>.*))?$", re.S
+)
+_UNESCAPES = {b'0': b'\x00', b'b': b'\b', b'n': b'\n', b'r': b'\r', b't': b'\t', b'Z': b'\x1a'}
+
+
+def _unescape_field(field):
+    if field == b'\\N':
+        return None
+    return re.sub(rb'\\(.)', lambda match: _UNESCAPES.get(match.group(1), match.group(1)), field, flags=re.S).decode('utf-8')
+
+
+class FakeServer:
+    """
+    One fake database: a SQLite file shared by all of its connections, the
+    latency added to each round trip, and round-trip counters. With
+    `contention`, every other round trip in progress adds that fraction of
+    the latency, like a server slowing down under concurrent load.
+    """
+    def __init__(self, path, latency=0.0, server_uuid=None, attached=None, contention=0.0):
+        self.path = path
+        self.latency = latency
+        self.contention = contention
+        self.active = 0
+        # Servers of a same-server cluster share the uuid and see each
+        # other's schema through ATTACH, as {schema name: path}
+        self.server_uuid = server_uuid or str(uuid.uuid4())
+        self.attached = attached or {}
+        self.round_trips = 0
+        self.commits = 0
+        self.prepares = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        with sqlite3.connect(path) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def round_trip(self, commit=False, prepare=False):
+        with self._lock:
+            self.round_trips += 1
+            if commit:
+                self.commits += 1
+            if prepare:
+                self.prepares += 1
+            concurrent = self.active
+            self.active += 1
+        try:
+            if self.latency:
+                time.sleep(self.latency * (1 + self.contention * concurrent))
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def connect(self):
+        with self._lock:
+            self.connections += 1
+        return FakeConnection(self)
+
+
+class FakeCursor:
+    def __init__(self, connection, dictionary=False, prepared=False):
+        self._connection = connection
+        self._cursor = connection.db.cursor()
+        self._dictionary = dictionary
+        self._prepared = prepared
+        self._prepared_operation = None
+        self._rows = None
+        self.lastrowid = None
+        self.rowcount = -1
+        self.with_rows = False
+        self.description = None
+        self.warning_count = 0
+
+    def _load_data(self, query, path):
+        """Reads a LOAD DATA LOCAL INFILE file the way the client would send it"""
+        match = LOAD_DATA.match(query)
+        columns = [column.strip() for column in match.group('columns').split(',')]
+        with open(path, 'rb') as staging_file:
+            rows = [[_unescape_field(field) for field in line.split(b'\t')] for line in staging_file.read().split(b'\n')[:-1]]
+        # Only the `column = UNHEX(@column)` assignments load_file() emits
+        hex_columns = {index for index, column in enumerate(columns) if column.startswith('@')}
+        columns = [column.lstrip('@') for column in columns]
+        rows = [[bytes.fromhex(value) if index in hex_columns and value is not None else value
+                 for index, value in enumerate(row)] for row in rows]
+        self._connection.in_transaction = True
+        self._cursor.executemany(
+            f"INSERT INTO {match.group('table')} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})", rows
+        )
+        self.rowcount, self.description, self.with_rows = len(rows), None, False
+
+    def execute(self, operation, params=None, multi=False):
+        if self._prepared and operation != self._prepared_operation:
+            # A prepared cursor re-prepares whenever the statement text changes
+            self._connection.server.round_trip(prepare=True)
+            self._prepared_operation = operation
+        self._connection.server.round_trip()
+        query = operation.strip()
+        variables = dict(SERVER_VARIABLES, **{'@@server_uuid': self._connection.server.server_uuid})
+        variable = variables.get(query.upper().replace('SELECT ', '', 1).lower())
+        if variable is not None:
+            self._rows, self.description, self.with_rows = [(variable,)], [(query[7:],)], True
+            return
+        if 'INFORMATION_SCHEMA.COLUMNS' in query.upper():
+            self._rows = [(table, column[1]) for table in params
+                          for column in self._connection.db.execute(f"PRAGMA table_info({table})")]
+            self.description, self.with_rows = [('TABLE_NAME',), ('COLUMN_NAME',)], True
+            return
+        if 'INFORMATION_SCHEMA.SCHEMATA' in query.upper():
+            self._rows = [(schema, SCHEMA_COLLATION) for schema in (*params, 'bench_destination')]
+            self.description, self.with_rows = [('SCHEMA_NAME',), ('DEFAULT_COLLATION_NAME',)], True
+            return
+        self._rows = None
+        keyword = query.split(None, 1)[0].upper()
+        if keyword == 'LOAD':
+            return self._load_data(query, params[0])
+        if keyword in TRANSACTION_KEYWORDS:
+            # Costs its round trip; see FakeConnection for why nothing is undone
+            self.rowcount, self.description, self.with_rows = 0, None, False
+            return
+        if keyword not in READ_KEYWORDS:
+            self._connection.in_transaction = True
+        try:
+            self._cursor.execute(query.replace('%s', '?'), tuple(params or ()))
+        except sqlite3.IntegrityError as e:
+            raise errors.IntegrityError(msg=str(e))
+        except sqlite3.Error as e:
+            raise errors.DatabaseError(msg=str(e))
+        self.lastrowid = self._cursor.lastrowid
+        self.rowcount = self._cursor.rowcount
+        self.description = self._cursor.description
+        self.with_rows = self.description is not None
+
+    def executemany(self, operation, seq_params):
+        for params in seq_params:
+            self.execute(operation, params)
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self.description or ())
+
+    def _convert(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        if self._rows is not None:
+            return self._convert(self._rows.pop(0)) if self._rows else None
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        if self._rows is not None:
+            rows, self._rows = self._rows[:size], self._rows[size:]
+        else:
+            rows = self._cursor.fetchmany(size)
+        return [self._convert(row) for row in rows]
+
+    def fetchall(self):
+        if self._rows is not None:
+            rows, self._rows = self._rows, []
+        else:
+            rows = self._cursor.fetchall()
+        return [self._convert(row) for row in rows]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class FakeConnection:
+    """
+    Mimics a mysql-connector connection for throughput measurements.
+
+    SQLite has a single writer per database, so holding real transactions
+    open would serialize (and, with group commit across workers, deadlock)
+    what MySQL's row locks let run concurrently. Every statement is therefore
+    applied immediately; COMMIT, ROLLBACK and savepoints cost their round
+    trip and keep in_transaction accurate, but a rollback undoes nothing.
+    """
+    def __init__(self, server):
+        self.server = server
+        self.db = sqlite3.connect(server.path, timeout=60, check_same_thread=False, isolation_level=None)
+        self.db.create_function('UUID', 0, lambda: str(uuid.uuid4()))
+        for schema, path in server.attached.items():
+            self.db.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+        self.in_transaction = False
+        self.closed = False
+
+    def cursor(self, dictionary=False, prepared=False, **kwargs):
+        return FakeCursor(self, dictionary, prepared)
+
+    def start_transaction(self):
+        self.server.round_trip()
+        self.in_transaction = True
+
+    def commit(self):
+        self.server.round_trip(commit=True)
+        self.in_transaction = False
+
+    def rollback(self):
+        self.server.round_trip()
+        self.in_transaction = False
+
+    def is_connected(self):
+        return not self.closed
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self.server.round_trip()
+
+    def close(self):
+        self.closed = True
+        self.db.close()
+
+
+class FakeCluster:
+    """
+    The source and destination servers of a benchmark run. connect(config)
+    has the signature of connect_to_database and picks the server by
+    config['database']. With same_server, both schemas are on one server:
+    destination sessions can read the source as `bench_source`.
+    """
+    def __init__(self, directory, latency=0.0, same_server=False, contention=0.0):
+        source_path = os.path.join(directory, 'source.sqlite3')
+        self.source = FakeServer(source_path, latency)
+        self.destination = FakeServer(
+            os.path.join(directory, 'destination.sqlite3'), latency,
+            server_uuid=self.source.server_uuid if same_server else None,
+            attached={'bench_source': source_path} if same_server else None,
+            contention=contention
+        )
+
+    def connect(self, config):
+        server = self.source if config['database'] == 'bench_source' else self.destination
+        return server.connect()
+
+    @property
+    def round_trips(self):
+        return self.source.round_trips + self.destination.round_trips
+
+
+def install_fake_config():
+    """
+    Registers a src.database.config module pointing at the fake servers, so
+    the migration imports without the real (gitignored) credentials.
+    """
+    config = types.ModuleType('src.database.config')
+    config.source = {'host': 'fake-source', 'database': 'bench_source', 'user': 'bench'}
+    config.destination = {'host': 'fake-destination', 'database': 'bench_destination', 'user': 'bench'}
+    sys.modules['src.database.config'] = config
+    return config
+
+
+def seed(cluster, alarms, media_per_alarm=1, updates_per_alarm=4, video_tags_per_alarm=3,
+         duplicate_every=0, users=20):
+    """
+    Fills the source with `alarms` alarms of the given shape and returns
+    their ids. With duplicate_every=N, every Nth alarm already exists in the
+    destination, so it exercises the duplicate skip path.
+    """
+    now = datetime(2025, 1, 1)
+    source = sqlite3.connect(cluster.source.path)
+    destination = sqlite3.connect(cluster.destination.path)
+    with source, destination:
+        source.executemany("INSERT INTO alarm_types VALUES (?, ?)", SOURCE_ALARM_TYPES)
+        destination.executemany("INSERT INTO alarm_types VALUES (?, ?)", DESTINATION_ALARM_TYPES)
+        source.executemany(
+            "INSERT INTO users (id, name, email, is_enabled, tenant_id, role_id, msp_tenants) VALUES (?, ?, ?, 1, ?, ?, ?)",
+            [(f'user-{u}', f'Operator {u}', f'operator{u}@example.com', 'source-tenant', 'operator',
+              json.dumps(['source-tenant'])) for u in range(users)]
+        )
+        source.execute("INSERT INTO employees VALUES ('employee-1', 'source-tenant', 'Ada', 'Lovelace', '555-0100')")
+        alarm_ids = []
+        for i in range(alarms):
+            alarm_id = f'alarm-{i:07d}'
+            alarm_ids.append(alarm_id)
+            created_at = (now + timedelta(minutes=i)).isoformat(sep=' ')
+            source.execute(
+                "INSERT INTO raw_alarms_v2 (id, source_id, tenant_id, partition_key, alarm_type_id, source_entity_type, "
+                "employee_id, ml_output_id, true_alarm_probability, alarm_timestamp_utc, created_at_utc, updated_at_utc, "
+                "current_status, alarm_details) VALUES (?, ?, 'source-tenant', ?, ?, 'CAMERA', ?, ?, 0.9, ?, ?, ?, 'open', ?)",
+                (alarm_id, f'source-{i}', 202501, SOURCE_ALARM_TYPES[i % 2][0], 'employee-1' if i % 4 == 0 else None,
+                 f'ml-{i}' if video_tags_per_alarm is not None else None, created_at, created_at, created_at,
+                 json.dumps({'zone': i % 7}))
+            )
+            source.executemany(
+                "INSERT INTO alarm_media (alarm_id, media_type, media_url, created_at_utc, updated_at_utc) VALUES (?, ?, ?, ?, ?)",
+                [(alarm_id, 'video', f'https://media.example.com/{alarm_id}/{m}.mp4', created_at, created_at)
+                 for m in range(media_per_alarm)]
+            )
+            source.execute(
+                "INSERT INTO ml_outputs VALUES (?, ?, 0.9, 'bench', 'source-tenant', ?, ?, ?, ?, NULL)",
+                (f'ml-{i}', alarm_id, created_at, created_at, created_at, json.dumps([{'frame': f} for f in range(5)]))
+            )
+            source.executemany(
+                "INSERT INTO video_tags VALUES (?, ?, ?, 'source-tenant', ?, ?)",
+                [(f'tag-{i}-{t}', f'tag-{t}', f'ml-{i}', created_at, created_at) for t in range(video_tags_per_alarm)]
+            )
+            source.executemany(
+                "INSERT INTO alarm_updates VALUES (?, ?, ?, 'comment', ?, 'checked', 'open', 'source-tenant', ?)",
+                [(f'update-{i}-{u}', alarm_id, created_at, f'user-{(i + u) % users}', json.dumps({'step': u}))
+                 for u in range(updates_per_alarm)]
+            )
+            if duplicate_every and i % duplicate_every == 0:
+                destination.execute(
+                    "INSERT INTO raw_alarms_v2 (id, source_id, tenant_id, partition_key) VALUES (?, ?, ?, ?)",
+                    (f'existing-{i}', f'source-{i}', 'demo-sales', 202501)
+                )
+    source.close()
+    destination.close()
+    return alarm_ids
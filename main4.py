@@ -11,37 +11,30 @@ from src.services.alarm_type_service import get_alarm_type_id, get_alarm_type, g
 from src.services.alarm_update_service import fetch_alarm_updates, insert_alarm_updates
 from src.services.alarm_service import prepare_new_raw_alarm_data, insert_raw_alarm
 from src.models.state import DuplicationState
-from src.utils.logger import get_logger, add_file_handler
+from src.models.context import MigrationContext
+from src.models.ledger import MigrationLedger, DEFAULT_LEDGER_PATH, COMPLETED_STATUSES
+from src.utils.logger import get_logger, add_file_handler, close_alarm_log
 import uuid
 from datetime import datetime, timezone
 import csv
 import os
 
-def save_alarm_id_mapping(original_alarm_id, new_alarm_id, partition_key, csv_filename="alarm_id_mapping.csv"):
-    """Save the mapping of original and new alarm IDs to a CSV file"""
-    file_exists = os.path.exists(csv_filename)
-    
-    with open(csv_filename, 'a', newline='') as csvfile:
-        fieldnames = ['original_alarm_id', 'new_alarm_id', 'partition_key', 'migrated_at']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
-        # Write header only if file doesn't exist
-        if not file_exists:
-            writer.writeheader()
-        
-        writer.writerow({
-            'original_alarm_id': original_alarm_id,
-            'new_alarm_id': new_alarm_id,
-            'partition_key': partition_key,
-            'migrated_at': datetime.now().isoformat()
-        })
+def save_alarm_id_mapping(original_alarm_id, new_alarm_id, partition_key, csv_filename="alarm_id_mapping.csv",
+                          ledger_path=DEFAULT_LEDGER_PATH):
+    """Record the mapping in the ledger and append it to the CSV file"""
+    ledger = MigrationLedger(ledger_path, mapping_csv=csv_filename)
+    try:
+        ledger.record(original_alarm_id, "Success", new_alarm_id, partition_key)
+        ledger.export_csv(csv_filename)
+    finally:
+        ledger.close()
 
 def fetch_raw_alarm_by_id(source_connection, raw_alarm_id):
     cursor = source_connection.cursor(dictionary=True)
     cursor.execute("SELECT * FROM raw_alarms_v2 WHERE id = %s", (raw_alarm_id,))
     return cursor.fetchone()
 
-def main(original_raw_alarm_id):
+def main(original_raw_alarm_id, context=None):
     new_camera_id = '259e78d5-6ed1-4853-8b50-ca5413d0e2b4'
     new_tenant_id = 'demo-sales'
 
@@ -49,10 +42,14 @@ def main(original_raw_alarm_id):
     add_file_handler(logger, original_raw_alarm_id)
     state = DuplicationState()
     logs = []
+    source_conn = dest_conn = None
     try:
         logger.info("🚀 Starting Alarm Migration Process")
-        source_conn = connect_to_database(source)
-        dest_conn = connect_to_database(destination)
+        if context:
+            source_conn, dest_conn = context.acquire_connections()
+        else:
+            source_conn = connect_to_database(source)
+            dest_conn = connect_to_database(destination)
         if not source_conn or not dest_conn:
             logger.error("❌ Failed to connect to source or destination DB. Exiting.")
             return "Failed to connect to DB"
@@ -205,9 +202,13 @@ def main(original_raw_alarm_id):
         success = insert_raw_alarm(dest_conn, new_alarm_data)
         if success:
             logger.info(f"✅ Raw alarm inserted successfully with ID: {new_alarm_id}")
-            # Save the ID mapping to CSV
-            save_alarm_id_mapping(original_raw_alarm_id, new_alarm_id, partition_key)
-            logger.info(f"💾 Alarm ID mapping saved to CSV: {original_raw_alarm_id} -> {new_alarm_id} (partition: {partition_key})")
+            # Batch runs record the mapping in the ledger and export the CSV at the end
+            if context and context.ledger:
+                context.ledger.record(original_raw_alarm_id, "Success", new_alarm_id, partition_key)
+                logger.info(f"💾 Alarm ID mapping saved to ledger: {original_raw_alarm_id} -> {new_alarm_id} (partition: {partition_key})")
+            else:
+                save_alarm_id_mapping(original_raw_alarm_id, new_alarm_id, partition_key)
+                logger.info(f"💾 Alarm ID mapping saved to ledger and CSV: {original_raw_alarm_id} -> {new_alarm_id} (partition: {partition_key})")
         else:
             logger.error("❌ Failed to insert raw alarm.")
 
@@ -217,13 +218,17 @@ def main(original_raw_alarm_id):
         logger.error(f"❌ Exception: {str(e)}")
         return f"Error: {str(e)}"
     finally:
-        try:
-            source_conn.close()
-            dest_conn.close()
-        except:
-            pass
+        close_alarm_log()
+        if context:
+            context.release_connections(source_conn, dest_conn)
+        else:
+            try:
+                source_conn.close()
+                dest_conn.close()
+            except:
+                pass
 
-def batch_process_alarms(csv_path):
+def batch_process_alarms(csv_path, ledger_path=DEFAULT_LEDGER_PATH):
     if not os.path.exists(csv_path):
         print(f"❌ CSV file not found: {csv_path}")
         return
@@ -234,25 +239,47 @@ def batch_process_alarms(csv_path):
     
     print(f"📁 Processing alarms from: {csv_path}")
     
-    with open(csv_path, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for i, row in enumerate(reader, 1):
-            raw_alarm_id = row['raw_alarm_id']
-            print(f"Processing {i}: {raw_alarm_id}")
-            
-            try:
-                result = main(raw_alarm_id)
-                row['migration_status'] = result or "Success"
-                row['processed_at'] = datetime.now().isoformat()
-                if result == "Success":
-                    successful_rows += 1
-            except Exception as e:
-                row['migration_status'] = f"Error: {str(e)}"
-                row['processed_at'] = datetime.now().isoformat()
-                print(f"❌ Error processing {raw_alarm_id}: {str(e)}")
-            
-            rows.append(row)
-            total_rows += 1
+    # One pool per database for the whole batch instead of a connect per alarm
+    context = MigrationContext.from_configs(source, destination)
+    # Completed alarms of an earlier, interrupted run are skipped on restart
+    context.ledger = MigrationLedger(ledger_path, mapping_csv="alarm_id_mapping.csv")
+    try:
+        with open(csv_path, newline='') as csvfile:
+            reader = csv.DictReader(csvfile)
+            for i, row in enumerate(reader, 1):
+                raw_alarm_id = row['raw_alarm_id']
+                print(f"Processing {i}: {raw_alarm_id}")
+                
+                previous_status = context.ledger.status(raw_alarm_id)
+                if previous_status in COMPLETED_STATUSES:
+                    print(f"⏭️ Already migrated by an earlier run: {raw_alarm_id}")
+                    row['migration_status'] = previous_status
+                    row['processed_at'] = datetime.now().isoformat()
+                    successful_rows += previous_status == "Success"
+                    rows.append(row)
+                    total_rows += 1
+                    continue
+                
+                try:
+                    result = main(raw_alarm_id, context)
+                    row['migration_status'] = result or "Success"
+                    row['processed_at'] = datetime.now().isoformat()
+                    if result == "Success":
+                        successful_rows += 1
+                    else:
+                        context.ledger.record(raw_alarm_id, row['migration_status'])
+                except Exception as e:
+                    row['migration_status'] = f"Error: {str(e)}"
+                    row['processed_at'] = datetime.now().isoformat()
+                    print(f"❌ Error processing {raw_alarm_id}: {str(e)}")
+                    context.ledger.record(raw_alarm_id, row['migration_status'])
+                
+                rows.append(row)
+                total_rows += 1
+        context.ledger.export_csv("alarm_id_mapping.csv")
+    finally:
+        context.ledger.close()
+        context.close()
     
     # Write results to a new CSV file
     output_file = csv_path.replace('.csv', '_results.csv')
@@ -272,12 +299,13 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Migrate a raw alarm by ID or batch process from CSV')
     parser.add_argument('--batch', action='store_true', help='Process alarms in batch from alarms.csv')
     parser.add_argument('--csv', type=str, default='alarms.csv', help='Path to CSV file (default: alarms.csv)')
+    parser.add_argument('--ledger', type=str, default=DEFAULT_LEDGER_PATH, help='SQLite ledger used to resume interrupted batches')
     parser.add_argument('original_raw_alarm_id', type=str, nargs='?', help='The ID of the raw alarm to migrate')
     
     args = parser.parse_args()
     
     if args.batch:
-        batch_process_alarms(args.csv)
+        batch_process_alarms(args.csv, ledger_path=args.ledger)
     elif args.original_raw_alarm_id:
         main(args.original_raw_alarm_id)
     else:
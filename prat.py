@@ -1,7 +1,39 @@
 import os
+import re
 import csv
+import sqlite3
 import argparse
-from datetime import datetime
+from datetime import datetime, timedelta
+
+LOG_INDEX_FILE = '.log_index.sqlite3'
+LOG_LINE = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3})\] (\w+) ([\w.]+): (.*)$')
+
+# Pipeline stages in the order main() runs them
+STAGES = ['connect', 'fetch', 'duplicate_check', 'door', 'employee', 'alarm_type',
+          'media_fetch', 'media_insert', 'ml_output', 'alarm_updates', 'raw_alarm_insert', 'complete']
+
+# Log messages that mark the end of a stage: (message fragment, stage, outcome)
+STAGE_MARKERS = [
+    ('Starting Alarm Migration Process', 'connect', None),
+    ('Failed to connect to source or destination DB', 'connect', 'connect_failed'),
+    ('Original alarm fetched.', 'fetch', None),
+    ('Raw alarm not found', 'fetch', 'not_found'),
+    ('Duplicate alarm detected', 'duplicate_check', 'duplicate'),
+    ('Door already exists', 'door', None),
+    ('Inserted new door', 'door', None),
+    ('Employee already exists', 'employee', None),
+    ('Inserted new employee', 'employee', None),
+    ('No mapped alarm type', 'alarm_type', None),
+    ('Media record fetched.', 'media_fetch', None),
+    ('No media records found', 'media_fetch', None),
+    ('Media inserted with ID', 'media_insert', None),
+    ('Media insert failed', 'media_insert', None),
+    ('ML Output and', 'ml_output', None),
+    ('Alarm updates migrated', 'alarm_updates', None),
+    ('Raw alarm inserted successfully', 'raw_alarm_insert', None),
+    ('Failed to insert raw alarm', 'raw_alarm_insert', None),
+    ('Migration complete', 'complete', 'success'),
+]
 
 def extract_log_info_from_filename(filename):
     try:
@@ -43,8 +75,193 @@ def process_log_folder(folder_path, output_csv='parsed_logs.csv'):
 
     print(f"✅ Parsed {len(rows)} files. Output written to: {output_path}")
 
+def _parse_timestamp(date_part, millis):
+    return datetime.strptime(date_part, "%Y-%m-%d %H:%M:%S") + timedelta(milliseconds=int(millis))
+
+def parse_log_contents(file_path):
+    """
+    Reads one run's log and returns its outcome, the last stage it reached,
+    the stage it failed in (best guess for bare exceptions: the stage after the
+    last one reached), its errors and the seconds spent reaching each stage.
+    """
+    started_at = previous_at = None
+    stage, outcome, failed_stage = None, None, None
+    errors, timings = [], {}
+    with open(file_path, encoding='utf-8', errors='replace') as log_file:
+        for line in log_file:
+            match = LOG_LINE.match(line.rstrip('\n'))
+            if not match:
+                continue
+            date_part, millis, level, _, message = match.groups()
+            logged_at = _parse_timestamp(date_part, millis)
+            if STAGE_MARKERS[0][0] in message:
+                # Older logs append every retry to one file; keep the latest attempt
+                started_at = previous_at = None
+                stage, outcome, failed_stage = None, None, None
+                errors, timings = [], {}
+            started_at = started_at or logged_at
+            for fragment, marker_stage, marker_outcome in STAGE_MARKERS:
+                if fragment in message:
+                    if previous_at is not None:
+                        timings[marker_stage] = timings.get(marker_stage, 0.0) + (logged_at - previous_at).total_seconds()
+                    previous_at = logged_at
+                    stage = marker_stage
+                    outcome = marker_outcome or outcome
+                    break
+            else:
+                marker_stage = None
+            if level == 'ERROR':
+                errors.append((logged_at.isoformat(sep=' '), message))
+                if failed_stage is None:
+                    if marker_stage:
+                        failed_stage = marker_stage
+                    elif stage in STAGES[:-1]:
+                        failed_stage = STAGES[STAGES.index(stage) + 1]
+                    else:
+                        failed_stage = stage
+    if outcome is None:
+        outcome = 'failed' if errors else 'incomplete'
+    elif errors and outcome == 'success':
+        outcome = 'failed'
+    return {
+        'started_at': started_at.isoformat(sep=' ') if started_at else None,
+        'stage': stage,
+        'failed_stage': failed_stage,
+        'outcome': outcome,
+        'errors': errors,
+        'timings': timings,
+        'duration_s': (previous_at - started_at).total_seconds() if started_at and previous_at else None,
+    }
+
+def open_log_index(folder_path):
+    connection = sqlite3.connect(os.path.join(folder_path, LOG_INDEX_FILE))
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS log_runs (
+            filename TEXT PRIMARY KEY,
+            raw_alarm_id TEXT NOT NULL,
+            started_at TEXT,
+            mtime REAL NOT NULL,
+            size INTEGER NOT NULL,
+            outcome TEXT,
+            stage TEXT,
+            failed_stage TEXT,
+            error_count INTEGER NOT NULL,
+            duration_s REAL
+        );
+        CREATE TABLE IF NOT EXISTS log_errors (
+            filename TEXT NOT NULL,
+            logged_at TEXT,
+            message TEXT
+        );
+        CREATE TABLE IF NOT EXISTS stage_timings (
+            filename TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            seconds REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_runs_alarm ON log_runs (raw_alarm_id);
+        CREATE INDEX IF NOT EXISTS idx_runs_failed_stage ON log_runs (failed_stage, started_at);
+        CREATE INDEX IF NOT EXISTS idx_runs_outcome ON log_runs (outcome, started_at);
+        CREATE INDEX IF NOT EXISTS idx_errors_file ON log_errors (filename);
+        CREATE INDEX IF NOT EXISTS idx_timings_stage ON stage_timings (stage, seconds);
+        CREATE INDEX IF NOT EXISTS idx_timings_file ON stage_timings (filename);
+    """)
+    return connection
+
+def update_log_index(folder_path):
+    """
+    Incrementally indexes log contents: files whose mtime and size match the
+    index are skipped, changed files are re-parsed and deleted files dropped.
+    """
+    connection = open_log_index(folder_path)
+    known = {row[0]: (row[1], row[2]) for row in connection.execute("SELECT filename, mtime, size FROM log_runs")}
+    seen, parsed = set(), 0
+    with connection:
+        for entry in os.scandir(folder_path):
+            if not entry.name.endswith('.log') or not entry.is_file():
+                continue
+            seen.add(entry.name)
+            stat = entry.stat()
+            if known.get(entry.name) == (stat.st_mtime, stat.st_size):
+                continue
+            raw_alarm_id, timestamp = extract_log_info_from_filename(entry.name)
+            if not raw_alarm_id:
+                continue
+            run = parse_log_contents(entry.path)
+            _delete_indexed_file(connection, entry.name)
+            connection.execute(
+                "INSERT INTO log_runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (entry.name, raw_alarm_id,
+                 run['started_at'] or (timestamp.isoformat(sep=' ') if timestamp else None),
+                 stat.st_mtime, stat.st_size, run['outcome'], run['stage'], run['failed_stage'],
+                 len(run['errors']), run['duration_s'])
+            )
+            connection.executemany(
+                "INSERT INTO log_errors VALUES (?, ?, ?)",
+                [(entry.name, logged_at, message) for logged_at, message in run['errors']]
+            )
+            connection.executemany(
+                "INSERT INTO stage_timings VALUES (?, ?, ?)",
+                [(entry.name, stage, seconds) for stage, seconds in run['timings'].items()]
+            )
+            parsed += 1
+        removed = [filename for filename in known if filename not in seen]
+        for filename in removed:
+            _delete_indexed_file(connection, filename)
+    print(f"✅ Indexed {parsed} new or changed log(s), {len(seen) - parsed} unchanged, {len(removed)} removed.")
+    return connection
+
+def _delete_indexed_file(connection, filename):
+    connection.execute("DELETE FROM log_runs WHERE filename = ?", (filename,))
+    connection.execute("DELETE FROM log_errors WHERE filename = ?", (filename,))
+    connection.execute("DELETE FROM stage_timings WHERE filename = ?", (filename,))
+
+def query_log_index(connection, outcome=None, failed_stage=None, raw_alarm_id=None, since_days=None, limit=100):
+    conditions, params = [], []
+    if outcome:
+        conditions.append("outcome = ?")
+        params.append(outcome)
+    if failed_stage:
+        conditions.append("failed_stage = ?")
+        params.append(failed_stage)
+    if raw_alarm_id:
+        conditions.append("raw_alarm_id = ?")
+        params.append(raw_alarm_id)
+    if since_days is not None:
+        conditions.append("started_at >= ?")
+        params.append((datetime.now() - timedelta(days=since_days)).isoformat(sep=' '))
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return connection.execute(
+        "SELECT raw_alarm_id, started_at, outcome, stage, failed_stage, error_count, duration_s, filename "
+        f"FROM log_runs {where} ORDER BY started_at DESC LIMIT ?",
+        (*params, limit)
+    ).fetchall()
+
+def stage_timing_summary(connection):
+    return connection.execute(
+        "SELECT stage, COUNT(*), AVG(seconds), MAX(seconds) FROM stage_timings GROUP BY stage ORDER BY AVG(seconds) DESC"
+    ).fetchall()
+
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='Extract alarm log info to CSV')
+    parser = argparse.ArgumentParser(description='Extract alarm log info to CSV, or index and query log contents')
     parser.add_argument('folder_path', help='Path to folder containing .log files')
+    parser.add_argument('--index', action='store_true', help='Update the content index instead of writing parsed_logs.csv')
+    parser.add_argument('--no-scan', action='store_true', help='Query the index as it is, without rescanning the folder')
+    parser.add_argument('--outcome', choices=['success', 'failed', 'duplicate', 'not_found', 'connect_failed', 'incomplete'])
+    parser.add_argument('--failed-at', choices=STAGES, help='Stage a failed run broke in')
+    parser.add_argument('--alarm-id', help='Runs of one raw alarm')
+    parser.add_argument('--since-days', type=float, help='Only runs started in the last N days')
+    parser.add_argument('--timings', action='store_true', help='Print average and max seconds per stage')
+    parser.add_argument('--limit', type=int, default=100)
     args = parser.parse_args()
-    process_log_folder(args.folder_path)
+    querying = args.outcome or args.failed_at or args.alarm_id or args.since_days is not None or args.timings
+    if not (args.index or querying):
+        process_log_folder(args.folder_path)
+    else:
+        connection = open_log_index(args.folder_path) if args.no_scan else update_log_index(args.folder_path)
+        if args.timings:
+            for stage, runs, average, slowest in stage_timing_summary(connection):
+                print(f"{stage:<18} runs={runs:<8} avg={average:.3f}s max={slowest:.3f}s")
+        elif querying:
+            for row in query_log_index(connection, args.outcome, args.failed_at, args.alarm_id, args.since_days, args.limit):
+                print(' | '.join('' if value is None else str(value) for value in row))
+        connection.close()
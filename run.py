@@ -1,8 +1,11 @@
 import sys
-from src.main import main
+from src.main import main, migrate_single_alarm
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python run.py <RAW_ALARM_ID>")
+        print("Usage: python run.py <RAW_ALARM_ID> [--parallel-reads]")
         sys.exit(1)
-    main(sys.argv[1]) 
\ No newline at end of file
+    if "--parallel-reads" in sys.argv[2:]:
+        migrate_single_alarm(sys.argv[1], parallel_reads=True)
+    else:
+        main(sys.argv[1]) 
\ No newline at end of file
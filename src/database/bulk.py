@@ -0,0 +1,73 @@
+import re
+
+from src.utils.logger import get_logger
+logger = get_logger("db_bulk")
+
+DEFAULT_INSERT_CHUNK_SIZE = 500
+# Conservative default; the server value is read at the start of a batch run
+DEFAULT_MAX_PACKET_BYTES = 4 * 1024 * 1024
+# Room left in every packet for the statement header and protocol framing
+PACKET_HEADROOM_BYTES = 1024
+# Characters the connector sends backslash-escaped, two bytes each
+_ESCAPED_CHARS = re.compile(rb'[\\\'"\n\r\x00\x1a]')
+
+
+def read_max_allowed_packet(connection):
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT @@max_allowed_packet")
+        row = cursor.fetchone()
+        return int(row[0]) if row and row[0] else DEFAULT_MAX_PACKET_BYTES
+    except Exception as e:
+        logger.warning(f"Could not read max_allowed_packet, using {DEFAULT_MAX_PACKET_BYTES}: {e}")
+        return DEFAULT_MAX_PACKET_BYTES
+    finally:
+        cursor.close()
+
+
+def _estimate_value_size(value):
+    """
+    Upper bound on the bytes the connector sends for one value, with the
+    quotes and the separator around it.
+    """
+    if value is None:
+        return 6
+    if isinstance(value, (bytes, bytearray)):
+        # Escaped or hex-encoded, with an introducer such as _binary
+        return 2 * len(value) + 12
+    raw = str(value).encode('utf-8')
+    return len(raw) + len(_ESCAPED_CHARS.findall(raw)) + 4
+
+
+def split_rows(rows, chunk_size=DEFAULT_INSERT_CHUNK_SIZE, max_packet_bytes=DEFAULT_MAX_PACKET_BYTES):
+    """
+    Splits rows into chunks of at most chunk_size rows whose rendered VALUES
+    list stays under max_packet_bytes. A single oversized row still gets its
+    own chunk and is left for the server to accept or reject.
+    """
+    budget = max_packet_bytes - PACKET_HEADROOM_BYTES
+    chunk, chunk_bytes = [], 0
+    for row in rows:
+        row_bytes = sum(_estimate_value_size(value) for value in row) + 4
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + row_bytes > budget):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(row)
+        chunk_bytes += row_bytes
+    if chunk:
+        yield chunk
+
+
+def insert_rows(cursor, table, columns, rows, chunk_size=DEFAULT_INSERT_CHUNK_SIZE, max_packet_bytes=DEFAULT_MAX_PACKET_BYTES):
+    """
+    Writes rows (sequences ordered like columns) with multi-row INSERT
+    statements. Returns the number of statements sent.
+    """
+    column_list = ', '.join(columns)
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    statements = 0
+    for chunk in split_rows(rows, chunk_size, max_packet_bytes):
+        query = f"INSERT INTO {table} ({column_list}) VALUES " + ', '.join([row_placeholder] * len(chunk))
+        cursor.execute(query, [value for row in chunk for value in row])
+        statements += 1
+    return statements
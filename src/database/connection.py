@@ -1,5 +1,12 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
 import mysql.connector
 from mysql.connector import Error
+from src.database.schema import use_schema
+from src.database.statements import close_statements
 from src.utils.logger import get_logger
 logger = get_logger("db_connection")
 
@@ -11,4 +18,116 @@ def connect_to_database(config):
             return connection
     except Error as e:
         logger.error(f"Connection error: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+
+class ConnectionPool:
+    """
+    Keeps open connections to one database for the whole run.
+    Connections idle for over `health_check_interval` seconds are pinged before reuse.
+    """
+    def __init__(self, config, size=1, health_check_interval=30, connect=connect_to_database, profiler=None):
+        self.config = config
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+        self.profiler = profiler
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self.schema = None
+
+    def acquire(self, timeout=None):
+        connection = self._acquire(timeout)
+        if self.schema is not None:
+            use_schema(connection, self.schema)
+        return connection
+
+    def _acquire(self, timeout):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                connection = self._open_or_wait(timeout)
+                if connection is None:
+                    return None
+                return connection
+            if self._is_healthy(connection):
+                return connection
+            self._discard(connection)
+
+    def release(self, connection):
+        if connection is None:
+            return
+        try:
+            if connection.in_transaction:
+                connection.rollback()
+        except Error as e:
+            logger.warning(f"Dropping pooled connection that failed to reset: {e}")
+            self._discard(connection)
+            return
+        self._last_used[id(connection)] = time.monotonic()
+        self._idle.put(connection)
+
+    @contextmanager
+    def connection(self):
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close_all(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def _open_or_wait(self, timeout):
+        with self._lock:
+            can_open = self._created < self.size
+            if can_open:
+                self._created += 1
+        if not can_open:
+            try:
+                connection = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                logger.error("Timed out waiting for a pooled connection.")
+                return None
+            return connection if self._is_healthy(connection) else self._replace(connection)
+        connection = self._connect(self.config)
+        if connection is None:
+            with self._lock:
+                self._created -= 1
+        elif self.profiler:
+            connection = self.profiler.wrap(connection)
+        return connection
+
+    def _replace(self, connection):
+        self._discard(connection)
+        return self._open_or_wait(timeout=None)
+
+    def _is_healthy(self, connection):
+        last_used = self._last_used.get(id(connection), 0)
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        close_statements(connection)
+        try:
+            connection.ping(reconnect=True, attempts=3, delay=1)
+            return True
+        except Error as e:
+            logger.warning(f"Pooled connection to {self.config.get('host')} is stale: {e}")
+            return False
+
+    def _discard(self, connection):
+        self._last_used.pop(id(connection), None)
+        with self._lock:
+            self._created -= 1
+        close_statements(connection)
+        try:
+            connection.close()
+        except Error:
+            pass
@@ -0,0 +1,147 @@
+import binascii
+import datetime
+import decimal
+import json
+import os
+import re
+
+from src.utils.logger import get_logger
+logger = get_logger("db_load_data")
+
+# LOAD DATA defaults: tab-separated fields, newline-terminated lines,
+# backslash escapes and \N for NULL
+NULL_FIELD = b'\\N'
+_SPECIAL_BYTES = re.compile(rb'[\\\t\n\r\x00\x1a]')
+_ESCAPES = {b'\\': b'\\\\', b'\t': b'\\t', b'\n': b'\\n', b'\r': b'\\r', b'\x00': b'\\0', b'\x1a': b'\\Z'}
+# Warnings shown when a load is rejected for silently dropping or altering rows
+WARNINGS_SHOWN = 5
+
+
+def encode_field(value):
+    """
+    Renders one value as a LOAD DATA field. Datetimes use the server's
+    literal format, tz-aware ones converted to naive UTC; binary values are
+    hex-encoded, since the file is read as utf8mb4 (see StagingFile); dicts
+    and lists are serialized as JSON, and JSON read as text is copied as-is
+    like any other string.
+    """
+    if value is None:
+        return NULL_FIELD
+    if isinstance(value, bool):
+        return b'1' if value else b'0'
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return str(value).encode('ascii')
+    if isinstance(value, datetime.datetime):
+        if value.utcoffset() is not None:
+            # An offset in the literal is truncated with a warning
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        raw = value.isoformat(sep=' ').encode('ascii')
+    elif isinstance(value, (datetime.date, datetime.time)):
+        raw = value.isoformat().encode('ascii')
+    elif isinstance(value, datetime.timedelta):
+        # mysql-connector returns TIME columns as timedelta
+        seconds = int(value.total_seconds())
+        sign, seconds = ('-' if seconds < 0 else ''), abs(seconds)
+        raw = f"{sign}{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}".encode('ascii')
+    elif isinstance(value, (bytes, bytearray)):
+        return binascii.hexlify(value)
+    elif isinstance(value, (dict, list)):
+        raw = json.dumps(value).encode('utf-8')
+    else:
+        raw = str(value).encode('utf-8')
+    return _SPECIAL_BYTES.sub(lambda match: _ESCAPES[match.group()], raw)
+
+
+class StagingFile:
+    """
+    Rows of one table written to a LOAD DATA file, in `columns` order.
+    Columns given binary values are written hex-encoded and listed in
+    `binary_columns`, so load_file() decodes them with UNHEX(). Use it as a
+    context manager, or close() it, so an aborted chunk releases the file.
+    """
+    def __init__(self, path, table, columns):
+        self.path = path
+        self.table = table
+        self.columns = tuple(columns)
+        self.binary_columns = set()
+        self.rows = 0
+        self._text_columns = set()
+        self._file = open(path, 'wb')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_row(self, values):
+        if len(values) != len(self.columns):
+            raise ValueError(f"{self.table} row has {len(values)} value(s) for {len(self.columns)} column(s)")
+        for column, value in zip(self.columns, values):
+            if value is None:
+                continue
+            kind, other = (self.binary_columns, self._text_columns) if isinstance(value, (bytes, bytearray)) \
+                else (self._text_columns, self.binary_columns)
+            if column in other:
+                raise ValueError(f"{self.table}.{column} mixes binary and text values")
+            kind.add(column)
+        self._file.write(b'\t'.join(encode_field(value) for value in values) + b'\n')
+        self.rows += 1
+
+    def write_rows(self, rows):
+        for values in rows:
+            self.write_row(values)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def check_local_infile(connection):
+    """
+    Raises RuntimeError unless the server accepts LOAD DATA LOCAL INFILE.
+    The client side needs allow_local_infile=True in the connection config.
+    """
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT @@local_infile")
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row or not int(row[0]):
+        raise RuntimeError("The destination server has local_infile disabled; SET GLOBAL local_infile = 1 to bulk-load.")
+
+
+def load_file(connection, staging_file):
+    """
+    Loads a closed staging file into its table and returns the rows loaded.
+
+    LOCAL loads turn duplicate keys and conversion errors into warnings and
+    skip or alter the rows, so a row count mismatch or any warning raises
+    RuntimeError; the caller rolls the transaction back.
+    """
+    staging_file.close()
+    if not staging_file.rows:
+        return 0
+    columns = [f"@{column}" if column in staging_file.binary_columns else column for column in staging_file.columns]
+    decoded = [f"{column} = UNHEX(@{column})" for column in staging_file.columns if column in staging_file.binary_columns]
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {staging_file.table} CHARACTER SET utf8mb4 "
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({', '.join(columns)})" + (f" SET {', '.join(decoded)}" if decoded else ''),
+            (os.path.abspath(staging_file.path),)
+        )
+        loaded = cursor.rowcount
+        warnings = getattr(cursor, 'warning_count', 0) or 0
+        if warnings:
+            cursor.execute(f"SHOW WARNINGS LIMIT {WARNINGS_SHOWN}")
+            details = '; '.join(str(row[2]) for row in cursor.fetchall())
+            raise RuntimeError(f"Loading {staging_file.table} raised {warnings} warning(s): {details}")
+        if loaded != staging_file.rows:
+            raise RuntimeError(f"Loaded {loaded} of {staging_file.rows} {staging_file.table} row(s)")
+    finally:
+        cursor.close()
+    logger.info(f"📥 Loaded {loaded} {staging_file.table} row(s) from {staging_file.path}")
+    return loaded
@@ -0,0 +1,284 @@
+import contextvars
+import re
+import threading
+import time
+
+from mysql.connector import Error
+from src.utils.logger import get_logger
+logger = get_logger("db_profiling")
+
+DEFAULT_TOP_N = 15
+# Statements that EXPLAIN can describe without running them
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+
+# Round trips of the alarm being migrated by the current thread/task
+_current_alarm = contextvars.ContextVar('profiled_alarm', default=None)
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_GROUP = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_REPEATED_GROUP = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+
+
+def normalize_sql(query):
+    """
+    Reduces a statement to its shape, so the same query with different
+    values, IN-list lengths or multi-row VALUES counts is reported once.
+    """
+    if isinstance(query, (bytes, bytearray)):
+        query = query.decode('utf-8', errors='replace')
+    query = _WHITESPACE.sub(' ', query).strip()
+    query = _STRING_LITERAL.sub('?', query)
+    query = query.replace('%s', '?')
+    query = _NUMBER.sub('?', query)
+    query = _PLACEHOLDER_GROUP.sub('(...)', query)
+    return _REPEATED_GROUP.sub('(...)', query)
+
+
+class QueryBudgetExceeded(Exception):
+    """
+    Raised at the end of a profiled run when alarms issued more statements
+    than the configured per-alarm budget.
+    """
+    def __init__(self, budget, offenders):
+        worst = ', '.join(f"{alarm_id}={count}" for alarm_id, count in offenders[:10])
+        super().__init__(f"{len(offenders)} alarm(s) exceeded the budget of {budget} queries: {worst}")
+        self.budget = budget
+        self.offenders = offenders
+
+
+class ProfilingCursor:
+    """
+    Cursor wrapper that reports each statement's latency (execute plus
+    fetching) and rows returned or affected to the profiler.
+    """
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+        self._statement = None
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._connection.run_pending_explain()
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(operation, params, *args, **kwargs)
+        finally:
+            self._record(operation, params, time.perf_counter() - start)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._connection.run_pending_explain()
+        start = time.perf_counter()
+        try:
+            return self._cursor.executemany(operation, seq_params, *args, **kwargs)
+        finally:
+            self._record(operation, None, time.perf_counter() - start)
+
+    def _record(self, operation, params, elapsed):
+        rowcount = self._cursor.rowcount
+        returns_rows = getattr(self._cursor, 'with_rows', False)
+        rows = 0 if returns_rows or rowcount is None or rowcount < 0 else rowcount
+        self._statement = self._connection.profiler.record(operation, elapsed, rows)
+        if self._statement is not None:
+            self._connection.queue_explain(self._statement, operation, params)
+
+    def _fetched(self, rows, elapsed):
+        if self._statement is not None:
+            self._connection.profiler.add_fetch(self._statement, rows, elapsed)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(1 if row is not None else 0, time.perf_counter() - start)
+        return row
+
+    def fetchmany(self, size=1):
+        start = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(len(rows), time.perf_counter() - start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(len(rows), time.perf_counter() - start)
+        return rows
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class ProfilingConnection:
+    """
+    Connection wrapper handing out ProfilingCursors. commit() and rollback()
+    count as round trips too. EXPLAIN for a slow statement is sent just
+    before the connection's next statement, once its results are consumed.
+    """
+    def __init__(self, connection, profiler):
+        self._connection = connection
+        self.profiler = profiler
+        self._pending_explain = None
+
+    def cursor(self, *args, **kwargs):
+        return ProfilingCursor(self._connection.cursor(*args, **kwargs), self)
+
+    def commit(self):
+        self.run_pending_explain()
+        start = time.perf_counter()
+        try:
+            return self._connection.commit()
+        finally:
+            self.profiler.record('COMMIT', time.perf_counter() - start, 0)
+
+    def rollback(self):
+        self._pending_explain = None
+        start = time.perf_counter()
+        try:
+            return self._connection.rollback()
+        finally:
+            self.profiler.record('ROLLBACK', time.perf_counter() - start, 0)
+
+    def queue_explain(self, statement, operation, params):
+        if self.profiler.wants_explain(statement):
+            self._pending_explain = (statement, operation, params)
+
+    def run_pending_explain(self):
+        if self._pending_explain is None:
+            return
+        statement, operation, params = self._pending_explain
+        self._pending_explain = None
+        cursor = self._connection.cursor(dictionary=True)
+        try:
+            cursor.execute(f"EXPLAIN {operation}", params)
+            self.profiler.set_explain(statement, cursor.fetchall())
+        except Error as e:
+            logger.warning(f"EXPLAIN failed for {statement}: {e}")
+            self.profiler.set_explain(statement, [{'error': str(e)}])
+        finally:
+            cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class QueryProfiler:
+    """
+    Opt-in statement profiler for a run. Connections opened by a pool with a
+    profiler are wrapped, so every service's cursor is measured without
+    touching the services. Collects per-statement totals and round trips per
+    alarm, prints a top-N report and can enforce a per-alarm query budget.
+
+    Listeners get observe_statement(normalized_sql, seconds, rows) for every
+    statement, e.g. MigrationMetrics for per-table insert latency.
+    """
+    def __init__(self, top_n=DEFAULT_TOP_N, explain_threshold_ms=None, query_budget=None, listeners=()):
+        self.top_n = top_n
+        self.explain_threshold_ms = explain_threshold_ms
+        self.query_budget = query_budget
+        self.statements = {}
+        self.alarm_queries = {}
+        self.listeners = list(listeners)
+        self._lock = threading.Lock()
+
+    def wrap(self, connection):
+        if connection is None or isinstance(connection, ProfilingConnection):
+            return connection
+        return ProfilingConnection(connection, self)
+
+    def begin_alarm(self, alarm_id):
+        return _current_alarm.set({'alarm_id': alarm_id, 'queries': 0})
+
+    def end_alarm(self, token):
+        alarm = _current_alarm.get()
+        _current_alarm.reset(token)
+        if alarm is None:
+            return
+        with self._lock:
+            queries = self.alarm_queries[alarm['alarm_id']] = alarm['queries']
+        if self.query_budget is not None and queries > self.query_budget:
+            logger.warning(
+                f"⚠️ Alarm {alarm['alarm_id']} issued {queries} queries, over the budget of {self.query_budget}."
+            )
+
+    def record(self, operation, elapsed, rows):
+        key = normalize_sql(operation)
+        # fetch_alarm_sources threads share the alarm's context
+        alarm = _current_alarm.get()
+        with self._lock:
+            if alarm is not None:
+                alarm['queries'] += 1
+            statement = self.statements.get(key)
+            if statement is None:
+                statement = self.statements[key] = {
+                    'sql': key, 'calls': 0, 'total_s': 0.0, 'max_s': 0.0, 'rows': 0, 'explain': None
+                }
+            statement['calls'] += 1
+            statement['total_s'] += elapsed
+            statement['max_s'] = max(statement['max_s'], elapsed)
+            statement['rows'] += rows
+        for listener in self.listeners:
+            listener.observe_statement(key, elapsed, rows)
+        return statement
+
+    def add_fetch(self, statement, rows, elapsed):
+        with self._lock:
+            statement['rows'] += rows
+            statement['total_s'] += elapsed
+
+    def wants_explain(self, statement):
+        return (
+            self.explain_threshold_ms is not None
+            and statement['explain'] is None
+            and statement['max_s'] * 1000 >= self.explain_threshold_ms
+            and statement['sql'].lstrip('( ').upper().startswith(EXPLAINABLE)
+        )
+
+    def set_explain(self, statement, plan):
+        with self._lock:
+            statement['explain'] = plan
+
+    def budget_offenders(self):
+        if self.query_budget is None:
+            return []
+        with self._lock:
+            offenders = [(alarm_id, count) for alarm_id, count in self.alarm_queries.items() if count > self.query_budget]
+        return sorted(offenders, key=lambda offender: offender[1], reverse=True)
+
+    def check_budget(self):
+        offenders = self.budget_offenders()
+        if offenders:
+            raise QueryBudgetExceeded(self.query_budget, offenders)
+
+    def report(self):
+        with self._lock:
+            statements = sorted(self.statements.values(), key=lambda statement: statement['total_s'], reverse=True)
+            alarm_queries = dict(self.alarm_queries)
+        total_calls = sum(statement['calls'] for statement in statements)
+        lines = [f"📊 Query profile: {total_calls} statements, {len(statements)} distinct, {len(alarm_queries)} alarms"]
+        if alarm_queries:
+            counts = sorted(alarm_queries.values())
+            lines.append(
+                f"   queries/alarm: avg {sum(counts) / len(counts):.1f}, median {counts[len(counts) // 2]}, max {counts[-1]}"
+            )
+        lines.append(f"   {'calls':>7} {'total ms':>10} {'avg ms':>8} {'max ms':>8} {'rows':>8}  statement")
+        for statement in statements[:self.top_n]:
+            lines.append(
+                f"   {statement['calls']:>7} {statement['total_s'] * 1000:>10.1f} "
+                f"{statement['total_s'] * 1000 / statement['calls']:>8.2f} {statement['max_s'] * 1000:>8.2f} "
+                f"{statement['rows']:>8}  {statement['sql'][:160]}"
+            )
+            for plan_row in statement['explain'] or []:
+                lines.append(f"{'':>50}EXPLAIN {plan_row}")
+        offenders = self.budget_offenders()
+        if offenders:
+            lines.append(f"   ❌ {len(offenders)} alarm(s) over the budget of {self.query_budget} queries")
+        return '\n'.join(lines)
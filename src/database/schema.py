@@ -0,0 +1,133 @@
+from src.utils.logger import get_logger
+logger = get_logger("db_schema")
+
+# Every projection declared by a service, checked together at startup
+_PROJECTIONS = []
+
+
+class SchemaMismatch(Exception):
+    """
+    Raised at startup when a declared column is missing from the source or
+    destination schema, before any alarm is migrated.
+    """
+
+
+class TableProjection:
+    """
+    The source columns one stage reads from `table`, and the destination
+    columns it writes back, so only those cross the wire.
+
+    Stages that copy rows wholesale (`copy_columns=True`) read every source
+    column the destination table also has; `columns` then only lists the
+    ones the code relies on. Those columns depend on the schemas, so they
+    come from the ProjectedSchema the connection carries; on a connection
+    without one, such a stage reads every column.
+    """
+    def __init__(self, table, columns=(), destination_columns=(), copy_columns=False):
+        self.table = table
+        self.declared = tuple(columns)
+        self.destination_columns = tuple(destination_columns)
+        self.copy_columns = copy_columns
+        _PROJECTIONS.append(self)
+
+    def columns_for(self, connection):
+        """
+        The columns read on `connection`; None means every column.
+        """
+        if not self.copy_columns:
+            return self.declared
+        schema = getattr(connection, '_projected_schema', None)
+        return schema.columns(self) if schema else None
+
+    def select_list(self, connection):
+        columns = self.columns_for(connection)
+        return '*' if columns is None else ', '.join(columns)
+
+    def _resolve(self, source_columns, destination_columns):
+        """
+        Returns the problems found and, for wholesale copies, the columns to copy.
+        """
+        problems = []
+        if source_columns is None:
+            return [f"source table {self.table} not found"], None
+        missing = [column for column in self.declared if column not in source_columns]
+        if missing:
+            problems.append(f"source {self.table} lacks {', '.join(missing)}")
+        if destination_columns is None:
+            if self.destination_columns or self.copy_columns:
+                problems.append(f"destination table {self.table} not found")
+            return problems, None
+        missing = [column for column in self.destination_columns if column not in destination_columns]
+        if missing:
+            problems.append(f"destination {self.table} lacks {', '.join(missing)}")
+        if not self.copy_columns or problems:
+            return problems, None
+        dropped = [column for column in source_columns if column not in destination_columns]
+        if dropped:
+            logger.warning(f"⚠️ Source {self.table} columns not in the destination are not copied: {', '.join(dropped)}")
+        return problems, tuple(column for column in source_columns if column in destination_columns)
+
+
+class ProjectedSchema:
+    """
+    The outcome of check_schema() for one source and destination pair: the
+    columns every wholesale-copy projection reads there. Connections carry
+    it (see use_schema), so runs against other databases are unaffected.
+    """
+    def __init__(self, copied_columns):
+        self._copied_columns = copied_columns
+
+    def columns(self, projection):
+        if not projection.copy_columns:
+            return projection.declared
+        return self._copied_columns.get(projection.table)
+
+
+def use_schema(connection, schema):
+    """
+    Makes the projections read on `connection` follow `schema`.
+    """
+    if connection is not None:
+        connection._projected_schema = schema
+
+
+def read_table_columns(connection, tables):
+    """
+    Returns {table: [column, ...]} in table order for the tables that exist.
+    """
+    placeholders = ', '.join(['%s'] * len(tables))
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT TABLE_NAME, COLUMN_NAME FROM information_schema.COLUMNS "
+            f"WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN ({placeholders}) "
+            "ORDER BY TABLE_NAME, ORDINAL_POSITION",
+            tuple(tables)
+        )
+        columns = {}
+        for table, column in cursor.fetchall():
+            columns.setdefault(table, []).append(column)
+        return columns
+    finally:
+        cursor.close()
+
+
+def check_schema(source_conn, dest_conn):
+    """
+    Checks every declared projection against both schemas with one query per
+    database and returns the ProjectedSchema of the pair.
+    Raises SchemaMismatch listing every problem found.
+    """
+    tables = sorted({projection.table for projection in _PROJECTIONS})
+    source_columns = read_table_columns(source_conn, tables)
+    destination_columns = read_table_columns(dest_conn, tables)
+    problems, copied_columns = [], {}
+    for projection in _PROJECTIONS:
+        found, columns = projection._resolve(source_columns.get(projection.table), destination_columns.get(projection.table))
+        problems += found
+        if columns is not None:
+            copied_columns[projection.table] = columns
+    if problems:
+        raise SchemaMismatch("; ".join(problems))
+    logger.info(f"✅ Column projections checked for {len(tables)} table(s).")
+    return ProjectedSchema(copied_columns)
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+
+from mysql.connector import Error
+from src.utils.logger import get_logger
+logger = get_logger("db_statements")
+
+# Prepared statements kept open per connection; the least recently used one
+# is deallocated beyond this (the server caps them at max_prepared_stmt_count)
+MAX_CACHED_STATEMENTS = 64
+
+
+class StatementCache:
+    """
+    Server-side prepared statements of one connection, keyed by the table
+    and column tuple they were built for. Each statement text is built once
+    and prepared once; later calls rebind parameters on the same prepared
+    cursor (binary protocol) instead of sending and parsing new SQL.
+    A connection is used by one thread at a time, so no locking is needed.
+    """
+    def __init__(self, connection, max_statements=MAX_CACHED_STATEMENTS):
+        self.connection = connection
+        self.max_statements = max_statements
+        self._statements = OrderedDict()
+
+    def _statement(self, key, build_sql, dictionary=False):
+        entry = self._statements.get(key)
+        if entry is not None:
+            self._statements.move_to_end(key)
+            return entry
+        cursor = self.connection.cursor(prepared=True, dictionary=dictionary)
+        entry = (build_sql(), cursor)
+        self._statements[key] = entry
+        if len(self._statements) > self.max_statements:
+            _, (_, oldest) = self._statements.popitem(last=False)
+            _close_quietly(oldest)
+        return entry
+
+    def insert(self, table, columns, values):
+        """
+        Inserts one row; returns the cursor so callers can read lastrowid.
+        """
+        columns = tuple(columns)
+        sql, cursor = self._statement(
+            ('insert', table, columns),
+            lambda: f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        )
+        cursor.execute(sql, tuple(values))
+        return cursor
+
+    def select(self, table, select_list, where_columns, values, limit=None):
+        """
+        Runs `SELECT select_list FROM table WHERE col = %s AND ...` and
+        returns every row as a dict.
+        """
+        where_columns = tuple(where_columns)
+
+        def build_sql():
+            sql = f"SELECT {select_list} FROM {table} WHERE " + ' AND '.join(f"{column} = %s" for column in where_columns)
+            return f"{sql} LIMIT {int(limit)}" if limit else sql
+
+        sql, cursor = self._statement(('select', table, select_list, where_columns, limit), build_sql, dictionary=True)
+        cursor.execute(sql, tuple(values))
+        return cursor.fetchall()
+
+    def select_one(self, table, select_list, where_columns, values):
+        rows = self.select(table, select_list, where_columns, values, limit=1)
+        return rows[0] if rows else None
+
+    def close(self):
+        while self._statements:
+            _, (_, cursor) = self._statements.popitem()
+            _close_quietly(cursor)
+
+
+def _close_quietly(cursor):
+    try:
+        cursor.close()
+    except Error as e:
+        logger.debug(f"Closing a prepared statement failed: {e}")
+
+
+def statements_for(connection):
+    """
+    Returns the connection's StatementCache, creating it on first use.
+    The cache lives on the connection object, so it goes away with it.
+    """
+    cache = getattr(connection, '_statement_cache', None)
+    if cache is None:
+        cache = connection._statement_cache = StatementCache(connection)
+    return cache
+
+
+def close_statements(connection):
+    """
+    Deallocates the connection's prepared statements, e.g. before it is
+    closed or when a reconnect may have invalidated them.
+    """
+    cache = getattr(connection, '_statement_cache', None)
+    if cache:
+        connection._statement_cache = None
+        cache.close()
@@ -0,0 +1,124 @@
+from mysql.connector import Error
+from src.utils.logger import get_logger
+logger = get_logger("db_transaction")
+
+
+class GroupCommitError(Exception):
+    """
+    Raised when committing a group fails; every alarm in `alarm_ids` was
+    rolled back with it. `includes_current` tells whether the alarm being
+    closed when it was raised is one of them.
+    """
+    def __init__(self, alarm_ids, error, includes_current=False):
+        super().__init__(f"Group commit failed for {len(alarm_ids)} alarm(s): {error}")
+        self.alarm_ids = alarm_ids
+        self.error = error
+        self.includes_current = includes_current
+
+
+class GroupCommitter:
+    """
+    Writes every row of an alarm in one destination transaction and commits
+    `group_size` alarms together. With groups larger than one, each alarm runs
+    inside its own savepoint so a failing alarm is rolled back on its own
+    without aborting the rest of the group.
+    """
+    def __init__(self, group_size=1):
+        self.group_size = max(1, group_size)
+        self.connection = None
+        self._pending_alarm_ids = []
+        self._savepoint = None
+        self._counter = 0
+        self._current_alarm_id = None
+        self._alarm_callbacks = []
+        self._group_callbacks = []
+
+    def begin_alarm(self, connection, alarm_id):
+        if self.connection is not None and connection is not self.connection:
+            raise RuntimeError("GroupCommitter is bound to a different connection")
+        self.connection = connection
+        if not connection.in_transaction:
+            connection.start_transaction()
+        if self.group_size > 1:
+            self._counter += 1
+            self._savepoint = f"alarm_{self._counter}"
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"SAVEPOINT {self._savepoint}")
+            finally:
+                cursor.close()
+        self._current_alarm_id = alarm_id
+        self._alarm_callbacks = []
+
+    def after_commit(self, callback):
+        """
+        Runs callback once the current alarm is durably committed; it is
+        dropped if the alarm or its group is rolled back.
+        """
+        self._alarm_callbacks.append(callback)
+
+    def end_alarm(self, failed=False):
+        """
+        Closes the current alarm. Raises GroupCommitError when this alarm
+        completes a group whose commit fails.
+        """
+        if failed:
+            self._alarm_callbacks = []
+            self._rollback_alarm()
+            return
+        if self._savepoint:
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(f"RELEASE SAVEPOINT {self._savepoint}")
+            finally:
+                cursor.close()
+            self._savepoint = None
+        self._pending_alarm_ids.append(self._current_alarm_id)
+        self._group_callbacks.extend(self._alarm_callbacks)
+        self._alarm_callbacks = []
+        if len(self._pending_alarm_ids) >= self.group_size:
+            self._commit(includes_current=True)
+
+    def commit(self):
+        self._commit()
+
+    def _commit(self, includes_current=False):
+        if self.connection is None or not self._pending_alarm_ids:
+            return
+        alarm_ids, self._pending_alarm_ids = self._pending_alarm_ids, []
+        callbacks, self._group_callbacks = self._group_callbacks, []
+        try:
+            self.connection.commit()
+        except Error as e:
+            logger.error(f"❌ Group commit of {len(alarm_ids)} alarm(s) failed: {e}")
+            self._rollback_all()
+            raise GroupCommitError(alarm_ids, e, includes_current)
+        for callback in callbacks:
+            callback()
+        logger.info(f"Committed {len(alarm_ids)} alarm(s) in one transaction.")
+
+    def _rollback_alarm(self):
+        if self._savepoint:
+            savepoint, self._savepoint = self._savepoint, None
+            cursor = self.connection.cursor()
+            try:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                return
+            except Error as e:
+                # The savepoint is gone with the transaction; the group goes too
+                alarm_ids, self._pending_alarm_ids = self._pending_alarm_ids, []
+                self._rollback_all()
+                if alarm_ids:
+                    raise GroupCommitError(alarm_ids, e, includes_current=False)
+                return
+            finally:
+                cursor.close()
+        self._pending_alarm_ids = []
+        self._rollback_all()
+
+    def _rollback_all(self):
+        self._group_callbacks = []
+        try:
+            self.connection.rollback()
+        except Error as e:
+            logger.warning(f"Rollback failed: {e}")
@@ -1,99 +1,227 @@
 import argparse
 from src.database.config import source, destination
 from src.database.connection import connect_to_database
-from src.services.door_service import fetch_door_data_by_id, insert_door_data_to_destination, get_door_from_destination
-from src.services.employee_service import fetch_employee_data_by_id, insert_employee_data_to_destination, get_employee_from_destination
-from src.services.media_service import fetch_alarm_media_by_alarm_id, insert_alarm_media_and_get_id
+from src.services.employee_service import fetch_employee_data_by_id, EmployeeIndex
+from src.services.media_service import (
+    fetch_alarm_media_by_alarm_id, fetch_alarm_media_by_alarm_ids, insert_alarm_media_and_get_id, insert_alarm_media_bulk,
+    delete_alarm_media, media_to_copy
+)
 from src.services.ml_service import fetch_ml_output_by_id, fetch_video_tags_by_ml_output_id, insert_ml_output_to_destination, insert_video_tags_to_destination
-from src.services.alarm_type_service import get_alarm_type_id, get_alarm_type, get_respective_alarm_type_id_from_destination
-from src.services.alarm_update_service import fetch_alarm_updates, insert_alarm_updates
-from src.services.alarm_service import prepare_new_raw_alarm_data, insert_raw_alarm
+from src.services.alarm_type_service import get_alarm_type, get_respective_alarm_type_id_from_destination
+from src.services.alarm_update_service import fetch_alarm_updates, fetch_alarm_update_user_ids, insert_alarm_updates
+from src.services.bulk_load_service import BulkLoader, DEFAULT_STAGING_DIR
+from src.services.server_copy_service import ServerSideCopy
+from src.services.alarm_service import (
+    prepare_new_raw_alarm_data, insert_raw_alarm, find_existing_raw_alarm_keys, stream_raw_alarms, RAW_ALARM_PROJECTION
+)
 from src.models.state import DuplicationState
-from src.utils.logger import get_logger, add_file_handler
+from src.models.context import MigrationContext
+from src.models.ledger import MigrationLedger, DEFAULT_LEDGER_PATH
+from src.models.selection import AlarmSelection
+from src.database.bulk import DEFAULT_INSERT_CHUNK_SIZE
+from src.database.schema import check_schema, use_schema
+from src.database.transaction import GroupCommitError
+from src.utils.logger import get_logger, add_file_handler, close_alarm_log
+from src.utils.tracing import AlarmTrace, span, start_tracing
+from src.database.profiling import QueryProfiler, DEFAULT_TOP_N
+from src.utils.metrics import MigrationMetrics, DEFAULT_METRICS_INTERVAL
+from src.utils.concurrency import AdaptiveConcurrency
 import uuid
 import datetime
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+DEFAULT_CHUNK_SIZE = 500
+MAPPING_CSV = 'alarm_id_mapping.csv'
+NEW_CAMERA_ID = '259e78d5-6ed1-4853-8b50-ca5413d0e2b4'
+NEW_TENANT_ID = 'demo-sales'
+NEW_DOOR_ID = '245c9fd3-c255-411b-acc9-60d1a5aef723'
 
 
 def fetch_raw_alarm_by_id(source_connection, raw_alarm_id):
     cursor = source_connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM raw_alarms_v2 WHERE id = %s", (raw_alarm_id,))
+    cursor.execute(f"SELECT {RAW_ALARM_PROJECTION.select_list(source_connection)} FROM raw_alarms_v2 WHERE id = %s", (raw_alarm_id,))
     return cursor.fetchone()
 
-def main(original_raw_alarm_id):
-    new_camera_id = '259e78d5-6ed1-4853-8b50-ca5413d0e2b4'
-    new_tenant_id = 'demo-sales'
+def fetch_raw_alarms_by_ids(source_connection, raw_alarm_ids, columns=None):
+    """
+    Fetches a whole chunk of raw alarms in one round-trip, keyed by id,
+    with `columns` or the projection.
+    """
+    if not raw_alarm_ids:
+        return {}
+    cursor = source_connection.cursor(dictionary=True)
+    placeholders = ', '.join(['%s'] * len(raw_alarm_ids))
+    select_list = ', '.join(columns) if columns else RAW_ALARM_PROJECTION.select_list(source_connection)
+    cursor.execute(
+        f"SELECT {select_list} FROM raw_alarms_v2 WHERE id IN ({placeholders})",
+        tuple(raw_alarm_ids)
+    )
+    return {row['id']: row for row in cursor.fetchall()}
+
+def fetch_alarm_sources(source_conn, original_raw_alarm_id, original_alarm, context=None, with_media=True):
+    """
+    Runs the source reads of one alarm that do not depend on each other. With
+    context.parallel_reads they run concurrently, each on its own pooled source
+    connection, so the alarm waits for the slowest read instead of their sum.
+    """
+    employee_id = original_alarm.get('employee_id')
+    ml_output_id = original_alarm.get('ml_output_id')
+    reads = {'alarm_updates': (fetch_alarm_updates, original_raw_alarm_id)}
+    if with_media:
+        reads['media_records'] = (fetch_alarm_media_by_alarm_id, original_raw_alarm_id)
+    if employee_id:
+        reads['employee_data'] = (fetch_employee_data_by_id, employee_id)
+    if ml_output_id:
+        reads['ml_output_data'] = (fetch_ml_output_by_id, ml_output_id)
+        reads['video_tags'] = (fetch_video_tags_by_ml_output_id, ml_output_id)
+    if not (context and context.alarm_types):
+        reads['source_alarm_type'] = (get_alarm_type, original_alarm.get('alarm_type_id'))
+
+    if not (context and context.parallel_reads):
+        return {name: fetch(source_conn, arg) for name, (fetch, arg) in reads.items()}
+
+    def run_on_pooled_connection(fetch, arg):
+        with context.source_pool.connection() as conn:
+            if conn is None:
+                raise RuntimeError("Failed to connect to source DB")
+            return fetch(conn, arg)
+
+    # The caller's own connection serves the first read while the rest fan out
+    (first_name, (first_fetch, first_arg)), *others = reads.items()
+    # Each read carries the alarm's context (log file, profiled round trips)
+    futures = {name: context.read_executor.submit(contextvars.copy_context().run, run_on_pooled_connection, fetch, arg)
+               for name, (fetch, arg) in others}
+    results = {first_name: first_fetch(source_conn, first_arg)}
+    for name, future in futures.items():
+        results[name] = future.result()
+    return results
+
+def main(original_raw_alarm_id, context=None, original_alarm=None, duplicate_checked=False, copied_media=None):
+    new_camera_id = NEW_CAMERA_ID
+    new_tenant_id = NEW_TENANT_ID
 
     logger = get_logger("alarm_migration")
     add_file_handler(logger, original_raw_alarm_id)
     state = DuplicationState()
+    trace = AlarmTrace(original_raw_alarm_id)
+    profiler = context.profiler if context else None
+    profiled_alarm = profiler.begin_alarm(original_raw_alarm_id) if profiler else None
     logs = []
+    insert_options = context.insert_options() if context else {}
+    transactions = context.transactions if context else None
+    commit = context.commit_writes if context else True
+    alarm_in_transaction = False
+    failed = False
+    failure_kind = None
+    source_conn = dest_conn = None
     try:
         logger.info("🚀 Starting Alarm Migration Process")
-        source_conn = connect_to_database(source)
-        dest_conn = connect_to_database(destination)
+        trace.stage("connect")
+        if context:
+            # Once per context; the pooled connections then carry the schema
+            context.check_schema()
+            source_conn, dest_conn = context.acquire_connections()
+        else:
+            source_conn = connect_to_database(source)
+            dest_conn = connect_to_database(destination)
         if not source_conn or not dest_conn:
             logger.error("❌ Failed to connect to source or destination DB. Exiting.")
-            return "Failed to connect to DB"
-        # 1️⃣ Fetch original raw alarm
-        original_alarm = fetch_raw_alarm_by_id(source_conn, original_raw_alarm_id)
+            return trace.result("Failed to connect to DB")
+        if not context:
+            schema = check_schema(source_conn, dest_conn)
+            use_schema(source_conn, schema)
+            use_schema(dest_conn, schema)
+        if transactions:
+            transactions.begin_alarm(dest_conn, original_raw_alarm_id)
+            alarm_in_transaction = True
+        # 1️⃣ Fetch original raw alarm (batch mode hands in the prefetched row)
+        trace.stage("fetch")
+        if original_alarm is None:
+            original_alarm = fetch_raw_alarm_by_id(source_conn, original_raw_alarm_id)
         if not original_alarm:
             logger.error("❌ Raw alarm not found. Exiting.")
-            return "Raw alarm not found"
+            return trace.result("Raw alarm not found")
+        trace.add_rows(1)
         logger.info("✅ Original alarm fetched.")
         # Extract unique fields for duplicate check
         source_id = original_alarm.get('source_id')
         partition_key = original_alarm.get('partition_key')
-        tenant_id = 'demo-sales'
+        tenant_id = NEW_TENANT_ID
         from src.services.alarm_service import find_existing_raw_alarm, find_conflicting_location_alarm_info
-        existing_alarm = find_existing_raw_alarm(dest_conn, source_id, tenant_id, partition_key)
-        if existing_alarm:
-            logger.warning(
-                f"⚠️ Duplicate alarm detected in destination for source_id={source_id}, tenant_id={tenant_id}, partition_key={partition_key}. Skipping migration."
-            )
-            return "Duplicate alarm detected, skipped."
+        # Batch mode has already resolved duplicates for the whole chunk
+        if not duplicate_checked:
+            trace.stage("duplicate_check")
+            existing_alarm = find_existing_raw_alarm(dest_conn, source_id, tenant_id, partition_key)
+            if existing_alarm:
+                logger.warning(
+                    f"⚠️ Duplicate alarm detected in destination for source_id={source_id}, tenant_id={tenant_id}, partition_key={partition_key}. Skipping migration."
+                )
+                return trace.result("Duplicate alarm detected, skipped.")
+
+        # Independent source reads (sequential unless --parallel-reads)
+        trace.stage("source_reads")
+        # Batch chunks with --bulk-media have copied the media already
+        sources = fetch_alarm_sources(source_conn, original_raw_alarm_id, original_alarm, context,
+                                      with_media=copied_media is None)
+        trace.add_rows(sum(len(value) if isinstance(value, list) else 1 for value in sources.values() if value))
+        trace.tag(
+            media_records=len(copied_media.media_ids) if copied_media else len(sources['media_records'] or []),
+            alarm_updates=len(sources['alarm_updates'] or []),
+            video_tags=len(sources.get('video_tags') or []),
+            has_employee=bool(sources.get('employee_data')),
+            has_ml_output=bool(sources.get('ml_output_data')),
+        )
+
         # 2️⃣ Handle Door
-        new_door_id = "245c9fd3-c255-411b-acc9-60d1a5aef723"
+        new_door_id = NEW_DOOR_ID
         # door_id = original_alarm.get('door_id')
         # if door_id:
         #     door_data = fetch_door_data_by_id(source_conn, door_id)
         #     if door_data:
-        #         existing_door = get_door_from_destination(dest_conn, door_data)
-        #         if existing_door:
-        #             new_door_id = existing_door['id']
-        #             logger.info(f"✅ Door already exists in destination with ID: {new_door_id}")
-        #         else:
-        #             new_door_id = str(uuid.uuid4())
-        #             insert_door_data_to_destination(dest_conn, door_data, new_door_id)
+        #         door_index = context.door_index if context else DoorIndex()
+        #         new_door_id, inserted = door_index.resolve(dest_conn, door_data, commit)
+        #         if inserted:
         #             logger.info(f"✅ Inserted new door with ID: {new_door_id}")
+        #         else:
+        #             logger.info(f"✅ Door already exists in destination with ID: {new_door_id}")
 
         # 3️⃣ Handle Employee
+        trace.stage("employee")
         new_employee_id = None
         employee_id = original_alarm.get('employee_id')
         if employee_id:
-            employee_data = fetch_employee_data_by_id(source_conn, employee_id)
+            employee_data = sources['employee_data']
             if employee_data:
-                existing_employee = get_employee_from_destination(dest_conn, employee_data)
-                if existing_employee:
-                    new_employee_id = existing_employee['id']
-                    logger.info(f"✅ Employee already exists in destination with ID: {new_employee_id}")
-                else:
-                    new_employee_id = str(uuid.uuid4())
-                    insert_employee_data_to_destination(dest_conn, employee_data, new_employee_id)
+                # Batch runs index the destination employees once
+                employee_index = context.employee_index if context else EmployeeIndex()
+                new_employee_id, inserted = employee_index.resolve(dest_conn, employee_data, commit)
+                if inserted:
+                    trace.add_rows(1)
                     logger.info(f"✅ Inserted new employee with ID: {new_employee_id}")
+                else:
+                    logger.info(f"✅ Employee already exists in destination with ID: {new_employee_id}")
 
         # 4️⃣ Resolve Alarm Type
-        source_alarm_type_id = get_alarm_type_id(source_conn, original_raw_alarm_id)
-        source_alarm_type = get_alarm_type(source_conn, source_alarm_type_id)
-        destination_alarm_type_id = get_respective_alarm_type_id_from_destination(dest_conn, source_alarm_type)
+        trace.stage("alarm_type")
+        source_alarm_type_id = original_alarm.get('alarm_type_id')
+        if context and context.alarm_types:
+            source_alarm_type, destination_alarm_type_id = context.alarm_types.resolve(source_alarm_type_id)
+        else:
+            source_alarm_type = sources['source_alarm_type']
+            destination_alarm_type_id = get_respective_alarm_type_id_from_destination(dest_conn, source_alarm_type)
         if not destination_alarm_type_id:
             logger.warning(f"⚠️ No mapped alarm type for '{source_alarm_type}'. Using predefined alarm type ID 'acf15f45-1c8f-426a-8b78-5dbbfef95c36'.")
             destination_alarm_type_id = "acf15f45-1c8f-426a-8b78-5dbbfef95c36"
 
         # 5️⃣ Fetch Media
-        media_records = fetch_alarm_media_by_alarm_id(source_conn, original_raw_alarm_id)
+        media_records = copied_media.media_ids if copied_media else sources['media_records']
         if not media_records:
             logger.error("❌ No media records found. Exiting.")
-            return
+            failed = True
+            return trace.result("No media records found")
         logger.info("✅ Media record fetched.")
 
         tap = original_alarm.get('true_alarm_probability')
@@ -108,37 +236,57 @@ def main(original_raw_alarm_id):
 
             new_door_id=new_door_id,
             new_employee_id=new_employee_id,
-            new_latest_media_id=None
+            new_latest_media_id=None,
+            new_alarm_id=copied_media.new_alarm_id if copied_media else None
         )
         new_alarm_id = new_alarm_data['id']
         state.add_alarm(new_alarm_id)
 
         # 7️⃣ Insert media
-        media_id = insert_alarm_media_and_get_id(dest_conn, media_records[0], new_alarm_id)
-        if not media_id:
-            logger.error("❌ Media insert failed. Exiting.")
-            return
-        logger.info(f"✅ Media inserted with ID: {media_id}")
+        trace.stage("media_insert")
+        if copied_media:
+            media_id = copied_media.latest_media_id
+            logger.info(f"✅ Media already inserted with ID: {media_id}")
+        else:
+            records, latest = media_to_copy(media_records, context.copy_all_media if context else False)
+            media_ids = [insert_alarm_media_and_get_id(dest_conn, record, new_alarm_id, commit) for record in records]
+            media_id = media_ids[latest] if all(media_ids) else None
+            if not media_id:
+                logger.error("❌ Media insert failed. Exiting.")
+                # Rolls back the media rows already written in a group transaction
+                failed = True
+                return trace.result("Media insert failed")
+            trace.add_rows(len(media_ids))
+            logger.info(f"✅ Media inserted with ID: {media_id}")
         new_alarm_data['latest_alarm_media_id'] = media_id
 
         # 8️⃣ Handle ML Output and Video Tags
+        trace.stage("ml_output")
         original_ml_output_id = original_alarm.get('ml_output_id')
         if original_ml_output_id:
-            ml_output_data = fetch_ml_output_by_id(source_conn, original_ml_output_id)
+            ml_output_data = sources['ml_output_data']
             if ml_output_data:
-                video_tags = fetch_video_tags_by_ml_output_id(source_conn, original_ml_output_id)
-                new_ml_output_id = insert_ml_output_to_destination(dest_conn, ml_output_data, new_alarm_id, new_tenant_id)
+                video_tags = sources['video_tags']
+                new_ml_output_id = insert_ml_output_to_destination(dest_conn, ml_output_data, new_alarm_id, new_tenant_id, commit)
                 if new_ml_output_id:
-                    insert_video_tags_to_destination(dest_conn, video_tags, new_ml_output_id, new_tenant_id)
+                    insert_video_tags_to_destination(dest_conn, video_tags, new_ml_output_id, new_tenant_id, commit=commit, **insert_options)
                     new_alarm_data['ml_output_id'] = new_ml_output_id
+                    trace.add_rows(1 + len(video_tags))
                     logger.info(f"✅ ML Output and {len(video_tags)} video tags migrated.")
 
         # 9️⃣ Handle Alarm Updates + Users
-        alarm_updates = fetch_alarm_updates(source_conn, original_raw_alarm_id)
+        trace.stage("alarm_updates")
+        alarm_updates = sources['alarm_updates']
         last_update_id = None
         if alarm_updates:
-            last_update_id = insert_alarm_updates(dest_conn, source_conn, alarm_updates, new_alarm_id, new_tenant_id)
+            last_update_id = insert_alarm_updates(
+                dest_conn, source_conn, alarm_updates, new_alarm_id, new_tenant_id,
+                user_resolver=context.user_resolver if context else None,
+                commit=commit,
+                **insert_options
+            )
             if last_update_id:
+                trace.add_rows(len(alarm_updates))
                 new_alarm_data['alarm_update_id'] = last_update_id
                 logger.info(f"✅ Alarm updates migrated. Last update ID: {last_update_id}")
 
@@ -154,52 +302,521 @@ def main(original_raw_alarm_id):
 
 
         # 1️⃣1️⃣ Insert Raw Alarm
+        trace.stage("raw_alarm_insert")
         logger.info(f"📥 Inserting raw alarm with ID: {new_alarm_id}")
-        success = insert_raw_alarm(dest_conn, new_alarm_data)
+        success = insert_raw_alarm(dest_conn, new_alarm_data, commit)
         if success:
             logger.info(f"✅ Raw alarm inserted successfully with ID: {new_alarm_id}")
+            trace.add_rows(1)
+            if context and context.ledger:
+                record_migration = lambda: context.ledger.record(original_raw_alarm_id, "Success", new_alarm_id, partition_key)
+                if transactions:
+                    transactions.after_commit(record_migration)
+                else:
+                    record_migration()
         else:
             logger.error("❌ Failed to insert raw alarm.")
 
         logger.info("✅ Migration complete. Connections closed.")
-        return "Success"
+        return trace.result("Success")
     except Exception as e:
+        failed = True
+        failure_kind = type(e).__name__
         logger.error(f"❌ Exception: {str(e)}")
-        return f"Error: {str(e)}"
+        return trace.result(f"Error: {str(e)}")
     finally:
+        close_alarm_log()
         try:
-            source_conn.close()
-            dest_conn.close()
-        except:
-            pass
+            if alarm_in_transaction:
+                trace.stage("commit")
+                # May raise GroupCommitError when this alarm closes a group
+                transactions.end_alarm(failed)
+        except GroupCommitError as e:
+            trace.result(None, f"Error: {e}")
+            failure_kind = 'group_commit'
+            raise
+        finally:
+            trace.finish()
+            if context and context.metrics:
+                context.metrics.alarm_finished(trace.outcome, failure_kind)
+            if profiler:
+                profiler.end_alarm(profiled_alarm)
+            if context:
+                context.release_connections(source_conn, dest_conn)
+            else:
+                try:
+                    source_conn.close()
+                    dest_conn.close()
+                except:
+                    pass
 
 import csv
 
-def batch_process_alarms(csv_path):
-    rows = []
-    with open(csv_path, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            raw_alarm_id = row['raw_alarm_id']
-            try:
-                log = main(raw_alarm_id)
-                row['logs'] = log or "Success"
-            except Exception as e:
-                row['logs'] = f"Error: {str(e)}"
-            rows.append(row)
-    # Write back to the same CSV with the new logs column
-    with open(csv_path, 'w', newline='') as csvfile:
-        fieldnames = list(rows[0].keys())
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+def read_in_chunks(reader, chunk_size):
+    while True:
+        chunk = list(islice(reader, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+def _duplicate_key(original_alarm):
+    return (original_alarm.get('source_id'), NEW_TENANT_ID, original_alarm.get('partition_key'))
+
+def migrate_single_alarm(raw_alarm_id, parallel_reads=False, profiler=None, connect=connect_to_database,
+                         copy_all_media=False):
+    context = MigrationContext.from_configs(
+        source, destination, connect=connect, parallel_reads=parallel_reads, profiler=profiler,
+        copy_all_media=copy_all_media
+    )
+    try:
+        return main(raw_alarm_id, context)
+    finally:
+        context.close()
+        _report_profile(profiler)
+
+def _report_profile(profiler):
+    """
+    Prints the query profile and raises QueryBudgetExceeded when alarms went
+    over the profiler's per-alarm query budget.
+    """
+    if profiler:
+        print(profiler.report())
+        profiler.check_budget()
+
+def _mark_group_failed(rows, error):
+    alarm_ids = set(error.alarm_ids)
+    for row in rows:
+        if row['raw_alarm_id'] in alarm_ids:
+            row['logs'] = f"Error: {error}"
+
+def _commit_before_wait(context, group_errors):
+    """
+    Commits the calling thread's open group before it waits for a concurrency
+    slot, so a parked worker holds no transaction or row locks.
+    """
+    if context.transactions is None:
+        return
+    try:
+        context.transactions.commit()
+    except GroupCommitError as e:
+        group_errors.append(e)
+        if context.metrics:
+            context.metrics.group_rolled_back(len(e.alarm_ids))
+
+def _migrate_row(context, row, original_alarm, group_errors, copied_media=None):
+    """
+    Migrates one prefetched, duplicate-checked alarm and stores the outcome on
+    the row. Returns main()'s result.
+    """
+    try:
+        with context.concurrency.slot(lambda: _commit_before_wait(context, group_errors)) \
+                if context.concurrency else nullcontext():
+            log = main(row['raw_alarm_id'], context, original_alarm=original_alarm, duplicate_checked=True,
+                       copied_media=copied_media)
+    except GroupCommitError as e:
+        row['logs'] = f"Error: {str(e)}"
+        group_errors.append(e)
+        if context.metrics:
+            # The alarm closing the group was counted by main() already
+            context.metrics.group_rolled_back(len(e.alarm_ids) - (1 if e.includes_current else 0))
+        return None
+    except Exception as e:
+        row['logs'] = f"Error: {str(e)}"
+        return None
+    row['logs'] = log
+    # Alarms that did not finish are recorded but retried on restart
+    if log != "Success" and context.ledger:
+        context.ledger.record(row['raw_alarm_id'], row['logs'])
+    return log
+
+def _migrate_chunk(context, chunk, prefetched, completed, run_parallel, group_errors):
+    """
+    Migrates one chunk of batch rows whose source alarms are already fetched
+    (keyed by id) and stores every outcome in the rows' 'logs' field.
+    """
+    logger = get_logger("alarm_migration")
+    metrics = context.metrics
+    if metrics and completed:
+        metrics.alarms_resumed(len(completed))
+    with span("duplicate_check_chunk", alarms=len(prefetched)) as tags, \
+            context.dest_connection() as dest_conn:
+        if dest_conn is None:
+            raise RuntimeError("Failed to connect to destination DB")
+        existing_keys = find_existing_raw_alarm_keys(
+            dest_conn, [_duplicate_key(alarm) for alarm in prefetched.values()]
+        )
+        tags['rows'] = len(existing_keys)
+    # Alarms sharing a duplicate key with an earlier row of the chunk
+    # wait for it, so the outcome matches a serial run
+    first_rows, repeated_rows, seen_keys = [], [], set()
+    for row in chunk:
+        raw_alarm_id = row['raw_alarm_id']
+        if raw_alarm_id in completed:
+            logger.info(f"⏭️ Raw alarm {raw_alarm_id} already handled by an earlier run. Skipping.")
+            row['logs'] = completed[raw_alarm_id]
+            continue
+        original_alarm = prefetched.get(raw_alarm_id)
+        if not original_alarm:
+            logger.error(f"❌ Raw alarm {raw_alarm_id} not found. Skipping.")
+            row['logs'] = "Raw alarm not found"
+            context.ledger.record(raw_alarm_id, row['logs'])
+            if metrics:
+                metrics.alarm_finished(row['logs'])
+            continue
+        key = _duplicate_key(original_alarm)
+        if key in existing_keys:
+            logger.warning(f"⚠️ Duplicate alarm detected in destination for raw alarm {raw_alarm_id}. Skipping migration.")
+            row['logs'] = "Duplicate alarm detected, skipped."
+            context.ledger.record(raw_alarm_id, row['logs'])
+            if metrics:
+                metrics.alarm_finished(row['logs'])
+        elif key in seen_keys:
+            repeated_rows.append((row, original_alarm))
+        else:
+            seen_keys.add(key)
+            first_rows.append((row, original_alarm))
+
+    if context.chunk_loader:
+        results = context.chunk_loader.load_chunk(first_rows)
+    else:
+        _preload_chunk_users(context, [row['raw_alarm_id'] for row, _ in first_rows + repeated_rows])
+        copied_media = _copy_chunk_media(context, [row['raw_alarm_id'] for row, _ in first_rows]) if context.bulk_media else {}
+        try:
+            results = list(run_parallel(
+                lambda entry: _migrate_row(context, entry[0], entry[1], group_errors, copied_media.get(entry[0]['raw_alarm_id'])),
+                first_rows
+            ))
+        finally:
+            if copied_media:
+                _discard_unused_media(context, copied_media, [row for row, _ in first_rows])
+    for (row, original_alarm), log in zip(first_rows, results):
+        if log == "Success":
+            existing_keys.add(_duplicate_key(original_alarm))
+    for row, original_alarm in repeated_rows:
+        if _duplicate_key(original_alarm) in existing_keys:
+            logger.warning(f"⚠️ Duplicate alarm detected in destination for raw alarm {row['raw_alarm_id']}. Skipping migration.")
+            row['logs'] = "Duplicate alarm detected, skipped."
+            context.ledger.record(row['raw_alarm_id'], row['logs'])
+            if metrics:
+                metrics.alarm_finished(row['logs'])
+        elif _migrate_row(context, row, original_alarm, group_errors) == "Success":
+            existing_keys.add(_duplicate_key(original_alarm))
+
+def _preload_chunk_users(context, raw_alarm_ids):
+    """
+    Resolves the users referenced by a chunk's alarm updates in one go, so
+    the alarms find them cached instead of resolving their own.
+    """
+    if not raw_alarm_ids:
+        return
+    # A pool connection of its own: the users are committed as they are
+    # created, never inside a worker's open group transaction
+    with span("preload_users", alarms=len(raw_alarm_ids)) as tags, \
+            context.source_pool.connection() as source_conn, context.dest_pool.connection() as dest_conn:
+        if source_conn is None or dest_conn is None:
+            raise RuntimeError("Failed to connect to source or destination DB")
+        user_ids = fetch_alarm_update_user_ids(source_conn, raw_alarm_ids)
+        context.user_resolver.preload(source_conn, dest_conn, user_ids, NEW_TENANT_ID)
+        tags['rows'] = len(user_ids)
+
+def _copy_chunk_media(context, raw_alarm_ids):
+    """
+    Bulk media stage: copies the media of a chunk's alarms with one source
+    query and multi-row INSERTs, under new alarm ids generated up front.
+    Returns {raw alarm id: CopiedMedia}; on failure nothing is kept and the
+    alarms insert their own media.
+    """
+    if not raw_alarm_ids:
+        return {}
+    logger = get_logger("alarm_migration")
+    new_alarm_ids = {raw_alarm_id: str(uuid.uuid4()) for raw_alarm_id in raw_alarm_ids}
+    with span("media_bulk_insert", alarms=len(raw_alarm_ids)) as tags, \
+            context.source_pool.connection() as source_conn, context.dest_connection() as dest_conn:
+        if source_conn is None or dest_conn is None:
+            raise RuntimeError("Failed to connect to source or destination DB")
+        try:
+            media_by_alarm = fetch_alarm_media_by_alarm_ids(source_conn, raw_alarm_ids)
+            copied = insert_alarm_media_bulk(
+                dest_conn,
+                {new_alarm_ids[raw_alarm_id]: records for raw_alarm_id, records in media_by_alarm.items()},
+                copy_all=context.copy_all_media,
+                **context.insert_options()
+            )
+        except Exception as e:
+            logger.error(f"❌ Bulk media insert failed, alarms insert their own media: {e}")
+            dest_conn.rollback()
+            return {}
+        tags['rows'] = sum(len(media.media_ids) for media in copied.values())
+    return {raw_alarm_id: copied[new_alarm_id] for raw_alarm_id, new_alarm_id in new_alarm_ids.items()}
+
+def _discard_unused_media(context, copied_media, rows):
+    """
+    Deletes the media the bulk stage wrote for alarms that did not finish,
+    so no orphaned alarm_media rows stay behind for a rerun to copy again.
+    """
+    new_alarm_ids = [
+        copied_media[row['raw_alarm_id']].new_alarm_id for row in rows
+        if row.get('logs') != "Success" and copied_media.get(row['raw_alarm_id']) and copied_media[row['raw_alarm_id']].media_ids
+    ]
+    if not new_alarm_ids:
+        return
+    logger = get_logger("alarm_migration")
+    with span("media_bulk_discard", alarms=len(new_alarm_ids)) as tags, context.dest_connection() as dest_conn:
+        if dest_conn is None:
+            raise RuntimeError("Failed to connect to destination DB")
+        tags['rows'] = delete_alarm_media(dest_conn, new_alarm_ids, context.insert_chunk_size)
+    logger.warning(f"🧹 Deleted the bulk-copied media of {len(new_alarm_ids)} alarm(s) that were not migrated.")
+
+def _flush_groups(context, workers):
+    """
+    Commits every thread's open group; returns the GroupCommitErrors.
+    """
+    with span("flush", sessions=workers):
+        flush_errors = context.flush()
+    if context.metrics:
+        for error in flush_errors:
+            context.metrics.group_rolled_back(len(error.alarm_ids))
+    return flush_errors
+
+def _migrate_selection(context, selection, results_csv, chunk_size, run_parallel, workers):
+    """
+    Streams the alarms matching selection from the source and migrates them
+    chunk by chunk. Each chunk's groups are committed before its outcomes are
+    appended to results_csv, so no rows are held beyond the current chunk.
+    """
+    logger = get_logger("alarm_migration")
+    logger.info(f"🔎 Migrating alarms matching {selection}")
+    migrated = 0
+    with context.source_pool.connection() as stream_conn, open(results_csv, 'w', newline='') as csvfile:
+        if stream_conn is None:
+            raise RuntimeError("Failed to connect to source DB")
+        writer = csv.DictWriter(csvfile, fieldnames=['raw_alarm_id', 'logs'])
         writer.writeheader()
-        writer.writerows(rows)
+        columns = context.chunk_loader.prefetch_columns if context.chunk_loader else None
+        for alarms in stream_raw_alarms(stream_conn, selection, chunk_size, columns):
+            chunk = [{'raw_alarm_id': alarm['id'], 'logs': ''} for alarm in alarms]
+            completed = context.ledger.completed_statuses(row['raw_alarm_id'] for row in chunk)
+            prefetched = {alarm['id']: alarm for alarm in alarms if alarm['id'] not in completed}
+            group_errors = []
+            _migrate_chunk(context, chunk, prefetched, completed, run_parallel, group_errors)
+            group_errors.extend(_flush_groups(context, workers))
+            for error in group_errors:
+                _mark_group_failed(chunk, error)
+            writer.writerows(chunk)
+            csvfile.flush()
+            migrated += len(chunk)
+            logger.info(f"📦 {migrated} selected alarm(s) handled so far.")
+
+def batch_process_alarms(csv_path, chunk_size=DEFAULT_CHUNK_SIZE, insert_chunk_size=DEFAULT_INSERT_CHUNK_SIZE,
+                         write_mode='per-table', group_commit=1, workers=1, parallel_reads=False,
+                         ledger_path=DEFAULT_LEDGER_PATH, mapping_csv=MAPPING_CSV, profiler=None, metrics=None,
+                         connect=connect_to_database, selection=None, bulk_media=False, copy_all_media=False,
+                         staging_dir=DEFAULT_STAGING_DIR, keep_staging=False, server_copy=True,
+                         latency_ceiling_ms=None, latency_target_ms=None):
+    """
+    Migrates the alarms listed in csv_path and writes each outcome back into
+    its 'logs' column. With an AlarmSelection the alarms are streamed from
+    the source instead, and csv_path receives the outcomes as they finish.
+    In 'bulk-load' write mode every chunk is loaded with LOAD DATA LOCAL
+    INFILE from staging files under staging_dir. Otherwise, when both schemas
+    are on the same server and server_copy is set, every chunk is copied
+    server-side with INSERT ... SELECT, unless an option of the alarm by
+    alarm path was chosen: per-alarm write mode, workers, bulk_media,
+    parallel_reads or latency_ceiling_ms.
+
+    With latency_ceiling_ms, `workers` is the most alarms in flight: an AIMD
+    controller raises the count while the p95 of destination INSERT and
+    COMMIT latency stays under latency_target_ms and halves it whenever the
+    p95 breaks the ceiling.
+    """
+    rows = []
+    group_errors = []
+    if server_copy and write_mode == 'per-table':
+        # The server-side copy has no use for these; an explicit choice wins
+        chosen = [flag for flag, is_set in (
+            ('--workers', workers > 1), ('--bulk-media', bulk_media), ('--parallel-reads', parallel_reads),
+            ('--latency-ceiling-ms', latency_ceiling_ms is not None)
+        ) if is_set]
+        if chosen:
+            get_logger("alarm_migration").info(f"🖥️ Server-side copy not tried: {', '.join(chosen)} migrate alarm by alarm.")
+            server_copy = False
+    elif write_mode != 'per-table':
+        server_copy = False
+    if bulk_media and write_mode != 'per-table':
+        # The bulk stage commits on its own, outside the alarms' transactions
+        get_logger("alarm_migration").warning(f"⚠️ --bulk-media needs per-table write mode; ignored in {write_mode} mode.")
+        bulk_media = False
+    dest_config = destination
+    if write_mode == 'bulk-load':
+        # mysql-connector refuses LOCAL INFILE requests unless allowed
+        dest_config = dict(destination, allow_local_infile=True)
+        workers = 1
+    concurrency = None
+    if latency_ceiling_ms is not None:
+        if workers > 1:
+            concurrency = AdaptiveConcurrency(
+                workers, latency_ceiling_ms / 1000,
+                latency_target_ms / 1000 if latency_target_ms is not None else None
+            )
+        else:
+            get_logger("alarm_migration").warning("⚠️ --latency-ceiling-ms needs --workers > 1; running one alarm at a time.")
+    # One pool per database for the whole batch instead of a connect per alarm;
+    # each worker holds one connection of each and the batch thread one more
+    context = MigrationContext.from_configs(
+        source, dest_config,
+        pool_size=workers + 1,
+        connect=connect,
+        insert_chunk_size=insert_chunk_size,
+        group_commit=group_commit if write_mode == 'per-alarm' else None,
+        parallel_reads=parallel_reads,
+        profiler=profiler,
+        metrics=metrics,
+        bulk_media=bulk_media,
+        copy_all_media=copy_all_media,
+        concurrency=concurrency
+    )
+    # Completed alarms of an earlier, interrupted run are skipped on restart
+    context.ledger = MigrationLedger(ledger_path, mapping_csv=mapping_csv)
+    if write_mode == 'bulk-load':
+        context.chunk_loader = BulkLoader(context, NEW_CAMERA_ID, NEW_TENANT_ID, NEW_DOOR_ID, staging_dir, keep_staging)
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    run_parallel = executor.map if executor else map
+    try:
+        if metrics:
+            # Inside the try: a port that fails to bind still closes the pools and the ledger
+            metrics.start()
+        context.check_schema()
+        context.load_alarm_types()
+        context.load_lookup_indexes()
+        if context.chunk_loader:
+            context.chunk_loader.check()
+        elif server_copy:
+            context.chunk_loader = ServerSideCopy.detect(
+                context, NEW_CAMERA_ID, NEW_TENANT_ID, NEW_DOOR_ID, source.get('database'), dest_config.get('database')
+            )
+        if selection:
+            _migrate_selection(context, selection, csv_path, chunk_size, run_parallel, workers)
+        else:
+            with open(csv_path, newline='') as csvfile:
+                reader = csv.DictReader(csvfile)
+                for chunk in read_in_chunks(reader, chunk_size):
+                    completed = context.ledger.completed_statuses(row['raw_alarm_id'] for row in chunk)
+                    raw_alarm_ids = [row['raw_alarm_id'] for row in chunk if row['raw_alarm_id'] not in completed]
+                    with span("prefetch_chunk", alarms=len(raw_alarm_ids)) as tags, \
+                            context.source_pool.connection() as source_conn:
+                        if source_conn is None:
+                            raise RuntimeError("Failed to connect to source DB")
+                        prefetched = fetch_raw_alarms_by_ids(
+                            source_conn, raw_alarm_ids, context.chunk_loader.prefetch_columns if context.chunk_loader else None
+                        )
+                        tags['rows'] = len(prefetched)
+                    _migrate_chunk(context, chunk, prefetched, completed, run_parallel, group_errors)
+                    rows.extend(chunk)
+            group_errors.extend(_flush_groups(context, workers))
+        context.ledger.export_csv(mapping_csv)
+        if concurrency:
+            get_logger("alarm_migration").info(f"🎚️ Adaptive concurrency finished at {concurrency.summary()}")
+    finally:
+        if executor:
+            executor.shutdown()
+        context.ledger.close()
+        context.close()
+        if metrics:
+            metrics.stop()
+    if not selection:
+        for error in group_errors:
+            _mark_group_failed(rows, error)
+        # Write back to the same CSV with the new logs column
+        with open(csv_path, 'w', newline='') as csvfile:
+            fieldnames = list(rows[0].keys())
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    _report_profile(profiler)
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Migrate a raw alarm by ID or batch process from CSV')
     parser.add_argument('--batch', action='store_true', help='Process alarms in batch from alarms.csv')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Alarms fetched per source query in batch mode')
+    parser.add_argument('--insert-chunk-size', type=int, default=DEFAULT_INSERT_CHUNK_SIZE, help='Rows per multi-row INSERT for child tables')
+    parser.add_argument('--write-mode', choices=['per-table', 'per-alarm', 'bulk-load'], default='per-table',
+                        help='Commit after every table (default), write each alarm in one transaction, '
+                             'or LOAD DATA each chunk from staging files')
+    parser.add_argument('--group-commit', type=int, default=1, help='Alarms committed together in per-alarm write mode')
+    parser.add_argument('--workers', type=int, default=1, help='Alarms migrated concurrently in batch mode')
+    parser.add_argument('--latency-ceiling-ms', type=float,
+                        help='Adapt the alarms in flight (up to --workers) to keep the p95 destination write latency under this')
+    parser.add_argument('--latency-target-ms', type=float,
+                        help='p95 write latency under which more alarms are let in (default: half the ceiling)')
+    parser.add_argument('--parallel-reads', action='store_true', help='Run the independent source reads of an alarm concurrently')
+    parser.add_argument('--ledger', type=str, default=DEFAULT_LEDGER_PATH, help='SQLite ledger used to resume interrupted batches')
+    parser.add_argument('--trace', type=str, help='Append per-stage spans to this Chrome trace (JSON) file')
+    parser.add_argument('--profile-queries', action='store_true', help='Measure every SQL statement and print a top-N report')
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_TOP_N, help='Statements listed in the query report')
+    parser.add_argument('--explain-threshold-ms', type=float, help='Capture EXPLAIN for statements slower than this')
+    parser.add_argument('--query-budget', type=int, help='Fail the run when an alarm issues more queries than this')
+    parser.add_argument('--metrics-file', type=str, help='Rewrite Prometheus text-format metrics to this file while a batch runs')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on 127.0.0.1:PORT/metrics while a batch runs')
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_METRICS_INTERVAL, help='Seconds between metrics file rewrites')
+    parser.add_argument('--select', action='store_true', help='Batch-migrate the source alarms matching the filters below instead of alarms.csv')
+    parser.add_argument('--results-csv', type=str, default='selection_results.csv', help='Outcome of every selected alarm')
+    parser.add_argument('--tenant', type=str, help='Source tenant_id')
+    parser.add_argument('--partition-from', type=int, help='Lowest partition_key (inclusive)')
+    parser.add_argument('--partition-to', type=int, help='Highest partition_key (inclusive)')
+    parser.add_argument('--alarm-type', action='append', default=[], help='Source alarm type name; repeat for several')
+    parser.add_argument('--since', type=str, help='Earliest alarm_timestamp_utc (inclusive), e.g. 2025-01-01')
+    parser.add_argument('--until', type=str, help='Latest alarm_timestamp_utc (exclusive)')
+    parser.add_argument('--source-entity-type', type=str, help='Source entity type, e.g. CAMERA')
+    parser.add_argument('--limit', type=int, help='Stop after this many selected alarms')
+    parser.add_argument('--bulk-media', action='store_true', help='Insert the media of a whole chunk in one stage (per-table write mode)')
+    parser.add_argument('--all-media', action='store_true', help='Copy every media record of an alarm, not just the first')
+    parser.add_argument('--staging-dir', type=str, default=DEFAULT_STAGING_DIR, help='Staging files of --write-mode bulk-load')
+    parser.add_argument('--keep-staging', action='store_true', help='Keep the staging files of loaded chunks')
+    parser.add_argument('--no-server-copy', action='store_true',
+                        help='Migrate alarm by alarm even when both schemas are on the same server')
     parser.add_argument('original_raw_alarm_id', type=str, nargs='?', help='The ID of the raw alarm to migrate')
     args = parser.parse_args()
-    if args.batch:
-        batch_process_alarms('alarms.csv')
+    if args.trace:
+        start_tracing(args.trace)
+    profiler = None
+    if args.profile_queries or args.explain_threshold_ms is not None or args.query_budget is not None:
+        profiler = QueryProfiler(args.profile_top, args.explain_threshold_ms, args.query_budget)
+    if args.batch or args.select:
+        selection = None
+        if args.select:
+            selection = AlarmSelection(
+                tenant_id=args.tenant,
+                partition_key_from=args.partition_from,
+                partition_key_to=args.partition_to,
+                alarm_types=args.alarm_type,
+                since=args.since,
+                until=args.until,
+                source_entity_type=args.source_entity_type,
+                limit=args.limit
+            )
+        batch_process_alarms(
+            args.results_csv if args.select else 'alarms.csv',
+            chunk_size=args.chunk_size,
+            insert_chunk_size=args.insert_chunk_size,
+            write_mode=args.write_mode,
+            group_commit=args.group_commit,
+            workers=args.workers,
+            parallel_reads=args.parallel_reads,
+            ledger_path=args.ledger,
+            profiler=profiler,
+            metrics=MigrationMetrics(args.metrics_file, args.metrics_port, args.metrics_interval)
+            if args.metrics_file or args.metrics_port else None,
+            selection=selection,
+            bulk_media=args.bulk_media,
+            copy_all_media=args.all_media,
+            staging_dir=args.staging_dir,
+            keep_staging=args.keep_staging,
+            server_copy=not args.no_server_copy,
+            latency_ceiling_ms=args.latency_ceiling_ms,
+            latency_target_ms=args.latency_target_ms
+        )
+    elif args.parallel_reads or profiler or args.all_media:
+        migrate_single_alarm(args.original_raw_alarm_id, parallel_reads=args.parallel_reads, profiler=profiler,
+                             copy_all_media=args.all_media)
     else:
         main(args.original_raw_alarm_id) 
\ No newline at end of file
@@ -0,0 +1,185 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from src.database.connection import ConnectionPool, connect_to_database
+from src.database.transaction import GroupCommitter, GroupCommitError
+from src.database.profiling import QueryProfiler
+from src.database.schema import check_schema
+from src.database.bulk import read_max_allowed_packet, DEFAULT_INSERT_CHUNK_SIZE, DEFAULT_MAX_PACKET_BYTES
+from src.services.alarm_type_service import AlarmTypeMapping
+from src.services.door_service import DoorIndex
+from src.services.employee_service import EmployeeIndex
+from src.services.user_service import UserResolver
+
+# Most independent source reads one alarm can issue at once (see fetch_alarm_sources)
+SOURCE_READ_FANOUT = 6
+
+
+class MigrationContext:
+    """
+    Holds the resources shared by every alarm migrated in one run.
+    """
+    def __init__(self, source_pool, dest_pool, insert_chunk_size=DEFAULT_INSERT_CHUNK_SIZE, group_commit=None,
+                 parallel_reads=False, profiler=None, metrics=None, bulk_media=False, copy_all_media=False,
+                 concurrency=None):
+        self.source_pool = source_pool
+        self.dest_pool = dest_pool
+        self.insert_chunk_size = insert_chunk_size
+        self.max_packet_bytes = DEFAULT_MAX_PACKET_BYTES
+        self.alarm_types = None
+        self.ledger = None
+        self.chunk_loader = None
+        self.group_commit = group_commit
+        self.parallel_reads = parallel_reads
+        self.profiler = profiler
+        self.metrics = metrics
+        self.bulk_media = bulk_media
+        self.copy_all_media = copy_all_media
+        self.concurrency = concurrency
+        self.read_executor = None
+        if parallel_reads:
+            self.read_executor = ThreadPoolExecutor(max_workers=source_pool.size)
+        self.user_resolver = UserResolver(self.dest_pool.connection)
+        self.employee_index = EmployeeIndex(self.dest_pool.connection)
+        # Left unloaded while door migration is disabled in main()
+        self.door_index = DoorIndex(self.dest_pool.connection)
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        self.schema = None
+        self._schema_lock = threading.Lock()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = {
+                'transactions': GroupCommitter(self.group_commit),
+                'dest_conn': None,
+            }
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    @property
+    def transactions(self):
+        if not self.group_commit:
+            return None
+        return self._session()['transactions']
+
+    @classmethod
+    def from_configs(cls, source_config, dest_config, pool_size=1, connect=connect_to_database, **options):
+        # Parallel reads hold up to one extra source connection per read
+        source_size = pool_size * SOURCE_READ_FANOUT if options.get('parallel_reads') else pool_size
+        profiler = options.get('profiler')
+        for listener in (options.get('metrics'), options.get('concurrency')):
+            if listener:
+                # Statement timings reach them through a profiler's listeners
+                profiler = profiler or QueryProfiler()
+                profiler.listeners.append(listener)
+                options['profiler'] = profiler
+        return cls(
+            ConnectionPool(source_config, size=source_size, connect=connect, profiler=profiler),
+            ConnectionPool(dest_config, size=pool_size, connect=connect, profiler=profiler),
+            **options
+        )
+
+    def acquire_connections(self):
+        source_conn = self.source_pool.acquire()
+        return source_conn, self._acquire_dest()
+
+    def release_connections(self, source_conn, dest_conn):
+        self.source_pool.release(source_conn)
+        if dest_conn is not self._pinned_dest_conn():
+            self.dest_pool.release(dest_conn)
+
+    @contextmanager
+    def dest_connection(self):
+        """
+        Destination connection for run-level queries; reuses the calling
+        thread's pinned connection when it has one.
+        """
+        dest_conn = self._pinned_dest_conn() or self.dest_pool.acquire()
+        try:
+            yield dest_conn
+        finally:
+            if dest_conn is not self._pinned_dest_conn():
+                self.dest_pool.release(dest_conn)
+
+    def _pinned_dest_conn(self):
+        session = getattr(self._local, 'session', None)
+        return session['dest_conn'] if session else None
+
+    def _acquire_dest(self):
+        if not self.group_commit:
+            return self.dest_pool.acquire()
+        session = self._session()
+        if session['dest_conn'] is None:
+            session['dest_conn'] = self.dest_pool.acquire()
+        return session['dest_conn']
+
+    @property
+    def commit_writes(self):
+        """
+        False when writes belong to a transaction owned by the GroupCommitter.
+        """
+        return self.transactions is None
+
+    def flush(self):
+        """
+        Commits the partially filled last group of every thread once the
+        workers are idle. Returns the GroupCommitErrors of groups that failed.
+        """
+        errors = []
+        for session in self._sessions:
+            try:
+                session['transactions'].commit()
+            except GroupCommitError as e:
+                errors.append(e)
+        return errors
+
+    def load_alarm_types(self):
+        with self.source_pool.connection() as source_conn, self.dest_pool.connection() as dest_conn:
+            if not source_conn or not dest_conn:
+                raise RuntimeError("Failed to connect to source or destination DB")
+            self.alarm_types = AlarmTypeMapping.load(source_conn, dest_conn)
+            self.max_packet_bytes = read_max_allowed_packet(dest_conn)
+        return self.alarm_types
+
+    def load_lookup_indexes(self):
+        """
+        Indexes the destination employees of the target tenant once per run.
+        """
+        with self.dest_connection() as dest_conn:
+            if not dest_conn:
+                raise RuntimeError("Failed to connect to destination DB")
+            self.employee_index.load(dest_conn)
+
+    def check_schema(self):
+        """
+        Checks the column projections of every stage against both schemas
+        on first call; raises SchemaMismatch before any alarm is touched.
+        Connections the pools hand out afterwards read the projected columns.
+        """
+        with self._schema_lock:
+            if self.schema is None:
+                with self.source_pool.connection() as source_conn, self.dest_pool.connection() as dest_conn:
+                    if not source_conn or not dest_conn:
+                        raise RuntimeError("Failed to connect to source or destination DB")
+                    schema = check_schema(source_conn, dest_conn)
+                self.schema = self.source_pool.schema = self.dest_pool.schema = schema
+        return self.schema
+
+    def insert_options(self):
+        return {'chunk_size': self.insert_chunk_size, 'max_packet_bytes': self.max_packet_bytes}
+
+    def close(self):
+        if self.read_executor:
+            self.read_executor.shutdown()
+        for session in self._sessions:
+            if session['dest_conn'] is not None:
+                self.dest_pool.release(session['dest_conn'])
+                session['dest_conn'] = None
+        self.source_pool.close_all()
+        self.dest_pool.close_all()
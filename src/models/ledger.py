@@ -0,0 +1,122 @@
+import csv
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_LEDGER_PATH = 'migration_ledger.sqlite3'
+MAPPING_FIELDNAMES = ['original_alarm_id', 'new_alarm_id', 'partition_key', 'migrated_at']
+# Outcomes that need no work when a batch is restarted
+COMPLETED_STATUSES = ("Success", "Duplicate alarm detected, skipped.")
+
+
+class MigrationLedger:
+    """
+    Durable record of every alarm a batch has handled, keyed by original alarm
+    id in a local SQLite file. A restarted batch skips completed alarms with an
+    indexed lookup instead of re-checking them against the destination.
+    The mapping CSV is the append-only history; `exported` marks the rows
+    already in it.
+    """
+    def __init__(self, path=DEFAULT_LEDGER_PATH, mapping_csv=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS migrations (
+                original_alarm_id TEXT PRIMARY KEY,
+                new_alarm_id TEXT,
+                partition_key TEXT,
+                status TEXT NOT NULL,
+                migrated_at TEXT NOT NULL,
+                exported INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(migrations)")]
+        if 'exported' not in columns:
+            # Ledgers of earlier versions rewrote the whole CSV, so every row is in it
+            self.connection.execute("ALTER TABLE migrations ADD COLUMN exported INTEGER NOT NULL DEFAULT 1")
+        if mapping_csv:
+            self._import_mapping_csv(mapping_csv)
+
+    def _import_mapping_csv(self, csv_filename):
+        """
+        Merges the mapping CSV into the ledger on every run, so alarms mapped
+        outside it (earlier versions, other runs) are still skipped. Outcomes
+        the ledger already holds win.
+        """
+        if not os.path.exists(csv_filename):
+            return
+        with open(csv_filename, newline='') as csvfile:
+            rows = [
+                (row['original_alarm_id'], row['new_alarm_id'], row['partition_key'], "Success", row['migrated_at'])
+                for row in csv.DictReader(csvfile)
+            ]
+        with self._lock:
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO migrations (original_alarm_id, new_alarm_id, partition_key, status, migrated_at, exported) "
+                "VALUES (?, ?, ?, ?, ?, 1)",
+                rows
+            )
+            self.connection.execute("COMMIT")
+
+    def record(self, original_alarm_id, status, new_alarm_id=None, partition_key=None):
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO migrations (original_alarm_id, new_alarm_id, partition_key, status, migrated_at, exported) "
+                "VALUES (?, ?, ?, ?, ?, 0)",
+                (original_alarm_id, new_alarm_id, partition_key, status, datetime.now().isoformat())
+            )
+
+    def status(self, original_alarm_id):
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT status FROM migrations WHERE original_alarm_id = ?", (original_alarm_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def completed_statuses(self, original_alarm_ids):
+        """
+        Returns {original_alarm_id: status} for the ids already completed.
+        """
+        original_alarm_ids = list(original_alarm_ids)
+        if not original_alarm_ids:
+            return {}
+        placeholders = ', '.join(['?'] * len(original_alarm_ids))
+        status_placeholders = ', '.join(['?'] * len(COMPLETED_STATUSES))
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT original_alarm_id, status FROM migrations "
+                f"WHERE original_alarm_id IN ({placeholders}) AND status IN ({status_placeholders})",
+                (*original_alarm_ids, *COMPLETED_STATUSES)
+            ).fetchall()
+        return dict(rows)
+
+    def export_csv(self, csv_filename="alarm_id_mapping.csv"):
+        """Appends the mappings not yet in the CSV and marks them exported"""
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT original_alarm_id, new_alarm_id, partition_key, migrated_at FROM migrations "
+                "WHERE new_alarm_id IS NOT NULL AND exported = 0 ORDER BY migrated_at"
+            ).fetchall()
+            if not rows:
+                return
+            file_exists = os.path.exists(csv_filename)
+            with open(csv_filename, 'a', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                if not file_exists:
+                    writer.writerow(MAPPING_FIELDNAMES)
+                writer.writerows(rows)
+            self.connection.execute("BEGIN")
+            self.connection.executemany(
+                "UPDATE migrations SET exported = 1 WHERE original_alarm_id = ?", [(row[0],) for row in rows]
+            )
+            self.connection.execute("COMMIT")
+
+    def close(self):
+        self.connection.close()
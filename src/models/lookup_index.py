@@ -0,0 +1,78 @@
+from src.models.shared_ids import SharedIds
+from src.utils.logger import get_logger
+logger = get_logger("lookup_index")
+
+
+class LookupIndex:
+    """
+    Run-scoped hash index of destination rows that alarms share, such as
+    employees and doors, by the natural key the services match on. load()
+    reads every row of the target scope once; later lookups cost no query.
+
+    A key the index does not know falls back to the service's own lookup,
+    which also covers spellings the server's collation treats as equal,
+    and inserts the row when that finds nothing. Either way the key is
+    indexed, so alarms sharing it reuse the id instead of inserting again.
+
+    Like UserResolver, one index is shared by every worker (see SharedIds):
+    a missing key is resolved by one worker at a time, on a committed
+    `connection()` of its own when the caller writes inside a transaction.
+    Subclasses set `table`, `key_columns` and `scope`, and implement _find()
+    and _insert().
+    """
+    table = None
+    key_columns = ()
+    scope = {}
+    label = 'row'
+
+    def __init__(self, connection=None):
+        self._ids = SharedIds(connection)
+
+    def key(self, data):
+        return tuple(data.get(column) for column in self.key_columns)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def load(self, dest_conn):
+        """
+        Indexes every destination row of the scope; the first row wins when
+        several share a key, like the services' single-row lookups.
+        """
+        where = ' AND '.join(f"{column} = %s" for column in self.scope)
+        cursor = dest_conn.cursor()
+        try:
+            cursor.execute(
+                f"SELECT id, {', '.join(self.key_columns)} FROM {self.table} WHERE {where}",
+                tuple(self.scope.values())
+            )
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        for row in rows:
+            self._ids.add(tuple(row[1:]), row[0])
+        scope = ', '.join(f"{column}={value}" for column, value in self.scope.items())
+        logger.info(f"📇 Indexed {len(rows)} destination {self.label}(s) with {scope}")
+
+    def resolve(self, dest_conn, data, commit=True):
+        """
+        Returns (destination id, inserted) for the source row `data`.
+        """
+        key = self.key(data)
+        inserted = []
+
+        def lookup(conn, commit, keys):
+            existing_id = self._find(conn, data)
+            if existing_id:
+                return {key: existing_id}
+            inserted.append(key)
+            return {key: self._insert(conn, data, commit)}
+
+        self._ids.resolve([key], dest_conn, commit, lookup)
+        return self._ids.get(key), bool(inserted)
+
+    def _find(self, dest_conn, data):
+        raise NotImplementedError
+
+    def _insert(self, dest_conn, data, commit):
+        raise NotImplementedError
@@ -0,0 +1,50 @@
+class AlarmSelection:
+    """
+    Filters choosing which source raw alarms a batch migrates, instead of a
+    hand-built CSV of ids. Unset filters match everything; `alarm_types`
+    are alarm type names resolved against the source alarm_types table.
+    """
+    def __init__(self, tenant_id=None, partition_key_from=None, partition_key_to=None, alarm_types=(),
+                 since=None, until=None, source_entity_type=None, limit=None):
+        self.tenant_id = tenant_id
+        self.partition_key_from = partition_key_from
+        self.partition_key_to = partition_key_to
+        self.alarm_types = list(alarm_types or ())
+        self.since = since
+        self.until = until
+        self.source_entity_type = source_entity_type
+        self.limit = limit
+
+    def where_clause(self):
+        """
+        Returns the WHERE clause (empty when nothing is filtered) and its params.
+        """
+        conditions, params = [], []
+        if self.tenant_id:
+            conditions.append("tenant_id = %s")
+            params.append(self.tenant_id)
+        if self.partition_key_from is not None:
+            conditions.append("partition_key >= %s")
+            params.append(self.partition_key_from)
+        if self.partition_key_to is not None:
+            conditions.append("partition_key <= %s")
+            params.append(self.partition_key_to)
+        if self.alarm_types:
+            placeholders = ', '.join(['%s'] * len(self.alarm_types))
+            conditions.append(f"alarm_type_id IN (SELECT id FROM alarm_types WHERE alarm_type IN ({placeholders}))")
+            params.extend(self.alarm_types)
+        if self.since:
+            conditions.append("alarm_timestamp_utc >= %s")
+            params.append(self.since)
+        if self.until:
+            conditions.append("alarm_timestamp_utc < %s")
+            params.append(self.until)
+        if self.source_entity_type:
+            conditions.append("source_entity_type = %s")
+            params.append(self.source_entity_type)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def __repr__(self):
+        filters = {name: value for name, value in vars(self).items() if value not in (None, [])}
+        return f"AlarmSelection({', '.join(f'{name}={value!r}' for name, value in filters.items())})"
@@ -0,0 +1,82 @@
+import threading
+
+
+class SharedIds:
+    """
+    Run-scoped map of natural key -> destination id shared by every worker.
+
+    A key nobody knows yet is claimed by the first worker that needs it;
+    the others wait for that worker's lookup instead of inserting the same
+    row again. No database I/O runs under the lock, and a worker never waits
+    while it holds claims of its own.
+
+    Rows missing from the destination are looked up and inserted on a
+    separate `connection()` when the caller's connection is inside a
+    transaction it owns (commit=False), so they are committed right away and
+    every worker can reuse their ids. Without `connection`, or with
+    commit=True, the caller's connection is used.
+    """
+    def __init__(self, connection=None):
+        self._connection = connection
+        self._ids = {}
+        self._claims = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, key):
+        return key in self._ids
+
+    def get(self, key):
+        return self._ids.get(key)
+
+    def add(self, key, value):
+        """
+        Records a known id; the first id recorded for a key wins.
+        """
+        with self._lock:
+            self._ids.setdefault(key, value)
+
+    def resolve(self, keys, dest_conn, commit, lookup):
+        """
+        Makes every key known. lookup(connection, commit, claimed keys) runs
+        for the keys no other worker is resolving and returns {key: id} for
+        those it settled; keys it leaves out stay unknown and are retried by
+        the next caller.
+        """
+        pending = list(dict.fromkeys(keys))
+        while pending:
+            claimed, waiting = [], []
+            with self._lock:
+                for key in pending:
+                    if key in self._ids:
+                        continue
+                    claim = self._claims.get(key)
+                    if claim is None:
+                        self._claims[key] = threading.Event()
+                        claimed.append(key)
+                    else:
+                        waiting.append((key, claim))
+            if claimed:
+                settled = {}
+                try:
+                    settled = self._lookup(lookup, dest_conn, commit, claimed)
+                finally:
+                    with self._lock:
+                        for key in claimed:
+                            if key in settled:
+                                self._ids[key] = settled[key]
+                            self._claims.pop(key).set()
+            for _, claim in waiting:
+                claim.wait()
+            # Keys whose owner failed are claimed again on the next pass
+            pending = [key for key, _ in waiting]
+
+    def _lookup(self, lookup, dest_conn, commit, keys):
+        if commit or self._connection is None:
+            return lookup(dest_conn, commit, keys)
+        with self._connection() as lookup_conn:
+            if lookup_conn is None:
+                raise RuntimeError("Failed to connect to destination DB")
+            return lookup(lookup_conn, True, keys)
@@ -1,14 +1,29 @@
 import uuid
-import json
 from src.services.door_service import fetch_door_data_by_id, insert_door_data_to_destination, get_door_from_destination
 from src.services.employee_service import fetch_employee_data_by_id, insert_employee_data_to_destination, get_employee_from_destination
 from src.services.media_service import fetch_alarm_media_by_alarm_id, insert_alarm_media_and_get_id
 from src.services.ml_service import fetch_ml_output_by_id, fetch_video_tags_by_ml_output_id, insert_ml_output_to_destination, insert_video_tags_to_destination
 from src.services.alarm_type_service import get_alarm_type_id, get_alarm_type, get_respective_alarm_type_id_from_destination
 from src.services.alarm_update_service import fetch_alarm_updates, insert_alarm_updates
+from src.database.schema import TableProjection
+from src.database.statements import statements_for
+from src.utils.json_columns import json_column
 from src.utils.logger import get_logger
 logger = get_logger("alarm_service")
 
+# Raw alarms are copied wholesale; these are the columns the pipeline reads
+RAW_ALARM_PROJECTION = TableProjection(
+    'raw_alarms_v2',
+    ('id', 'source_id', 'partition_key', 'alarm_type_id', 'door_id', 'employee_id', 'ml_output_id'),
+    copy_columns=True
+)
+
+# Assigned when an alarm's type has no destination counterpart
+DEFAULT_ALARM_TYPE_ID = "acf15f45-1c8f-426a-8b78-5dbbfef95c36"
+
+# Seconds the server waits on a streaming client before dropping it
+STREAM_NET_WRITE_TIMEOUT = 3600
+
 def prepare_new_raw_alarm_data(
     original_alarm_data,
     new_camera_id,
@@ -17,10 +32,11 @@ def prepare_new_raw_alarm_data(
     new_door_id,
     new_employee_id,
     new_user_id=None,
-    new_latest_media_id=None
+    new_latest_media_id=None,
+    new_alarm_id=None
 ):
     new_alarm = original_alarm_data.copy()
-    new_alarm['id'] = str(uuid.uuid4())
+    new_alarm['id'] = new_alarm_id or str(uuid.uuid4())
     new_alarm['source_entity_id'] = new_camera_id
     new_alarm['tenant_id'] = new_tenant_id
     new_alarm['latest_alarm_media_id'] = new_latest_media_id
@@ -31,29 +47,95 @@ def prepare_new_raw_alarm_data(
         new_alarm['alarm_type_id'] = alarm_type_id
     else:
         logger.warning("Alarm type ID is None. Assigning default motion-detected type.")
-        new_alarm['alarm_type_id'] = "acf15f45-1c8f-426a-8b78-5dbbfef95c36"
+        new_alarm['alarm_type_id'] = DEFAULT_ALARM_TYPE_ID
+    # JSON read as text passes through untouched; bytes may be BLOB columns
     for key, value in new_alarm.items():
         if isinstance(value, (dict, list)):
-            new_alarm[key] = json.dumps(value)
+            new_alarm[key] = json_column(value)
     return new_alarm
 
-def insert_raw_alarm(connection, alarm_data):
-    cursor = connection.cursor()
-    columns = ', '.join(alarm_data.keys())
-    placeholders = ', '.join(['%s'] * len(alarm_data))
-    query = f"INSERT INTO raw_alarms_v2 ({columns}) VALUES ({placeholders})"
-    cursor.execute(query, list(alarm_data.values()))
-    connection.commit()
+def insert_raw_alarm(connection, alarm_data, commit=True):
+    statements_for(connection).insert('raw_alarms_v2', alarm_data.keys(), alarm_data.values())
+    if commit:
+        connection.commit()
     return True
 
 # --- Duplicate check and conflict info ---
 def find_existing_raw_alarm(dest_conn, source_id, tenant_id, partition_key):
-    cursor = dest_conn.cursor(dictionary=True)
+    """Returns a truthy row when the alarm already exists in the destination"""
+    return statements_for(dest_conn).select_one(
+        'raw_alarms_v2', '1', ('source_id', 'tenant_id', 'partition_key'), (source_id, tenant_id, partition_key)
+    )
+
+def find_existing_raw_alarm_keys(dest_conn, keys):
+    """
+    Resolves a chunk of (source_id, tenant_id, partition_key) tuples in one query
+    and returns the set of those already present in the destination.
+    """
+    keys = list(set(keys))
+    if not keys:
+        return set()
+    cursor = dest_conn.cursor()
+    placeholders = ', '.join(['(%s, %s, %s)'] * len(keys))
     cursor.execute(
-        "SELECT * FROM raw_alarms_v2 WHERE source_id = %s AND tenant_id = %s AND partition_key = %s",
-        (source_id, tenant_id, partition_key)
+        "SELECT source_id, tenant_id, partition_key FROM raw_alarms_v2 "
+        f"WHERE (source_id, tenant_id, partition_key) IN ({placeholders})",
+        [value for key in keys for value in key]
     )
-    return cursor.fetchone()
+    return {tuple(row) for row in cursor.fetchall()}
+
+def stream_raw_alarms(source_conn, selection, batch_size=500, columns=None):
+    """
+    Yields the raw alarms matching an AlarmSelection in lists of at most
+    batch_size rows, read with `columns` or the projection. The default
+    mysql-connector cursor is unbuffered, so rows stay on the server until
+    fetched and memory is bounded by one batch. The connection is busy
+    until the stream is exhausted; its net_write_timeout is restored when
+    the stream closes.
+    """
+    where, params = selection.where_clause()
+    select_list = ', '.join(columns) if columns else RAW_ALARM_PROJECTION.select_list(source_conn)
+    query = f"SELECT {select_list} FROM raw_alarms_v2{where}"
+    if selection.limit:
+        query += f" LIMIT {int(selection.limit)}"
+    cursor = source_conn.cursor()
+    try:
+        cursor.execute("SELECT @@session.net_write_timeout")
+        net_write_timeout = int(cursor.fetchone()[0])
+        # The server gives up on a stalled stream after net_write_timeout;
+        # migrating a batch between two fetches can take longer than the default
+        cursor.execute(f"SET SESSION net_write_timeout = {STREAM_NET_WRITE_TIMEOUT}")
+    finally:
+        cursor.close()
+    cursor = source_conn.cursor(dictionary=True)
+    exhausted = False
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                exhausted = True
+                return
+            yield rows
+    finally:
+        try:
+            cursor.close()
+        except Exception as e:
+            if exhausted:
+                raise
+            logger.warning(f"Abandoned alarm stream left unread rows: {e}")
+        # The connection goes back to the pool; later users get the usual timeout
+        _restore_net_write_timeout(source_conn, net_write_timeout)
+
+def _restore_net_write_timeout(source_conn, net_write_timeout):
+    try:
+        cursor = source_conn.cursor()
+        try:
+            cursor.execute(f"SET SESSION net_write_timeout = {net_write_timeout}")
+        finally:
+            cursor.close()
+    except Exception as e:
+        logger.warning(f"Could not restore net_write_timeout to {net_write_timeout}: {e}")
 
 def find_conflicting_location_alarm_info(dest_conn, source_id, tenant_id, partition_key):
     cursor = dest_conn.cursor(dictionary=True)
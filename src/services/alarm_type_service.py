@@ -1,6 +1,9 @@
 from src.utils.logger import get_logger
 logger = get_logger("alarm_type_service")
 
+# Type assumed for alarms whose source type is unknown
+FALLBACK_ALARM_TYPE = "Motion Detected"
+
 
 def get_alarm_type_id(source_connection, raw_alarm_id):
     cursor = source_connection.cursor(dictionary=True)
@@ -31,4 +34,55 @@ def get_respective_alarm_type_id_from_destination(destination_connection, alarm_
         return None
     if len(results) > 1:
         logger.warning(f"Multiple alarm types found for type '{alarm_type}', using the first one.")
-    return results[0]['id'] 
\ No newline at end of file
+    return results[0]['id'] 
+
+class AlarmTypeMapping:
+    """
+    Maps source alarm_type ids to destination alarm_type ids. Both alarm_types
+    tables are loaded once per run, so resolving a type costs no queries.
+    """
+    def __init__(self, source_types, destination_ids_by_type):
+        self.source_types = source_types
+        self.destination_ids_by_type = destination_ids_by_type
+
+    @classmethod
+    def load(cls, source_connection, destination_connection):
+        cursor = source_connection.cursor(dictionary=True)
+        cursor.execute("SELECT id, alarm_type FROM alarm_types")
+        source_types = {row['id']: row['alarm_type'] for row in cursor.fetchall()}
+
+        cursor = destination_connection.cursor(dictionary=True)
+        cursor.execute("SELECT id, alarm_type FROM alarm_types")
+        destination_ids_by_type = {}
+        for row in cursor.fetchall():
+            destination_ids_by_type.setdefault(row['alarm_type'], []).append(row['id'])
+        for alarm_type, ids in destination_ids_by_type.items():
+            if len(ids) > 1:
+                logger.warning(f"Multiple alarm types found for type '{alarm_type}', using the first one.")
+
+        logger.info(f"Loaded {len(source_types)} source and {len(destination_ids_by_type)} destination alarm types.")
+        return cls(source_types, destination_ids_by_type)
+
+    def resolve(self, source_alarm_type_id):
+        """
+        Returns (alarm_type, destination_alarm_type_id), falling back to
+        "Motion Detected" like get_alarm_type. The id is None when the
+        destination has no type with that name.
+        """
+        alarm_type = self.source_types.get(source_alarm_type_id)
+        if alarm_type is None:
+            logger.warning(f"No alarm type found with ID {source_alarm_type_id}, using predefined one (ALARM TYPE: Motion Detected).")
+            alarm_type = FALLBACK_ALARM_TYPE
+        ids = self.destination_ids_by_type.get(alarm_type)
+        if not ids:
+            logger.warning(f"No alarm type found for type '{alarm_type}'")
+            return alarm_type, None
+        return alarm_type, ids[0]
+
+    def fallback_id(self):
+        """
+        The destination id resolve() gives alarms of an unknown source type,
+        or None when the destination lacks that type too.
+        """
+        ids = self.destination_ids_by_type.get(FALLBACK_ALARM_TYPE)
+        return ids[0] if ids else None
@@ -1,15 +1,27 @@
-import json
 import uuid
 from src.services.user_service import fetch_user_by_id, insert_user_if_not_exists
+from src.database.bulk import insert_rows, DEFAULT_INSERT_CHUNK_SIZE, DEFAULT_MAX_PACKET_BYTES
+from src.database.schema import TableProjection
+from src.database.statements import statements_for
+from src.utils.json_columns import json_column
 from src.utils.logger import get_logger
 logger = get_logger("alarm_update_service")
+
+ALARM_UPDATE_COLUMNS = (
+    'id', 'alarm_id', 'update_timestamp_utc', 'event', 'user_id',
+    'plain_text_comment', 'current_status', 'tenant_id', 'update_details',
+)
+ALARM_UPDATE_PROJECTION = TableProjection(
+    'alarm_updates',
+    ('update_timestamp_utc', 'event', 'user_id', 'plain_text_comment', 'current_status', 'update_details'),
+    destination_columns=ALARM_UPDATE_COLUMNS
+)
 # ... existing code ...
 def fetch_alarm_updates(source_conn, original_alarm_id):
     try:
-        cursor = source_conn.cursor(dictionary=True)
-        query = "SELECT * FROM alarm_updates WHERE alarm_id = %s"
-        cursor.execute(query, (original_alarm_id,))
-        updates = cursor.fetchall()
+        updates = statements_for(source_conn).select(
+            'alarm_updates', ALARM_UPDATE_PROJECTION.select_list(source_conn), ('alarm_id',), (original_alarm_id,)
+        )
 
         if updates:
             logger.info(f"Found {len(updates)} alarm update(s) for alarm ID {original_alarm_id}")
@@ -21,12 +33,63 @@ def fetch_alarm_updates(source_conn, original_alarm_id):
     except Exception as e:
         logger.error(f"Error fetching alarm_updates: {e}")
         return []
+# ... existing code ...
+def fetch_alarm_updates_by_alarm_ids(source_conn, original_alarm_ids):
+    """
+    Fetches the updates of a whole chunk of alarms in one round-trip, as
+    {source alarm id: [update, ...]}.
+    """
+    if not original_alarm_ids:
+        return {}
+    cursor = source_conn.cursor(dictionary=True)
+    try:
+        placeholders = ', '.join(['%s'] * len(original_alarm_ids))
+        cursor.execute(
+            f"SELECT alarm_id, {ALARM_UPDATE_PROJECTION.select_list(source_conn)} FROM alarm_updates WHERE alarm_id IN ({placeholders})",
+            tuple(original_alarm_ids)
+        )
+        updates = {alarm_id: [] for alarm_id in original_alarm_ids}
+        for row in cursor.fetchall():
+            updates[row.pop('alarm_id')].append(row)
+        return updates
+    finally:
+        cursor.close()
 
+def fetch_alarm_update_user_ids(source_conn, original_alarm_ids):
+    """
+    The distinct users referenced by the updates of a chunk of alarms, in one round-trip.
+    """
+    if not original_alarm_ids:
+        return []
+    cursor = source_conn.cursor()
+    try:
+        placeholders = ', '.join(['%s'] * len(original_alarm_ids))
+        cursor.execute(
+            f"SELECT DISTINCT user_id FROM alarm_updates WHERE alarm_id IN ({placeholders}) AND user_id IS NOT NULL",
+            tuple(original_alarm_ids)
+        )
+        return [row[0] for row in cursor.fetchall()]
     finally:
-        if cursor:
-            cursor.close()
-# ... existing code ...
-def insert_alarm_updates(dest_conn, source_conn, updates, new_alarm_id, new_tenant_id):
+        cursor.close()
+
+def alarm_update_row(update, new_update_id, new_alarm_id, new_user_id, new_tenant_id):
+    """
+    The alarm_updates row for a copied update, ordered like ALARM_UPDATE_COLUMNS.
+    """
+    return (
+        new_update_id,
+        new_alarm_id,
+        update['update_timestamp_utc'],
+        update['event'],
+        new_user_id,
+        update['plain_text_comment'],
+        update['current_status'],
+        new_tenant_id,
+        json_column(update.get('update_details'))
+    )
+
+def insert_alarm_updates(dest_conn, source_conn, updates, new_alarm_id, new_tenant_id, user_resolver=None,
+                         chunk_size=DEFAULT_INSERT_CHUNK_SIZE, max_packet_bytes=DEFAULT_MAX_PACKET_BYTES, commit=True):
     if not updates:
         logger.info("No updates to insert.")
         return None
@@ -35,51 +98,39 @@ def insert_alarm_updates(dest_conn, source_conn, updates, new_alarm_id, new_tena
     last_inserted_id = None
 
     try:
-        cursor = dest_conn.cursor()
+        if user_resolver:
+            user_resolver.preload(source_conn, dest_conn, [update.get('user_id') for update in updates], new_tenant_id, commit)
 
+        rows = []
         for update in updates:
             new_update_id = str(uuid.uuid4())
 
             old_user_id = update.get('user_id')
             new_user_id = None
 
-            if old_user_id:
+            if old_user_id and user_resolver:
+                new_user_id = user_resolver.resolve(source_conn, dest_conn, old_user_id, new_tenant_id, commit)
+            elif old_user_id:
                 user_record = fetch_user_by_id(source_conn, old_user_id)
                 if user_record:
-                    new_user_id = insert_user_if_not_exists(dest_conn, user_record, new_tenant_id)
-
-            update_details = update.get('update_details')
-            if isinstance(update_details, (dict, list)):
-                update_details = json.dumps(update_details)
-
-            query = """
-                INSERT INTO alarm_updates (
-                    id, alarm_id, update_timestamp_utc, event, user_id,
-                    plain_text_comment, current_status, tenant_id, update_details
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            values = (
-                new_update_id,
-                new_alarm_id,
-                update['update_timestamp_utc'],
-                update['event'],
-                new_user_id,  
-                update['plain_text_comment'],
-                update['current_status'],
-                new_tenant_id,
-                update_details
-            )
-
-            cursor.execute(query, values)
-            logger.info(f"Inserted alarm update with new ID {new_update_id}")
+                    new_user_id = insert_user_if_not_exists(dest_conn, user_record, new_tenant_id, commit)
+
+            rows.append(alarm_update_row(update, new_update_id, new_alarm_id, new_user_id, new_tenant_id))
             last_inserted_id = new_update_id
 
-        dest_conn.commit()
-        logger.info(f"Committed {len(updates)} alarm update(s) for alarm ID {new_alarm_id}")
+        cursor = dest_conn.cursor()
+        statements = insert_rows(cursor, 'alarm_updates', ALARM_UPDATE_COLUMNS, rows, chunk_size, max_packet_bytes)
+        logger.info(f"Inserted {len(rows)} alarm update(s) in {statements} statement(s)")
+
+        if commit:
+            dest_conn.commit()
+            logger.info(f"Committed {len(updates)} alarm update(s) for alarm ID {new_alarm_id}")
         return last_inserted_id
 
     except Exception as e:
         logger.error(f"Error inserting alarm_updates: {e}")
+        if not commit:
+            raise
         dest_conn.rollback()
         return None
 
@@ -0,0 +1,228 @@
+import os
+import shutil
+import time
+import uuid
+from src.database.load_data import StagingFile, load_file, check_local_infile
+from src.services.alarm_service import prepare_new_raw_alarm_data
+from src.services.alarm_update_service import fetch_alarm_updates_by_alarm_ids, alarm_update_row, ALARM_UPDATE_COLUMNS
+from src.services.employee_service import fetch_employee_data_by_id
+from src.services.media_service import fetch_alarm_media_by_alarm_ids, media_to_copy, media_row, read_media_ids, MEDIA_COLUMNS
+from src.services.ml_service import (
+    fetch_ml_outputs_by_ids, fetch_video_tags_by_ml_output_ids, ml_output_row, video_tag_rows,
+    ML_OUTPUT_COLUMNS, VIDEO_TAG_COLUMNS
+)
+from src.utils.logger import get_logger
+from src.utils.tracing import span
+logger = get_logger("bulk_load_service")
+
+DEFAULT_STAGING_DIR = 'bulk_load_staging'
+
+
+class ChunkLoader:
+    """
+    Migrates a whole batch chunk in one destination transaction; subclasses implement _load().
+    """
+    span_name = "load_chunk"
+    # Raw alarm columns the batch loop prefetches; None reads the whole projection
+    prefetch_columns = None
+
+    def __init__(self, context, new_camera_id, new_tenant_id, new_door_id):
+        self.context = context
+        self.new_camera_id = new_camera_id
+        self.new_tenant_id = new_tenant_id
+        self.new_door_id = new_door_id
+        self._chunks = 0
+
+    def check(self):
+        """
+        Raises before the run starts when the destination cannot take this mode.
+        """
+
+    def load_chunk(self, entries):
+        """
+        Migrates duplicate-checked (row, original alarm) entries, stores each
+        outcome in row['logs'] and returns the outcomes in entry order.
+        """
+        if not entries:
+            return []
+        self._chunks += 1
+        context = self.context
+        with span(self.span_name, alarms=len(entries)) as tags, \
+                context.source_pool.connection() as source_conn, context.dest_connection() as dest_conn:
+            if source_conn is None or dest_conn is None:
+                raise RuntimeError("Failed to connect to source or destination DB")
+            try:
+                outcomes = self._load(source_conn, dest_conn, entries)
+            except Exception as e:
+                logger.error(f"❌ Loading a chunk of {len(entries)} alarm(s) failed: {e}")
+                dest_conn.rollback()
+                self._failed()
+                outcomes = {row['raw_alarm_id']: (f"Error: {e}", None) for row, _ in entries}
+            tags['rows'] = sum(1 for log, _ in outcomes.values() if log == "Success")
+        results = []
+        for row, original_alarm in entries:
+            log, new_alarm_id = outcomes[row['raw_alarm_id']]
+            row['logs'] = log
+            if log == "Success":
+                context.ledger.record(row['raw_alarm_id'], log, new_alarm_id, original_alarm.get('partition_key'))
+            else:
+                context.ledger.record(row['raw_alarm_id'], log)
+            if context.metrics:
+                context.metrics.alarm_finished(log, None if log == "Success" else 'bulk_load')
+            results.append(log)
+        return results
+
+    def _load(self, source_conn, dest_conn, entries):
+        raise NotImplementedError
+
+    def _failed(self):
+        """
+        Called after a failed chunk was rolled back.
+        """
+
+
+class BulkLoader(ChunkLoader):
+    """
+    Loads a chunk from per-table staging files with LOAD DATA LOCAL INFILE.
+    """
+    span_name = "bulk_load_chunk"
+
+    def __init__(self, context, new_camera_id, new_tenant_id, new_door_id, staging_dir=DEFAULT_STAGING_DIR,
+                 keep_files=False):
+        super().__init__(context, new_camera_id, new_tenant_id, new_door_id)
+        self.staging_dir = staging_dir
+        self.keep_files = keep_files
+        # Chunk numbers restart with every run; the run directory keeps
+        # the files of earlier runs from being overwritten
+        self._run_dir = os.path.join(staging_dir, f"run_{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}")
+        self._chunk_dir = None
+        self._staged = []
+
+    def check(self):
+        with self.context.dest_connection() as dest_conn:
+            if dest_conn is None:
+                raise RuntimeError("Failed to connect to destination DB")
+            check_local_infile(dest_conn)
+
+    def _failed(self):
+        logger.error(f"❌ Staging files kept in {self._chunk_dir}")
+
+    def _stage(self, table, columns):
+        staging_file = StagingFile(os.path.join(self._chunk_dir, f"{table}.tsv"), table, columns)
+        self._staged.append(staging_file)
+        return staging_file
+
+    def _load(self, source_conn, dest_conn, entries):
+        self._chunk_dir = os.path.join(self._run_dir, f"chunk_{self._chunks:05d}")
+        os.makedirs(self._chunk_dir, exist_ok=True)
+        try:
+            outcomes = self._load_staged(source_conn, dest_conn, entries)
+        finally:
+            # A chunk that raises half-way leaves no file handle open
+            for staging_file in self._staged:
+                staging_file.close()
+            self._staged = []
+        if not self.keep_files:
+            shutil.rmtree(self._chunk_dir, ignore_errors=True)
+            try:
+                os.rmdir(self._run_dir)
+            except OSError:
+                # Still holds the files of a failed chunk
+                pass
+        return outcomes
+
+    def _load_staged(self, source_conn, dest_conn, entries):
+        context = self.context
+        alarm_ids = [row['raw_alarm_id'] for row, _ in entries]
+        ml_output_ids = [alarm['ml_output_id'] for _, alarm in entries if alarm.get('ml_output_id')]
+        media_by_alarm = fetch_alarm_media_by_alarm_ids(source_conn, alarm_ids)
+        updates_by_alarm = fetch_alarm_updates_by_alarm_ids(source_conn, alarm_ids)
+        ml_outputs = fetch_ml_outputs_by_ids(source_conn, ml_output_ids)
+        video_tags = fetch_video_tags_by_ml_output_ids(source_conn, [ml_output_id for ml_output_id in ml_output_ids if ml_output_id in ml_outputs])
+
+        outcomes = {}
+        alarms = []
+        for row, original_alarm in entries:
+            records, latest = media_to_copy(media_by_alarm[row['raw_alarm_id']], context.copy_all_media)
+            if not records:
+                logger.error(f"❌ No media records found for raw alarm {row['raw_alarm_id']}. Skipping.")
+                outcomes[row['raw_alarm_id']] = ("No media records found", None)
+                continue
+            alarms.append((row['raw_alarm_id'], original_alarm, str(uuid.uuid4()), records, latest))
+
+        # 1️⃣ Employees and users commit as they are created, so they are
+        # resolved before anything of the chunk is loaded
+        employee_ids = {}
+        for _, original_alarm, *_ in alarms:
+            employee_id = original_alarm.get('employee_id')
+            if employee_id and employee_id not in employee_ids:
+                employee_ids[employee_id] = self._resolve_employee(source_conn, dest_conn, employee_id)
+        user_resolver = context.user_resolver
+        user_resolver.preload(
+            source_conn, dest_conn,
+            [update.get('user_id') for raw_alarm_id, *_ in alarms for update in updates_by_alarm[raw_alarm_id]],
+            self.new_tenant_id
+        )
+
+        # 2️⃣ Media, whose generated ids the raw alarms need
+        media_file = self._stage('alarm_media', MEDIA_COLUMNS)
+        for _, _, new_alarm_id, records, _ in alarms:
+            media_file.write_rows(media_row(record, new_alarm_id) for record in records)
+        load_file(dest_conn, media_file)
+        cursor = dest_conn.cursor()
+        try:
+            media_ids = read_media_ids(
+                cursor, {new_alarm_id: len(records) for _, _, new_alarm_id, records, _ in alarms}, context.insert_chunk_size
+            )
+        finally:
+            cursor.close()
+
+        ml_output_file = self._stage('ml_outputs', ML_OUTPUT_COLUMNS)
+        video_tag_file = self._stage('video_tags', VIDEO_TAG_COLUMNS)
+        update_file = self._stage('alarm_updates', ALARM_UPDATE_COLUMNS)
+        raw_alarm_rows = []
+        for raw_alarm_id, original_alarm, new_alarm_id, _, latest in alarms:
+            new_alarm_data = prepare_new_raw_alarm_data(
+                original_alarm_data=original_alarm,
+                new_camera_id=self.new_camera_id,
+                new_tenant_id=self.new_tenant_id,
+                alarm_type_id=context.alarm_types.resolve(original_alarm.get('alarm_type_id'))[1],
+                new_door_id=self.new_door_id,
+                new_employee_id=employee_ids.get(original_alarm.get('employee_id')),
+                new_latest_media_id=media_ids[new_alarm_id][latest],
+                new_alarm_id=new_alarm_id
+            )
+            new_alarm_data['ml_output_id'] = None
+            ml_output_data = ml_outputs.get(original_alarm.get('ml_output_id'))
+            if ml_output_data:
+                new_ml_output_id = str(uuid.uuid4())
+                ml_output_file.write_row(ml_output_row(ml_output_data, new_ml_output_id, new_alarm_id, self.new_tenant_id))
+                video_tag_file.write_rows(video_tag_rows(video_tags[original_alarm['ml_output_id']], new_ml_output_id, self.new_tenant_id))
+                new_alarm_data['ml_output_id'] = new_ml_output_id
+            new_alarm_data['alarm_update_id'] = None
+            for update in updates_by_alarm[raw_alarm_id]:
+                new_update_id = str(uuid.uuid4())
+                new_user_id = user_resolver.resolve(source_conn, dest_conn, update.get('user_id'), self.new_tenant_id)
+                update_file.write_row(alarm_update_row(update, new_update_id, new_alarm_id, new_user_id, self.new_tenant_id))
+                new_alarm_data['alarm_update_id'] = new_update_id
+            raw_alarm_rows.append(new_alarm_data)
+
+        # 3️⃣ Children before the raw alarms that point at them
+        for staging_file in (ml_output_file, video_tag_file, update_file):
+            load_file(dest_conn, staging_file)
+        if raw_alarm_rows:
+            columns = list(raw_alarm_rows[0])
+            raw_alarm_file = self._stage('raw_alarms_v2', columns)
+            raw_alarm_file.write_rows([alarm[column] for column in columns] for alarm in raw_alarm_rows)
+            load_file(dest_conn, raw_alarm_file)
+        dest_conn.commit()
+        logger.info(f"✅ Bulk-loaded {len(alarms)} alarm(s) from {self._chunk_dir}")
+        for (raw_alarm_id, *_), new_alarm_data in zip(alarms, raw_alarm_rows):
+            outcomes[raw_alarm_id] = ("Success", new_alarm_data['id'])
+        return outcomes
+
+    def _resolve_employee(self, source_conn, dest_conn, employee_id):
+        employee_data = fetch_employee_data_by_id(source_conn, employee_id)
+        if not employee_data:
+            return None
+        return self.context.employee_index.resolve(dest_conn, employee_data)[0]
@@ -1,36 +1,57 @@
+import uuid
+from src.database.schema import TableProjection
+from src.database.statements import statements_for
+from src.models.lookup_index import LookupIndex
 from src.utils.logger import get_logger
 logger = get_logger("door_service")
 
-def fetch_door_data_by_id(source_connection, door_id):
-    cursor = source_connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM doors WHERE id = %s", (door_id,))
-    door_data = cursor.fetchone()
-    return door_data
+# Doors are copied wholesale; door_name is what the lookup matches on
+DOOR_PROJECTION = TableProjection('doors', ('id', 'door_name'), copy_columns=True)
+# Tenant and location every migrated door is filed under
+DOOR_TENANT_ID = 'demo-sales'
+DOOR_LOCATION_ID = '1375'
 
+def fetch_door_data_by_id(source_connection, door_id):
+    return statements_for(source_connection).select_one('doors', DOOR_PROJECTION.select_list(source_connection), ('id',), (door_id,))
 
-def insert_door_data_to_destination(destination_connection, door_data, new_door_id):
-    cursor = destination_connection.cursor()
 
+def insert_door_data_to_destination(destination_connection, door_data, new_door_id, commit=True):
     door_data['id'] = new_door_id  
-    door_data['tenant_id'] = 'demo-sales'  
-    door_data['location_id'] = '1375'  
-    columns = ', '.join(door_data.keys())
-    placeholders = ', '.join(['%s'] * len(door_data))
-    query = f"INSERT INTO doors ({columns}) VALUES ({placeholders})"
-    cursor.execute(query, list(door_data.values()))
-    destination_connection.commit()
+    door_data['tenant_id'] = DOOR_TENANT_ID
+    door_data['location_id'] = DOOR_LOCATION_ID
+    statements_for(destination_connection).insert('doors', door_data.keys(), door_data.values())
+    if commit:
+        destination_connection.commit()
     return True
 
 
 def get_door_from_destination(destination_connection, door_data):
-    cursor = destination_connection.cursor(dictionary=True)
-    query = "SELECT * FROM doors WHERE tenant_id = %s AND location_id = %s AND door_name = %s"
-    cursor.execute(query, ('demo-sales', '1375', door_data['door_name']))
-    door = cursor.fetchone()
+    door = statements_for(destination_connection).select_one(
+        'doors', 'id', ('tenant_id', 'location_id', 'door_name'), (DOOR_TENANT_ID, DOOR_LOCATION_ID, door_data['door_name'])
+    )
 
     if door:
         logger.info(f"🚪 Door with name '{door_data['door_name']}' already exists in the destination database with ID: {door['id']}.")
         return door
     else:
         logger.info(f"🚪 Door with name '{door_data['door_name']}' does not exist in the destination database.")
-        return None 
\ No newline at end of file
+        return None
+
+
+class DoorIndex(LookupIndex):
+    """
+    The destination doors of DOOR_TENANT_ID and DOOR_LOCATION_ID by name.
+    """
+    table = 'doors'
+    key_columns = ('door_name',)
+    scope = {'tenant_id': DOOR_TENANT_ID, 'location_id': DOOR_LOCATION_ID}
+    label = 'door'
+
+    def _find(self, dest_conn, data):
+        door = get_door_from_destination(dest_conn, data)
+        return door['id'] if door else None
+
+    def _insert(self, dest_conn, data, commit):
+        new_door_id = str(uuid.uuid4())
+        insert_door_data_to_destination(dest_conn, data, new_door_id, commit)
+        return new_door_id
@@ -1,35 +1,56 @@
+import uuid
+from src.database.schema import TableProjection
+from src.database.statements import statements_for
+from src.models.lookup_index import LookupIndex
 from src.utils.logger import get_logger
 logger = get_logger("employee_service")
 
-def fetch_employee_data_by_id(source_connection, employee_id):
-    cursor = source_connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM employees WHERE id = %s", (employee_id,))
-    employee_data = cursor.fetchone()
-    return employee_data
+# Employees are copied wholesale; the lookup matches on name and phone number
+EMPLOYEE_PROJECTION = TableProjection('employees', ('id', 'first_name', 'last_name', 'phone_number'), copy_columns=True)
+# Tenant every migrated employee is filed under
+EMPLOYEE_TENANT_ID = 'demo-sales'
 
+def fetch_employee_data_by_id(source_connection, employee_id):
+    return statements_for(source_connection).select_one('employees', EMPLOYEE_PROJECTION.select_list(source_connection), ('id',), (employee_id,))
 
-def insert_employee_data_to_destination(destination_connection, employee_data, new_employee_id):
-    cursor = destination_connection.cursor()
 
+def insert_employee_data_to_destination(destination_connection, employee_data, new_employee_id, commit=True):
     employee_data['id'] = new_employee_id  
-    employee_data['tenant_id'] = 'demo-sales'  
-    columns = ', '.join(employee_data.keys())
-    placeholders = ', '.join(['%s'] * len(employee_data))
-    query = f"INSERT INTO employees ({columns}) VALUES ({placeholders})"
-    cursor.execute(query, list(employee_data.values()))
-    destination_connection.commit()
+    employee_data['tenant_id'] = EMPLOYEE_TENANT_ID
+    statements_for(destination_connection).insert('employees', employee_data.keys(), employee_data.values())
+    if commit:
+        destination_connection.commit()
     return True
 
 
 def get_employee_from_destination(destination_connection, employee_data):
-    cursor = destination_connection.cursor(dictionary=True)
-    query = "SELECT * FROM employees WHERE tenant_id = %s AND first_name = %s AND last_name = %s AND phone_number = %s"
-    cursor.execute(query, ('demo-sales', employee_data['first_name'], employee_data['last_name'], employee_data['phone_number']))
-    employee = cursor.fetchone()
+    employee = statements_for(destination_connection).select_one(
+        'employees', 'id', ('tenant_id', 'first_name', 'last_name', 'phone_number'),
+        (EMPLOYEE_TENANT_ID, employee_data['first_name'], employee_data['last_name'], employee_data['phone_number'])
+    )
 
     if employee:
         logger.info(f"Employee '{employee_data['first_name']} {employee_data['last_name']}' already exists in the destination database with ID: {employee['id']}.")
         return employee
     else:
         logger.info(f"Employee '{employee_data['first_name']} {employee_data['last_name']}' does not exist in the destination database.")
-        return None 
\ No newline at end of file
+        return None
+
+
+class EmployeeIndex(LookupIndex):
+    """
+    The destination employees of EMPLOYEE_TENANT_ID by name and phone number.
+    """
+    table = 'employees'
+    key_columns = ('first_name', 'last_name', 'phone_number')
+    scope = {'tenant_id': EMPLOYEE_TENANT_ID}
+    label = 'employee'
+
+    def _find(self, dest_conn, data):
+        employee = get_employee_from_destination(dest_conn, data)
+        return employee['id'] if employee else None
+
+    def _insert(self, dest_conn, data, commit):
+        new_employee_id = str(uuid.uuid4())
+        insert_employee_data_to_destination(dest_conn, data, new_employee_id, commit)
+        return new_employee_id
@@ -1,29 +1,154 @@
+from src.database.bulk import insert_rows, DEFAULT_INSERT_CHUNK_SIZE, DEFAULT_MAX_PACKET_BYTES
+from src.database.schema import TableProjection
+from src.database.statements import statements_for
 from src.utils.logger import get_logger
 logger = get_logger("media_service")
 
+MEDIA_COLUMNS = ('alarm_id', 'media_type', 'media_url', 'created_at_utc', 'updated_at_utc')
+MEDIA_PROJECTION = TableProjection('alarm_media', MEDIA_COLUMNS[1:], destination_columns=MEDIA_COLUMNS)
+
 
 def fetch_alarm_media_by_alarm_id(connection, alarm_id):
-    cursor = connection.cursor(dictionary=True)
-    cursor.execute("SELECT * FROM alarm_media WHERE alarm_id = %s", (alarm_id,))
-    media_records = cursor.fetchall()
+    media_records = statements_for(connection).select('alarm_media', MEDIA_PROJECTION.select_list(connection), ('alarm_id',), (alarm_id,))
     if len(media_records) != 1:
         logger.warning(f"Expected 1 media record, found {len(media_records)}")
     return media_records
 
 
-def insert_alarm_media_and_get_id(connection, media_record, new_alarm_id):
-    cursor = connection.cursor()
-    query = """
-        INSERT INTO alarm_media (alarm_id, media_type, media_url, created_at_utc, updated_at_utc)
-        VALUES (%s, %s, %s, %s, %s)
+def fetch_alarm_media_by_alarm_ids(connection, alarm_ids):
+    """
+    Fetches the media of a whole chunk of alarms in one round-trip, as
+    {source alarm id: [media record, ...]}.
+    """
+    if not alarm_ids:
+        return {}
+    cursor = connection.cursor(dictionary=True)
+    try:
+        placeholders = ', '.join(['%s'] * len(alarm_ids))
+        cursor.execute(
+            f"SELECT alarm_id, {MEDIA_PROJECTION.select_list(connection)} FROM alarm_media WHERE alarm_id IN ({placeholders})",
+            tuple(alarm_ids)
+        )
+        media_by_alarm = {alarm_id: [] for alarm_id in alarm_ids}
+        for row in cursor.fetchall():
+            media_by_alarm[row.pop('alarm_id')].append(row)
+        return media_by_alarm
+    finally:
+        cursor.close()
+
+
+def media_to_copy(media_records, copy_all=False):
+    """
+    Returns the records to copy and the index of the one the raw alarm's
+    latest_alarm_media_id points at: the first record by default, or every
+    record with the most recently created one as latest.
     """
-    values = (
+    if not media_records:
+        return [], None
+    if not copy_all:
+        return media_records[:1], 0
+    latest = max(
+        range(len(media_records)),
+        key=lambda index: (media_records[index]['created_at_utc'] is not None, media_records[index]['created_at_utc'] or 0, index)
+    )
+    return media_records, latest
+
+
+def media_row(media_record, new_alarm_id):
+    """
+    The alarm_media row for one copied record, ordered like MEDIA_COLUMNS.
+    """
+    return (
         new_alarm_id,
         media_record['media_type'],
         media_record['media_url'],
-        media_record['created_at_utc'],  
-        media_record['updated_at_utc'],  
+        media_record['created_at_utc'],
+        media_record['updated_at_utc'],
     )
-    cursor.execute(query, values)
-    connection.commit()
+
+
+def read_media_ids(cursor, expected_counts, chunk_size=DEFAULT_INSERT_CHUNK_SIZE):
+    """
+    Returns {new alarm id: [media id, ...]} in insertion order for media rows
+    just written under fresh alarm ids, given {new alarm id: rows written}.
+    lastrowid only identifies the first row of a statement and consecutive
+    ids are not guaranteed (auto_increment_increment, interleaved lock mode),
+    but nothing else references the new alarm ids yet and auto-increment ids
+    grow within a session. Raises RuntimeError when a count does not match.
+    """
+    alarm_ids = list(expected_counts)
+    media_ids = {alarm_id: [] for alarm_id in alarm_ids}
+    for start in range(0, len(alarm_ids), chunk_size):
+        batch = alarm_ids[start:start + chunk_size]
+        cursor.execute(
+            f"SELECT id, alarm_id FROM alarm_media WHERE alarm_id IN ({', '.join(['%s'] * len(batch))}) ORDER BY id",
+            tuple(batch)
+        )
+        for media_id, alarm_id in cursor.fetchall():
+            media_ids[alarm_id].append(media_id)
+    for alarm_id, expected in expected_counts.items():
+        if len(media_ids[alarm_id]) != expected:
+            raise RuntimeError(f"Read back {len(media_ids[alarm_id])} media id(s) for alarm {alarm_id}, inserted {expected}")
+    return media_ids
+
+
+class CopiedMedia:
+    """
+    Media already written for an alarm by the bulk media stage: the new alarm
+    id the rows reference and the generated media ids, in source order.
+    """
+    def __init__(self, new_alarm_id, media_ids, latest_index):
+        self.new_alarm_id = new_alarm_id
+        self.media_ids = media_ids
+        self.latest_media_id = media_ids[latest_index] if media_ids else None
+
+
+def insert_alarm_media_bulk(connection, media_by_alarm, copy_all=False, chunk_size=DEFAULT_INSERT_CHUNK_SIZE,
+                            max_packet_bytes=DEFAULT_MAX_PACKET_BYTES, commit=True):
+    """
+    Inserts the media of many alarms with multi-row INSERTs, given
+    {new alarm id: [media record, ...]}, and returns {new alarm id: CopiedMedia}.
+    The generated ids are read back by the new alarm ids (see read_media_ids).
+    """
+    selected = {new_alarm_id: media_to_copy(records, copy_all) for new_alarm_id, records in media_by_alarm.items()}
+    rows = [media_row(record, new_alarm_id) for new_alarm_id, (records, _) in selected.items() for record in records]
+    expected_counts = {new_alarm_id: len(records) for new_alarm_id, (records, _) in selected.items() if records}
+    cursor = connection.cursor()
+    try:
+        statements = insert_rows(cursor, 'alarm_media', MEDIA_COLUMNS, rows, chunk_size, max_packet_bytes)
+        media_ids = read_media_ids(cursor, expected_counts, chunk_size)
+        if commit:
+            connection.commit()
+    finally:
+        cursor.close()
+    logger.info(f"✅ Inserted {len(rows)} media record(s) for {len(expected_counts)} alarm(s) in {statements} statement(s)")
+    return {
+        new_alarm_id: CopiedMedia(new_alarm_id, media_ids.get(new_alarm_id, []), latest)
+        for new_alarm_id, (_, latest) in selected.items()
+    }
+
+
+def delete_alarm_media(connection, new_alarm_ids, chunk_size=DEFAULT_INSERT_CHUNK_SIZE):
+    """
+    Deletes and commits the media written under new alarm ids whose alarms
+    were not migrated after all; returns the rows deleted.
+    """
+    new_alarm_ids = list(new_alarm_ids)
+    deleted = 0
+    cursor = connection.cursor()
+    try:
+        for start in range(0, len(new_alarm_ids), chunk_size):
+            batch = new_alarm_ids[start:start + chunk_size]
+            cursor.execute(f"DELETE FROM alarm_media WHERE alarm_id IN ({', '.join(['%s'] * len(batch))})", tuple(batch))
+            deleted += cursor.rowcount
+        connection.commit()
+    finally:
+        cursor.close()
+    return deleted
+
+
+def insert_alarm_media_and_get_id(connection, media_record, new_alarm_id, commit=True):
+    cursor = statements_for(connection).insert('alarm_media', MEDIA_COLUMNS, media_row(media_record, new_alarm_id))
+    if commit:
+        connection.commit()
     return cursor.lastrowid 
\ No newline at end of file
@@ -1,88 +1,146 @@
 import uuid
-import json
+from src.database.bulk import insert_rows, DEFAULT_INSERT_CHUNK_SIZE, DEFAULT_MAX_PACKET_BYTES
+from src.database.schema import TableProjection
+from src.database.statements import statements_for
+from src.utils.json_columns import json_column
 from src.utils.logger import get_logger
 
 logger = get_logger("ml_service")
 
+VIDEO_TAG_COLUMNS = ('id', 'video_tag', 'ml_output_id', 'tenant_id', 'created_at_utc', 'updated_at_utc')
+ML_OUTPUT_COLUMNS = (
+    'id', 'alarm_id', 'true_alarm_probability', 'haie_ml_version', 'tenant_id', 'created_at_utc',
+    'updated_at_utc', 'ml_output_timestamp_utc', 'processed_frames', 'deadzone_detections',
+)
+# The copied columns; ids and tenant are replaced on insert
+ML_OUTPUT_PROJECTION = TableProjection(
+    'ml_outputs',
+    ('true_alarm_probability', 'haie_ml_version', 'created_at_utc', 'updated_at_utc',
+     'ml_output_timestamp_utc', 'processed_frames', 'deadzone_detections'),
+    destination_columns=ML_OUTPUT_COLUMNS
+)
+VIDEO_TAG_PROJECTION = TableProjection(
+    'video_tags', ('video_tag', 'created_at_utc', 'updated_at_utc'), destination_columns=VIDEO_TAG_COLUMNS
+)
+
 def fetch_ml_output_by_id(source_conn, ml_output_id):
     try:
-        cursor = source_conn.cursor(dictionary=True)
-        query = "SELECT * FROM ml_outputs WHERE id = %s"
-        cursor.execute(query, (ml_output_id,))
-        return cursor.fetchone()
+        return statements_for(source_conn).select_one('ml_outputs', ML_OUTPUT_PROJECTION.select_list(source_conn), ('id',), (ml_output_id,))
     except Exception as e:
         logger.error(f"❌ Error fetching ML Output: {e}")
         return None
 
 def fetch_video_tags_by_ml_output_id(source_conn, ml_output_id):
     try:
-        cursor = source_conn.cursor(dictionary=True)
-        query = "SELECT * FROM video_tags WHERE ml_output_id = %s"
-        cursor.execute(query, (ml_output_id,))
-        return cursor.fetchall()
+        return statements_for(source_conn).select('video_tags', VIDEO_TAG_PROJECTION.select_list(source_conn), ('ml_output_id',), (ml_output_id,))
     except Exception as e:
         logger.error(f"❌ Error fetching video tags: {e}")
         return []
 
-def insert_ml_output_to_destination(dest_conn, ml_output_data, new_alarm_id, new_tenant_id):
+def fetch_ml_outputs_by_ids(source_conn, ml_output_ids):
+    """
+    Fetches the ML outputs of a whole chunk in one round-trip, keyed by id.
+    """
+    if not ml_output_ids:
+        return {}
+    cursor = source_conn.cursor(dictionary=True)
     try:
-        cursor = dest_conn.cursor()
-        new_ml_output_id = str(uuid.uuid4())
+        placeholders = ', '.join(['%s'] * len(ml_output_ids))
+        cursor.execute(
+            f"SELECT id, {ML_OUTPUT_PROJECTION.select_list(source_conn)} FROM ml_outputs WHERE id IN ({placeholders})",
+            tuple(ml_output_ids)
+        )
+        return {row.pop('id'): row for row in cursor.fetchall()}
+    finally:
+        cursor.close()
 
-        query = """
-            INSERT INTO ml_outputs (
-                id, alarm_id, true_alarm_probability, haie_ml_version,
-                tenant_id, created_at_utc, updated_at_utc,
-                ml_output_timestamp_utc, processed_frames, deadzone_detections
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        values = (
+def fetch_video_tags_by_ml_output_ids(source_conn, ml_output_ids):
+    """
+    Fetches the video tags of a whole chunk in one round-trip, as
+    {ml output id: [video tag, ...]}.
+    """
+    if not ml_output_ids:
+        return {}
+    cursor = source_conn.cursor(dictionary=True)
+    try:
+        placeholders = ', '.join(['%s'] * len(ml_output_ids))
+        cursor.execute(
+            f"SELECT ml_output_id, {VIDEO_TAG_PROJECTION.select_list(source_conn)} FROM video_tags WHERE ml_output_id IN ({placeholders})",
+            tuple(ml_output_ids)
+        )
+        video_tags = {ml_output_id: [] for ml_output_id in ml_output_ids}
+        for row in cursor.fetchall():
+            video_tags[row.pop('ml_output_id')].append(row)
+        return video_tags
+    finally:
+        cursor.close()
+
+def ml_output_row(ml_output_data, new_ml_output_id, new_alarm_id, new_tenant_id):
+    """
+    The ml_outputs row for a copied ML output, ordered like ML_OUTPUT_COLUMNS.
+    """
+    return (
+        new_ml_output_id,
+        new_alarm_id,
+        ml_output_data['true_alarm_probability'],
+        ml_output_data['haie_ml_version'],
+        new_tenant_id,
+        ml_output_data['created_at_utc'],
+        ml_output_data['updated_at_utc'],
+        ml_output_data['ml_output_timestamp_utc'],
+        json_column(ml_output_data['processed_frames']) if ml_output_data['processed_frames'] else None,
+        ml_output_data['deadzone_detections']
+    )
+
+def video_tag_rows(video_tags, new_ml_output_id, new_tenant_id):
+    """
+    The video_tags rows for copied tags, ordered like VIDEO_TAG_COLUMNS.
+    """
+    return [
+        (
+            str(uuid.uuid4()),
+            tag['video_tag'],
             new_ml_output_id,
-            new_alarm_id,
-            ml_output_data['true_alarm_probability'],
-            ml_output_data['haie_ml_version'],
             new_tenant_id,
-            ml_output_data['created_at_utc'],
-            ml_output_data['updated_at_utc'],
-            ml_output_data['ml_output_timestamp_utc'],
-            json.dumps(ml_output_data['processed_frames']) if ml_output_data['processed_frames'] else None,
-            ml_output_data['deadzone_detections']
+            tag['created_at_utc'],
+            tag['updated_at_utc']
         )
-        cursor.execute(query, values)
-        dest_conn.commit()
+        for tag in video_tags
+    ]
+
+def insert_ml_output_to_destination(dest_conn, ml_output_data, new_alarm_id, new_tenant_id, commit=True):
+    try:
+        new_ml_output_id = str(uuid.uuid4())
+        values = ml_output_row(ml_output_data, new_ml_output_id, new_alarm_id, new_tenant_id)
+        statements_for(dest_conn).insert('ml_outputs', ML_OUTPUT_COLUMNS, values)
+        if commit:
+            dest_conn.commit()
 
         logger.info(f"✅ Inserted ML Output with new ID: {new_ml_output_id}")
         return new_ml_output_id
 
     except Exception as e:
         logger.error(f"❌ Error inserting ML Output: {e}")
+        if not commit:
+            # Leave the rollback to the caller that owns the transaction
+            raise
         dest_conn.rollback()
         return None
 
-def insert_video_tags_to_destination(dest_conn, video_tags, new_ml_output_id, new_tenant_id):
+def insert_video_tags_to_destination(dest_conn, video_tags, new_ml_output_id, new_tenant_id,
+                                     chunk_size=DEFAULT_INSERT_CHUNK_SIZE, max_packet_bytes=DEFAULT_MAX_PACKET_BYTES, commit=True):
     try:
         cursor = dest_conn.cursor()
 
-        for tag in video_tags:
-            new_tag_id = str(uuid.uuid4())
-            query = """
-                INSERT INTO video_tags (
-                    id, video_tag, ml_output_id, tenant_id, created_at_utc, updated_at_utc
-                ) VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            values = (
-                new_tag_id,
-                tag['video_tag'],
-                new_ml_output_id,
-                new_tenant_id,
-                tag['created_at_utc'],
-                tag['updated_at_utc']
-            )
-            cursor.execute(query, values)
+        rows = video_tag_rows(video_tags, new_ml_output_id, new_tenant_id)
+        insert_rows(cursor, 'video_tags', VIDEO_TAG_COLUMNS, rows, chunk_size, max_packet_bytes)
 
-        dest_conn.commit()
+        if commit:
+            dest_conn.commit()
         logger.info(f"✅ Inserted {len(video_tags)} video tag(s) for ML Output ID: {new_ml_output_id}")
 
     except Exception as e:
         logger.error(f"❌ Error inserting video tags: {e}")
+        if not commit:
+            raise
         dest_conn.rollback() 
\ No newline at end of file
@@ -0,0 +1,308 @@
+from src.services.alarm_service import RAW_ALARM_PROJECTION, DEFAULT_ALARM_TYPE_ID
+from src.services.alarm_update_service import ALARM_UPDATE_COLUMNS
+from src.services.bulk_load_service import ChunkLoader
+from src.services.employee_service import EMPLOYEE_PROJECTION
+from src.services.media_service import MEDIA_COLUMNS
+from src.services.ml_service import ML_OUTPUT_COLUMNS, VIDEO_TAG_COLUMNS
+from src.services.user_service import USER_COLUMNS
+from src.utils.logger import get_logger
+logger = get_logger("server_copy_service")
+
+# Session-scoped tables mapping the source ids of a chunk to their new ids.
+# Each query names every one of them at most once: MySQL cannot reopen a
+# temporary table within a statement.
+MAPPING_TABLES = {
+    'tmp_alarm_map': "source_id VARCHAR(255) NOT NULL PRIMARY KEY, new_id CHAR(36) NOT NULL, "
+                     "source_ml_output_id VARCHAR(255), new_ml_output_id CHAR(36), source_employee_id VARCHAR(255)",
+    'tmp_update_map': "new_alarm_id CHAR(36) NOT NULL, source_id VARCHAR(255) NOT NULL, new_id CHAR(36) NOT NULL, "
+                      "PRIMARY KEY (new_alarm_id, source_id)",
+    'tmp_user_map': "source_user_id VARCHAR(255) NOT NULL PRIMARY KEY, new_user_id VARCHAR(255), is_new TINYINT NOT NULL DEFAULT 0",
+    'tmp_employee_map': "source_employee_id VARCHAR(255) NOT NULL PRIMARY KEY, new_employee_id VARCHAR(255)",
+    'tmp_alarm_type_map': "source_type_id VARCHAR(255) NOT NULL PRIMARY KEY, new_type_id VARCHAR(255) NOT NULL",
+}
+
+
+def _select_list(columns, alias, expressions=None, values=None):
+    """
+    The SELECT list copying `columns` from `alias`, with SQL expressions or
+    bound values in place of the rewritten columns, and its parameters. An
+    expression with placeholders is given as (sql, param, ...).
+    """
+    expressions, values = expressions or {}, values or {}
+    select_list, params = [], []
+    for column in columns:
+        if column in values:
+            select_list.append('%s')
+            params.append(values[column])
+            continue
+        expression = expressions.get(column, f"{alias}.{column}")
+        if isinstance(expression, tuple):
+            expression, *bound = expression
+            params.extend(bound)
+        select_list.append(expression)
+    return ', '.join(select_list), params
+
+
+def _fetch_one(connection, query, params=()):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query, params)
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+class ServerSideCopy(ChunkLoader):
+    """
+    Copies a chunk with INSERT ... SELECT when source and destination share a server.
+    """
+    span_name = "server_copy_chunk"
+    # Only the duplicate check and the ledger read the prefetched alarms
+    prefetch_columns = ('id', 'source_id', 'partition_key')
+
+    def __init__(self, context, new_camera_id, new_tenant_id, new_door_id, source_schema):
+        super().__init__(context, new_camera_id, new_tenant_id, new_door_id)
+        if '`' in source_schema:
+            raise ValueError(f"Unsupported source schema name: {source_schema}")
+        self.source_schema = source_schema
+        self._schema = None
+        self._alarm_types = []
+        self._fallback_type_id = DEFAULT_ALARM_TYPE_ID
+
+    @classmethod
+    def detect(cls, context, new_camera_id, new_tenant_id, new_door_id, source_schema, destination_schema):
+        """
+        Returns a ServerSideCopy when both schemas are on the same server and
+        the destination session can read the source schema, else None.
+        """
+        if not source_schema or not destination_schema or source_schema == destination_schema:
+            return None
+        copier = cls(context, new_camera_id, new_tenant_id, new_door_id, source_schema)
+        try:
+            if not copier.check():
+                return None
+        except Exception as e:
+            logger.warning(f"⚠️ Source and destination share a server but cannot copy server-side: {e}")
+            return None
+        logger.info(f"🖥️ Source schema `{source_schema}` is on the destination server; chunks are copied with INSERT ... SELECT.")
+        return copier
+
+    def check(self):
+        """
+        Returns False when the schemas are on different servers and raises
+        RuntimeError when they share one but the copy cannot run there.
+        """
+        context = self.context
+        with context.source_pool.connection() as source_conn, context.dest_connection() as dest_conn:
+            if source_conn is None or dest_conn is None:
+                raise RuntimeError("Failed to connect to source or destination DB")
+            source_server = _fetch_one(source_conn, "SELECT @@server_uuid")
+            destination_server = _fetch_one(dest_conn, "SELECT @@server_uuid")
+            if source_server != destination_server:
+                return False
+            # The mapping tables take the destination schema's collation;
+            # comparing them with source columns of another one fails
+            cursor = dest_conn.cursor()
+            try:
+                cursor.execute(
+                    "SELECT SCHEMA_NAME, DEFAULT_COLLATION_NAME FROM information_schema.SCHEMATA "
+                    "WHERE SCHEMA_NAME IN (%s, DATABASE())",
+                    (self.source_schema,)
+                )
+                collations = dict(cursor.fetchall())
+            finally:
+                cursor.close()
+            if len(set(collations.values())) > 1:
+                raise RuntimeError(f"the schemas use different collations ({', '.join(sorted(collations.values()))})")
+            # Fails when the destination user cannot read the source schema
+            _fetch_one(dest_conn, f"SELECT 1 FROM {self._source('raw_alarms_v2')} LIMIT 0")
+        self._schema = context.check_schema()
+        alarm_types = context.alarm_types
+        self._alarm_types = [
+            (source_type_id, alarm_types.resolve(source_type_id)[1] or DEFAULT_ALARM_TYPE_ID)
+            for source_type_id in alarm_types.source_types
+        ]
+        self._fallback_type_id = alarm_types.fallback_id() or DEFAULT_ALARM_TYPE_ID
+        return True
+
+    def _source(self, table):
+        return f"`{self.source_schema}`.{table}"
+
+    def _load(self, source_conn, dest_conn, entries):
+        raw_alarm_ids = [row['raw_alarm_id'] for row, _ in entries]
+        cursor = dest_conn.cursor()
+        try:
+            self._prepare_mapping_tables(cursor, dest_conn)
+            copied = self._copy(cursor, dest_conn, raw_alarm_ids)
+        finally:
+            cursor.close()
+        dest_conn.commit()
+        logger.info(f"✅ Copied {len(copied)} alarm(s) server-side")
+        outcomes = {}
+        for raw_alarm_id in raw_alarm_ids:
+            if raw_alarm_id in copied:
+                outcomes[raw_alarm_id] = ("Success", copied[raw_alarm_id])
+            else:
+                logger.error(f"❌ No media records found for raw alarm {raw_alarm_id}. Skipping.")
+                outcomes[raw_alarm_id] = ("No media records found", None)
+        return outcomes
+
+    def _resolve_employees(self, cursor, dest_conn):
+        """
+        Returns [(source employee id, destination id)] for the employees of
+        the chunk's alarms. Unknown employees are inserted and committed on a
+        pooled connection of the index, outside the chunk's transaction.
+        """
+        employee_columns = self._schema.columns(EMPLOYEE_PROJECTION)
+        cursor.execute(
+            f"SELECT {', '.join(employee_columns)} FROM {self._source('employees')} "
+            "WHERE id IN (SELECT source_employee_id FROM tmp_alarm_map)"
+        )
+        employees = [dict(zip(employee_columns, row)) for row in cursor.fetchall()]
+        employee_index = self.context.employee_index
+        return [
+            (employee['id'], employee_index.resolve(dest_conn, dict(employee), commit=False)[0])
+            for employee in employees
+        ]
+
+    def _prepare_mapping_tables(self, cursor, dest_conn):
+        for table, definition in MAPPING_TABLES.items():
+            cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {table} ({definition})")
+            cursor.execute(f"DELETE FROM {table}")
+        if self._alarm_types:
+            cursor.execute(
+                f"INSERT INTO tmp_alarm_type_map (source_type_id, new_type_id) VALUES "
+                f"{', '.join(['(%s, %s)'] * len(self._alarm_types))}",
+                [value for pair in self._alarm_types for value in pair]
+            )
+        # Servers enforcing GTID consistency reject temporary table DDL
+        # inside a transaction that also writes
+        dest_conn.commit()
+
+    def _copy(self, cursor, dest_conn, raw_alarm_ids):
+        """
+        Runs the copy in dependency order and returns {raw alarm id: new alarm id}
+        for the alarms copied; alarms without media are left out.
+        """
+        source = self._source
+        tenant_id = self.new_tenant_id
+        # 1️⃣ Alarm ids, in batches to bound the statement size
+        chunk_size = self.context.insert_chunk_size
+        for start in range(0, len(raw_alarm_ids), chunk_size):
+            batch = raw_alarm_ids[start:start + chunk_size]
+            cursor.execute(
+                "INSERT INTO tmp_alarm_map (source_id, new_id, source_ml_output_id, source_employee_id) "
+                f"SELECT a.id, UUID(), a.ml_output_id, a.employee_id FROM {source('raw_alarms_v2')} a "
+                f"WHERE a.id IN ({', '.join(['%s'] * len(batch))}) "
+                f"AND EXISTS (SELECT 1 FROM {source('alarm_media')} m WHERE m.alarm_id = a.id)",
+                tuple(batch)
+            )
+        cursor.execute(
+            "UPDATE tmp_alarm_map SET new_ml_output_id = UUID() "
+            f"WHERE source_ml_output_id IN (SELECT id FROM {source('ml_outputs')})"
+        )
+
+        # 2️⃣ Employees, through the run's index by name and phone number
+        employee_ids = self._resolve_employees(cursor, dest_conn)
+        for start in range(0, len(employee_ids), chunk_size):
+            batch = employee_ids[start:start + chunk_size]
+            cursor.execute(
+                "INSERT INTO tmp_employee_map (source_employee_id, new_employee_id) VALUES "
+                f"{', '.join(['(%s, %s)'] * len(batch))}",
+                [value for pair in batch for value in pair]
+            )
+
+        # 3️⃣ Media, in source order so the generated ids follow it
+        first_only = "" if self.context.copy_all_media else (
+            f"WHERE m.id = (SELECT MIN(f.id) FROM {source('alarm_media')} f WHERE f.alarm_id = a.source_id) "
+        )
+        select_list, params = _select_list(MEDIA_COLUMNS, 'm', {'alarm_id': 'a.new_id'})
+        cursor.execute(
+            f"INSERT INTO alarm_media ({', '.join(MEDIA_COLUMNS)}) SELECT {select_list} "
+            f"FROM tmp_alarm_map a JOIN {source('alarm_media')} m ON m.alarm_id = a.source_id {first_only}ORDER BY m.id",
+            params
+        )
+
+        # 4️⃣ ML outputs and their video tags
+        select_list, params = _select_list(
+            ML_OUTPUT_COLUMNS, 'o', {'id': 'a.new_ml_output_id', 'alarm_id': 'a.new_id'}, {'tenant_id': tenant_id}
+        )
+        cursor.execute(
+            f"INSERT INTO ml_outputs ({', '.join(ML_OUTPUT_COLUMNS)}) SELECT {select_list} "
+            f"FROM tmp_alarm_map a JOIN {source('ml_outputs')} o ON o.id = a.source_ml_output_id",
+            params
+        )
+        select_list, params = _select_list(
+            VIDEO_TAG_COLUMNS, 't', {'id': 'UUID()', 'ml_output_id': 'a.new_ml_output_id'}, {'tenant_id': tenant_id}
+        )
+        cursor.execute(
+            f"INSERT INTO video_tags ({', '.join(VIDEO_TAG_COLUMNS)}) SELECT {select_list} "
+            f"FROM tmp_alarm_map a JOIN {source('video_tags')} t ON t.ml_output_id = a.source_ml_output_id "
+            "WHERE a.new_ml_output_id IS NOT NULL",
+            params
+        )
+
+        # 5️⃣ Alarm updates and the users they reference
+        cursor.execute(
+            "INSERT INTO tmp_update_map (new_alarm_id, source_id, new_id) SELECT a.new_id, u.id, UUID() "
+            f"FROM tmp_alarm_map a JOIN {source('alarm_updates')} u ON u.alarm_id = a.source_id"
+        )
+        cursor.execute(
+            f"INSERT INTO tmp_user_map (source_user_id) SELECT s.id FROM {source('users')} s WHERE s.id IN ("
+            f"SELECT u.user_id FROM tmp_update_map m JOIN {source('alarm_updates')} u ON u.id = m.source_id)"
+        )
+        cursor.execute("UPDATE tmp_user_map SET new_user_id = source_user_id WHERE source_user_id IN (SELECT id FROM users)")
+        cursor.execute(
+            "UPDATE tmp_user_map SET new_user_id = ("
+            f"SELECT d.id FROM users d JOIN {source('users')} s ON d.email = s.email "
+            "WHERE s.id = tmp_user_map.source_user_id LIMIT 1) WHERE new_user_id IS NULL"
+        )
+        cursor.execute("UPDATE tmp_user_map SET new_user_id = UUID(), is_new = 1 WHERE new_user_id IS NULL")
+        select_list, params = _select_list(USER_COLUMNS, 's', {'id': 'm.new_user_id'}, {'tenant_id': tenant_id})
+        cursor.execute(
+            f"INSERT INTO users ({', '.join(USER_COLUMNS)}) SELECT {select_list} "
+            f"FROM tmp_user_map m JOIN {source('users')} s ON s.id = m.source_user_id WHERE m.is_new = 1",
+            params
+        )
+        select_list, params = _select_list(
+            ALARM_UPDATE_COLUMNS, 'u',
+            {'id': 'm.new_id', 'alarm_id': 'm.new_alarm_id', 'user_id': 'r.new_user_id'},
+            {'tenant_id': tenant_id}
+        )
+        cursor.execute(
+            f"INSERT INTO alarm_updates ({', '.join(ALARM_UPDATE_COLUMNS)}) SELECT {select_list} "
+            f"FROM tmp_update_map m JOIN {source('alarm_updates')} u ON u.id = m.source_id "
+            "LEFT JOIN tmp_user_map r ON r.source_user_id = u.user_id",
+            params
+        )
+
+        # 6️⃣ Raw alarms, pointing at everything above
+        overrides = {
+            'id': 'a.new_id',
+            'latest_alarm_media_id': "(SELECT m.id FROM alarm_media m WHERE m.alarm_id = a.new_id "
+                                     "ORDER BY m.created_at_utc DESC, m.id DESC LIMIT 1)",
+            'employee_id': 'e.new_employee_id',
+            'user_id': 'NULL',
+            'alarm_type_id': ('COALESCE(t.new_type_id, %s)', self._fallback_type_id),
+            'ml_output_id': 'a.new_ml_output_id',
+            'alarm_update_id': "(SELECT m.new_id FROM tmp_update_map m WHERE m.new_alarm_id = a.new_id "
+                               "ORDER BY m.source_id DESC LIMIT 1)",
+        }
+        values = {'source_entity_id': self.new_camera_id, 'tenant_id': tenant_id, 'door_id': self.new_door_id}
+        columns = list(self._schema.columns(RAW_ALARM_PROJECTION))
+        columns += [column for column in (*overrides, *values) if column not in columns]
+        select_list, params = _select_list(columns, 'r', overrides, values)
+        cursor.execute(
+            f"INSERT INTO raw_alarms_v2 ({', '.join(columns)}) SELECT {select_list} "
+            f"FROM tmp_alarm_map a JOIN {source('raw_alarms_v2')} r ON r.id = a.source_id "
+            "LEFT JOIN tmp_alarm_type_map t ON t.source_type_id = r.alarm_type_id "
+            "LEFT JOIN tmp_employee_map e ON e.source_employee_id = r.employee_id",
+            params
+        )
+        inserted = cursor.rowcount
+
+        cursor.execute("SELECT source_id, new_id FROM tmp_alarm_map")
+        copied = dict(cursor.fetchall())
+        if inserted != len(copied):
+            raise RuntimeError(f"Copied {inserted} of {len(copied)} raw alarm(s)")
+        return copied
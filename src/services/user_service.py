@@ -1,14 +1,23 @@
-import json
 import uuid
+from src.database.schema import TableProjection
+from src.database.statements import statements_for
+from src.models.shared_ids import SharedIds
+from src.utils.json_columns import json_column
 from src.utils.logger import get_logger
 logger = get_logger("user_service")
 
+USER_COLUMNS = (
+    'id', 'name', 'email', 'is_enabled', 'password', 'tenant_id', 'created_at_utc', 'updated_at_utc',
+    'refresh_token', 'refresh_token_expires', 'role_id', 'msp_tenants', 'msp_locations', 'vision_tenants',
+)
+# Everything insert_user copies, minus the tenant it replaces
+USER_PROJECTION = TableProjection(
+    'users', tuple(column for column in USER_COLUMNS if column != 'tenant_id'), destination_columns=USER_COLUMNS
+)
+
 def fetch_user_by_id(connection, user_id):
     try:
-        cursor = connection.cursor(dictionary=True)
-        query = "SELECT * FROM users WHERE id = %s"
-        cursor.execute(query, (user_id,))
-        user = cursor.fetchone()
+        user = statements_for(connection).select_one('users', USER_PROJECTION.select_list(connection), ('id',), (user_id,))
 
         if user:
             logger.info(f"Found user with ID: {user_id}")
@@ -21,31 +30,18 @@ def fetch_user_by_id(connection, user_id):
         logger.error(f"Error fetching user: {e}")
         return None
 
-    finally:
-        if cursor:
-            cursor.close()
-
 def get_user_id_by_email(dest_conn, email):
-    cursor = dest_conn.cursor(dictionary=True)
-    try:
-        cursor.execute("SELECT id FROM users WHERE email = %s", (email,))
-        result = cursor.fetchone()
-        return result['id'] if result else None
-    finally:
-        cursor.close()
+    result = statements_for(dest_conn).select_one('users', 'id', ('email',), (email,))
+    return result['id'] if result else None
 
 def user_exists_in_destination(dest_conn, old_user_id):
     try:
-        cursor = dest_conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE id = %s", (old_user_id,))
-        return cursor.fetchone() is not None
+        return statements_for(dest_conn).select_one('users', 'id', ('id',), (old_user_id,)) is not None
     except Exception as e:
         logger.warning(f"Error checking user existence: {e}")
         return False
-    finally:
-        cursor.close()
 
-def insert_user_if_not_exists(dest_conn, user_record, new_tenant_id):
+def insert_user_if_not_exists(dest_conn, user_record, new_tenant_id, commit=True):
     old_user_id = user_record['id']
     user_email = user_record['email']
 
@@ -58,23 +54,17 @@ def insert_user_if_not_exists(dest_conn, user_record, new_tenant_id):
         logger.info(f"User with email '{user_email}' already exists. Using existing ID: {existing_user_id_by_email}")
         return existing_user_id_by_email
 
+    return insert_user(dest_conn, user_record, new_tenant_id, commit)
+
+def insert_user(dest_conn, user_record, new_tenant_id, commit=True):
+    user_email = user_record['email']
     new_user_id = str(uuid.uuid4())
 
     try:
-        cursor = dest_conn.cursor()
-
-        msp_tenants = json.dumps(user_record.get('msp_tenants')) if user_record.get('msp_tenants') else None
-        msp_locations = json.dumps(user_record.get('msp_locations')) if user_record.get('msp_locations') else None
-        vision_tenants = json.dumps(user_record.get('vision_tenants')) if user_record.get('vision_tenants') else None
-
-        query = """
-            INSERT INTO users (
-                id, name, email, is_enabled, password, tenant_id, 
-                created_at_utc, updated_at_utc, refresh_token, refresh_token_expires, 
-                role_id, msp_tenants, msp_locations, vision_tenants
-            )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
+        msp_tenants = json_column(user_record.get('msp_tenants')) if user_record.get('msp_tenants') else None
+        msp_locations = json_column(user_record.get('msp_locations')) if user_record.get('msp_locations') else None
+        vision_tenants = json_column(user_record.get('vision_tenants')) if user_record.get('vision_tenants') else None
+
         values = (
             new_user_id,
             user_record.get('name'),
@@ -92,15 +82,95 @@ def insert_user_if_not_exists(dest_conn, user_record, new_tenant_id):
             vision_tenants
         )
 
-        cursor.execute(query, values)
-        dest_conn.commit()
+        statements_for(dest_conn).insert('users', USER_COLUMNS, values)
+        if commit:
+            dest_conn.commit()
         logger.info(f"Inserted user {user_email} with new ID {new_user_id}")
         return new_user_id
 
     except Exception as e:
         logger.error(f"Error inserting user: {e}")
+        if not commit:
+            raise
         dest_conn.rollback()
         return None
 
-    finally:
-        cursor.close() 
\ No newline at end of file
+
+class UserResolver:
+    """
+    Run-scoped cache of source user id -> destination user id. The distinct
+    users of a chunk of alarm updates are resolved with one source query and
+    one destination query; later lookups of the same user cost nothing.
+
+    Workers share one resolver. A user two workers need at once is resolved
+    by one of them (see SharedIds), and users missing from the destination
+    are inserted on a separate, committed `connection()` when the caller
+    writes inside its own transaction, so every worker can reuse their ids
+    straight away. Such users stay even if the alarm is rolled back.
+    """
+    def __init__(self, connection=None):
+        self._resolved = SharedIds(connection)
+
+    def preload(self, source_conn, dest_conn, user_ids, new_tenant_id, commit=True):
+        self._resolved.resolve(
+            [user_id for user_id in user_ids if user_id], dest_conn, commit,
+            lambda conn, commit, missing: self._lookup(source_conn, conn, missing, new_tenant_id, commit)
+        )
+
+    def _lookup(self, source_conn, dest_conn, missing, new_tenant_id, commit):
+        """
+        Resolves the users nobody has looked up yet and returns {source id: destination id}.
+        """
+        placeholders = ', '.join(['%s'] * len(missing))
+
+        cursor = source_conn.cursor(dictionary=True)
+        try:
+            cursor.execute(f"SELECT {USER_PROJECTION.select_list(source_conn)} FROM users WHERE id IN ({placeholders})", tuple(missing))
+            user_records = {row['id']: row for row in cursor.fetchall()}
+        finally:
+            cursor.close()
+
+        emails = list({record['email'] for record in user_records.values() if record.get('email')})
+        query = f"SELECT id, email FROM users WHERE id IN ({placeholders})"
+        params = list(missing)
+        if emails:
+            query += f" OR email IN ({', '.join(['%s'] * len(emails))})"
+            params += emails
+        cursor = dest_conn.cursor(dictionary=True)
+        try:
+            cursor.execute(query, params)
+            destination_rows = cursor.fetchall()
+        finally:
+            cursor.close()
+        destination_ids = {row['id'] for row in destination_rows}
+        destination_ids_by_email = {}
+        for row in destination_rows:
+            destination_ids_by_email.setdefault(row['email'], row['id'])
+
+        resolved = {}
+        for user_id in missing:
+            user_record = user_records.get(user_id)
+            if not user_record:
+                logger.info(f"No user found with ID: {user_id}")
+                resolved[user_id] = None
+            elif user_id in destination_ids:
+                logger.info(f"User {user_id} already exists in destination. Using same ID.")
+                resolved[user_id] = user_id
+            elif user_record.get('email') in destination_ids_by_email:
+                existing_user_id = destination_ids_by_email[user_record['email']]
+                logger.info(f"User with email '{user_record['email']}' already exists. Using existing ID: {existing_user_id}")
+                resolved[user_id] = existing_user_id
+            else:
+                new_user_id = insert_user(dest_conn, user_record, new_tenant_id, commit)
+                # Failed inserts are not cached so the next update retries them
+                if new_user_id:
+                    destination_ids_by_email[user_record.get('email')] = new_user_id
+                    resolved[user_id] = new_user_id
+        return resolved
+
+    def resolve(self, source_conn, dest_conn, user_id, new_tenant_id, commit=True):
+        if not user_id:
+            return None
+        if user_id not in self._resolved:
+            self.preload(source_conn, dest_conn, [user_id], new_tenant_id, commit)
+        return self._resolved.get(user_id)
@@ -0,0 +1,96 @@
+import math
+import threading
+from contextlib import contextmanager
+
+from src.utils.logger import get_logger
+logger = get_logger("concurrency")
+
+# Destination write timings per limit decision
+DEFAULT_LATENCY_WINDOW = 50
+# Multiplicative decrease applied when the window's p95 breaks the ceiling
+DEFAULT_DECREASE_FACTOR = 0.5
+LATENCY_QUANTILE = 0.95
+
+
+def _quantile(samples, q):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on the alarms migrated at once, set by the p95 destination write latency (seconds).
+    """
+    def __init__(self, max_limit, ceiling, target=None, min_limit=1, window=DEFAULT_LATENCY_WINDOW,
+                 decrease=DEFAULT_DECREASE_FACTOR):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.ceiling = ceiling
+        self.target = ceiling / 2 if target is None else min(target, ceiling)
+        self.window = window
+        self.decrease = decrease
+        self.limit = self.min_limit
+        self.peak_limit = self.limit
+        self.in_flight = 0
+        self.last_p95 = None
+        self._samples = []
+        self._saturated = False
+        self._condition = threading.Condition()
+
+    def observe_statement(self, sql, elapsed, rows):
+        if sql != 'COMMIT' and sql[:6].upper() != 'INSERT':
+            return
+        with self._condition:
+            self._samples.append(elapsed)
+            if len(self._samples) >= self.window:
+                self._adjust()
+
+    def _adjust(self):
+        p95 = self.last_p95 = _quantile(self._samples, LATENCY_QUANTILE)
+        saturated, self._saturated = self._saturated, self.in_flight >= self.limit
+        self._samples = []
+        previous = self.limit
+        if p95 > self.ceiling:
+            self.limit = max(self.min_limit, int(self.limit * self.decrease))
+        elif p95 <= self.target and saturated:
+            self.limit = min(self.max_limit, self.limit + 1)
+        if self.limit == previous:
+            return
+        self.peak_limit = max(self.peak_limit, self.limit)
+        logger.info(f"🎚️ Alarms in flight {previous} → {self.limit} (write p95 {p95 * 1000:.1f} ms)")
+        self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, before_wait=None):
+        """
+        Holds one of the `limit` in-flight alarm slots for the duration of the
+        block. When none is free, `before_wait` runs first, outside the lock,
+        so the worker can release what it holds before it blocks.
+        """
+        with self._condition:
+            acquired = self.in_flight < self.limit
+            if acquired:
+                self._take()
+        if not acquired:
+            if before_wait:
+                before_wait()
+            with self._condition:
+                self._saturated = True
+                while self.in_flight >= self.limit:
+                    self._condition.wait()
+                self._take()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify()
+
+    def _take(self):
+        self.in_flight += 1
+        if self.in_flight >= self.limit:
+            self._saturated = True
+
+    def summary(self):
+        p95 = f"{self.last_p95 * 1000:.1f} ms" if self.last_p95 is not None else "n/a"
+        return f"limit {self.limit} of {self.max_limit} (peak {self.peak_limit}), last write p95 {p95}"
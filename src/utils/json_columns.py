@@ -0,0 +1,20 @@
+import json
+
+
+def json_column(value):
+    """
+    Returns a JSON column value ready to bind on insert. JSON read from the
+    source arrives as text (or bytes, depending on the connector build) and
+    is passed through as-is: parsing and re-serializing it costs time on
+    large documents, and json.dumps() of a str double-encodes it.
+    Only Python structures built or modified by the migration are
+    serialized; a transformation that needs the content parses it first.
+    Bytes are decoded, not parsed, because the server rejects JSON sent
+    with the binary character set.
+    """
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8')
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
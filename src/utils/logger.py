@@ -1,6 +1,23 @@
+import atexit
+import contextvars
 import logging
 import os
+import queue
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+
+# Log file of the alarm being migrated by the current thread/task
+_alarm_log_path = contextvars.ContextVar('alarm_log_path', default=None)
+# Open per-alarm files kept by the writer; more concurrent alarms than this
+# just reopen their file in append mode
+MAX_OPEN_LOG_FILES = 16
+
+_queue = queue.SimpleQueue()
+_listener = None
+_listener_lock = threading.Lock()
+
 
 def get_logger(name=__name__):
     logger = logging.getLogger(name)
@@ -15,19 +32,88 @@ def get_logger(name=__name__):
     return logger
 
 
+class AlarmLogRouter(logging.Handler):
+    """
+    Writes every record to the log file of the alarm it was logged for. Runs
+    only on the background listener thread, so it needs no locking.
+    """
+    def __init__(self, max_open_files=MAX_OPEN_LOG_FILES):
+        super().__init__(logging.DEBUG)
+        # File: include logger name
+        self.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s %(name)s: %(message)s'))
+        self.max_open_files = max_open_files
+        self._files = OrderedDict()
+
+    def emit(self, record):
+        path = record.alarm_log_path
+        if getattr(record, 'close_alarm_log', False):
+            stream = self._files.pop(path, None)
+            if stream:
+                stream.close()
+            return
+        try:
+            stream = self._files.get(path)
+            if stream is None:
+                stream = open(path, 'a', encoding='utf-8')
+                self._files[path] = stream
+                if len(self._files) > self.max_open_files:
+                    _, oldest = self._files.popitem(last=False)
+                    oldest.close()
+            else:
+                self._files.move_to_end(path)
+            stream.write(self.format(record) + '\n')
+            stream.flush()
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for stream in self._files.values():
+            stream.close()
+        self._files.clear()
+        super().close()
+
+
+def _attach_alarm_log_path(record):
+    record.alarm_log_path = _alarm_log_path.get()
+    return record.alarm_log_path is not None
+
+
+def _start_listener():
+    global _listener
+    with _listener_lock:
+        if _listener is None:
+            _listener = QueueListener(_queue, AlarmLogRouter())
+            _listener.start()
+            atexit.register(_listener.stop)
+
+
 def add_file_handler(logger, raw_alarm_id):
     """
-    Adds a file handler to the logger for the given raw_alarm_id.
-    Logs will be stored in duplication_logs/<raw_alarm_id>_<timestamp>.log
+    Routes the logger's records for the current alarm to
+    duplication_logs/<raw_alarm_id>_<timestamp>.log.
+    All alarms share one queue handler and one background writer, so file
+    descriptors and per-line cost stay constant however long the batch runs.
     """
     log_dir = 'duplication_logs'
     os.makedirs(log_dir, exist_ok=True)
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     file_path = os.path.join(log_dir, f'{raw_alarm_id}_{timestamp}.log')
-    file_handler = logging.FileHandler(file_path)
-    # File: include logger name
-    formatter = logging.Formatter('[%(asctime)s] %(levelname)s %(name)s: %(message)s')
-    file_handler.setFormatter(formatter)
-    file_handler.setLevel(logging.DEBUG)
-    logger.addHandler(file_handler)
-    return file_path 
\ No newline at end of file
+    _start_listener()
+    if not any(isinstance(handler, QueueHandler) for handler in logger.handlers):
+        queue_handler = QueueHandler(_queue)
+        queue_handler.setLevel(logging.DEBUG)
+        queue_handler.addFilter(_attach_alarm_log_path)
+        logger.addHandler(queue_handler)
+    _alarm_log_path.set(file_path)
+    return file_path
+
+
+def close_alarm_log():
+    """
+    Ends routing for the current alarm and lets the writer close its file.
+    """
+    path = _alarm_log_path.get()
+    if path is None:
+        return
+    _alarm_log_path.set(None)
+    _queue.put_nowait(logging.makeLogRecord({'alarm_log_path': path, 'close_alarm_log': True}))
@@ -0,0 +1,228 @@
+import bisect
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.utils.logger import get_logger
+logger = get_logger("metrics")
+
+DEFAULT_METRICS_INTERVAL = 15
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# INSERTs and the LOAD DATA statements of bulk-load mode, as normalized by the profiler
+_INSERT_TABLE = re.compile(
+    r'^(?:INSERT\s+(?:IGNORE\s+)?INTO|LOAD\s+DATA\s+(?:LOCAL\s+)?INFILE\s+\?\s+INTO\s+TABLE)\s+`?(\w+)', re.IGNORECASE
+)
+_ERROR_KIND = re.compile(r'[^a-z0-9]+')
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram in the Prometheus layout.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Upper bucket bound holding the q-th observation; None when empty.
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def render(self, name, labels):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels}le="+Inf"}} {self.count}')
+        plain = f'{{{labels.rstrip(",")}}}' if labels else ''
+        lines.append(f'{name}_sum{plain} {self.sum:.6f}')
+        lines.append(f'{name}_count{plain} {self.count}')
+        return lines
+
+
+def error_kind(outcome):
+    """Turns a failure message such as 'Failed to connect to DB' into a label value"""
+    message = (outcome or 'unknown').split(':', 1)[0]
+    return _ERROR_KIND.sub('_', message.lower()).strip('_') or 'unknown'
+
+
+class MigrationMetrics:
+    """
+    Live batch metrics in the Prometheus text format: alarms by outcome and
+    per second, rows inserted and insert/commit latency per destination
+    table, the duplicate skip ratio and errors by kind.
+
+    Statement timings arrive as a QueryProfiler listener; alarm outcomes are
+    reported by main() and the batch loop. The text is rewritten to `path`
+    every `interval` seconds and/or served on 127.0.0.1:`port`/metrics.
+    """
+    def __init__(self, path=None, port=None, interval=DEFAULT_METRICS_INTERVAL):
+        self.path = path
+        self.port = port
+        self.interval = interval
+        self.started_at = time.monotonic()
+        self.alarms = {}
+        self.errors = {}
+        self.rows_inserted = {}
+        self.insert_latency = {}
+        self.commit_latency = Histogram()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._writer = None
+        self._server = None
+
+    def observe_statement(self, sql, elapsed, rows):
+        if sql == 'COMMIT':
+            with self._lock:
+                self.commit_latency.observe(elapsed)
+            return
+        match = _INSERT_TABLE.match(sql)
+        if not match:
+            return
+        table = match.group(1)
+        with self._lock:
+            self.rows_inserted[table] = self.rows_inserted.get(table, 0) + rows
+            histogram = self.insert_latency.get(table)
+            if histogram is None:
+                histogram = self.insert_latency[table] = Histogram()
+            histogram.observe(elapsed)
+
+    def alarm_finished(self, outcome, kind=None):
+        if outcome == "Success":
+            label = 'success'
+        elif outcome and outcome.startswith("Duplicate"):
+            label = 'duplicate'
+        elif outcome == "Raw alarm not found":
+            label = 'not_found'
+        else:
+            label = 'failed'
+        with self._lock:
+            self.alarms[label] = self.alarms.get(label, 0) + 1
+            if label == 'failed':
+                kind = kind or error_kind(outcome)
+                self.errors[kind] = self.errors.get(kind, 0) + 1
+
+    def alarms_resumed(self, count):
+        """Alarms skipped because an earlier run already completed them"""
+        with self._lock:
+            self.alarms['resumed'] = self.alarms.get('resumed', 0) + count
+
+    def group_rolled_back(self, alarm_count):
+        with self._lock:
+            self.errors['group_commit'] = self.errors.get('group_commit', 0) + alarm_count
+
+    def commit_latency_quantile(self, q):
+        with self._lock:
+            return self.commit_latency.quantile(q)
+
+    def render(self):
+        with self._lock:
+            elapsed = max(time.monotonic() - self.started_at, 1e-9)
+            handled = sum(count for label, count in self.alarms.items() if label != 'resumed')
+            lines = [
+                '# HELP migration_alarms_total Alarms handled, by outcome.',
+                '# TYPE migration_alarms_total counter',
+            ]
+            lines += [f'migration_alarms_total{{outcome="{label}"}} {count}' for label, count in sorted(self.alarms.items())]
+            lines += [
+                '# HELP migration_alarms_per_second Alarms handled per second since the run started.',
+                '# TYPE migration_alarms_per_second gauge',
+                f'migration_alarms_per_second {handled / elapsed:.3f}',
+                '# HELP migration_duplicate_skip_ratio Share of handled alarms skipped as duplicates.',
+                '# TYPE migration_duplicate_skip_ratio gauge',
+                f'migration_duplicate_skip_ratio {self.alarms.get("duplicate", 0) / handled if handled else 0:.4f}',
+                '# HELP migration_errors_total Failed alarms, by error kind.',
+                '# TYPE migration_errors_total counter',
+            ]
+            lines += [f'migration_errors_total{{kind="{kind}"}} {count}' for kind, count in sorted(self.errors.items())]
+            lines += [
+                '# HELP migration_rows_inserted_total Rows inserted into the destination, by table.',
+                '# TYPE migration_rows_inserted_total counter',
+            ]
+            lines += [f'migration_rows_inserted_total{{table="{table}"}} {count}' for table, count in sorted(self.rows_inserted.items())]
+            lines += [
+                '# HELP migration_insert_latency_seconds Latency of INSERT and LOAD DATA statements, by table.',
+                '# TYPE migration_insert_latency_seconds histogram',
+            ]
+            for table, histogram in sorted(self.insert_latency.items()):
+                lines += histogram.render('migration_insert_latency_seconds', f'table="{table}",')
+            lines += [
+                '# HELP migration_commit_latency_seconds Latency of destination commits.',
+                '# TYPE migration_commit_latency_seconds histogram',
+            ]
+            lines += self.commit_latency.render('migration_commit_latency_seconds', '')
+            lines += [
+                '# HELP migration_uptime_seconds Seconds since the run started.',
+                '# TYPE migration_uptime_seconds gauge',
+                f'migration_uptime_seconds {elapsed:.1f}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """Atomically replaces the metrics file, so scrapers never see half a file"""
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(temp_path, self.path)
+
+    def start(self):
+        if self.path:
+            self._writer = threading.Thread(target=self._write_periodically, name='metrics-writer', daemon=True)
+            self._writer.start()
+        if self.port:
+            metrics = self
+
+            class MetricsHandler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip('/') not in ('', '/metrics'):
+                        self.send_error(404)
+                        return
+                    body = metrics.render().encode('utf-8')
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer(('127.0.0.1', self.port), MetricsHandler)
+            threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True).start()
+            logger.info(f"📈 Serving metrics on http://127.0.0.1:{self.port}/metrics")
+        return self
+
+    def _write_periodically(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {self.path}: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self._writer:
+            self._writer.join()
+        if self.path:
+            self.write()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
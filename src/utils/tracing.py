@@ -0,0 +1,152 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def _now_us():
+    return time.perf_counter_ns() // 1000
+
+
+class TraceWriter:
+    """
+    Appends complete ("X") events in the Chrome Trace Event format to a JSON
+    array file that chrome://tracing, Perfetto and speedscope load directly.
+    The closing bracket is optional in that format, so every run just keeps
+    appending to the same file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        # perf_counter has no fixed epoch; anchor it so runs line up in time
+        self._offset_us = int(time.time() * 1_000_000) - _now_us()
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', encoding='utf-8')
+        if new_file:
+            self._file.write('[\n')
+
+    def write(self, name, start_us, end_us, args, category='migration'):
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': start_us + self._offset_us,
+            'dur': max(0, end_us - start_us),
+            'pid': self._pid,
+            'tid': threading.get_native_id(),
+            'args': args,
+        }
+        line = json.dumps(event, default=str) + ',\n'
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def start_tracing(path):
+    """
+    Starts writing spans to path for the rest of the process.
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = TraceWriter(path)
+            atexit.register(_tracer.close)
+    return _tracer
+
+
+def stop_tracing():
+    global _tracer
+    with _tracer_lock:
+        tracer, _tracer = _tracer, None
+    if tracer:
+        tracer.close()
+
+
+@contextmanager
+def span(name, **args):
+    """
+    Records the enclosed block as one span. Yields the span's args dict so
+    the block can add tags such as row counts; a raised exception is recorded
+    as the outcome.
+    """
+    tracer = _tracer
+    if tracer is None:
+        yield args
+        return
+    start_us = _now_us()
+    try:
+        yield args
+    except Exception as e:
+        args.setdefault('outcome', f"Error: {e}")
+        raise
+    finally:
+        tracer.write(name, start_us, _now_us(), args)
+
+
+class AlarmTrace:
+    """
+    Spans for one alarm's migration: stage() closes the running stage and
+    opens the next, so main() can mark its numbered stages without nesting.
+    Every stage span carries the alarm id, the rows it touched and its
+    outcome; finish() also writes one span covering the whole alarm.
+    """
+    def __init__(self, alarm_id):
+        self.tracer = _tracer
+        self.alarm_id = alarm_id
+        self.tags = {}
+        self._stage = None
+        self._stage_start = None
+        self._stage_rows = 0
+        self._total_rows = 0
+        self.outcome = None
+        self._start = _now_us() if self.tracer else None
+
+    def stage(self, name):
+        if self.tracer is None:
+            return
+        self._end_stage('ok')
+        self._stage = name
+        self._stage_start = _now_us()
+        self._stage_rows = 0
+
+    def add_rows(self, count):
+        self._stage_rows += count
+        self._total_rows += count
+
+    def tag(self, **tags):
+        self.tags.update(tags)
+
+    def result(self, value, outcome=None):
+        """
+        Records the alarm's outcome and passes value through, so main() can
+        write `return trace.result(...)`.
+        """
+        self.outcome = outcome or value
+        return value
+
+    def finish(self):
+        if self.tracer is None:
+            return
+        outcome = self.outcome or 'Error'
+        self._end_stage(outcome)
+        self.tracer.write('migrate_alarm', self._start, _now_us(), {
+            'alarm_id': self.alarm_id, 'rows': self._total_rows, 'outcome': outcome, **self.tags
+        })
+
+    def _end_stage(self, outcome):
+        if self._stage is None:
+            return
+        self.tracer.write(self._stage, self._stage_start, _now_us(), {
+            'alarm_id': self.alarm_id, 'rows': self._stage_rows, 'outcome': outcome
+        })
+        self._stage = None
@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+from src.database.bulk import insert_rows
+
+conversion = pytest.importorskip("mysql.connector.conversion")
+
+COLUMNS = ('id', 'alarm_id', 'event', 'plain_text_comment', 'update_details', 'thumbnail')
+MAX_PACKET_BYTES = 64 * 1024
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, query, params):
+        self.statements.append((query, params))
+
+
+def render(query, params):
+    """The statement as the connector sends it, with every value escaped and quoted"""
+    converter = conversion.MySQLConverter()
+    literals = iter(bytes(converter.quote(converter.escape(converter.to_mysql(value)))) for value in params)
+    parts = query.encode('utf-8').split(b'%s')
+    return b''.join(part + next(literals, b'') for part in parts)
+
+
+def escape_heavy_rows(count):
+    comment = 'He said "don\'t" \\ again\n' * 40
+    details = json.dumps({'path': 'C:\\cameras\\"front"\\door', 'notes': ["it's", '\\"quoted\\"'] * 30})
+    return [
+        (f'update-{i}', f'alarm-{i}', 'COMMENT', comment, details, b"'\\\x00\x1a" * 64)
+        for i in range(count)
+    ]
+
+
+def test_escaped_statements_stay_under_max_packet():
+    cursor = RecordingCursor()
+    rows = escape_heavy_rows(200)
+    statements = insert_rows(cursor, 'alarm_updates', COLUMNS, rows, chunk_size=500, max_packet_bytes=MAX_PACKET_BYTES)
+    assert statements == len(cursor.statements) > 1
+    assert sum(len(params) for _, params in cursor.statements) == len(rows) * len(COLUMNS)
+    sizes = [len(render(query, params)) for query, params in cursor.statements]
+    assert max(sizes) <= MAX_PACKET_BYTES
+    # Chunks are cut near the limit, not at a fraction of it
+    assert max(sizes) > MAX_PACKET_BYTES // 2
+
+
+def test_plain_rows_fill_chunks_by_count():
+    cursor = RecordingCursor()
+    rows = [(str(i), 'alarm', 'COMMENT', 'ok', None, None) for i in range(1200)]
+    assert insert_rows(cursor, 'alarm_updates', COLUMNS, rows, chunk_size=500) == 3